@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import functools
+import io
+import os
+import time
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # 1. 页面全局配置
 st.set_page_config(layout="wide", page_title="Cleanuva | Global Sales & Economic Hub")
 
+# 性能埋点：?profile=cpu (cProfile) 或 ?profile=mem (tracemalloc) 只采样本次重跑，?admin=1 显示各区间 p50 / p95
+from cleanuva import metrics
+RUN_T0 = time.perf_counter()
+PROFILE_MODE = st.query_params.get("profile")
+profiler = metrics.Profiler(PROFILE_MODE).start() if PROFILE_MODE in metrics.PROFILE_MODES else None
+
 # 2. 增强型工业黑金 CSS 样式 (保持 UI 专业感)
 st.markdown("""
 <style>
@@ -31,34 +42,73 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 3. 核心数据加载逻辑 (支持 8 个数据库变量)
-@st.cache_data
-def load_all_databases():
-    try:
-        # 加载基础产品参数对比表 (Our vs Competitors)
-        xl_prod = pd.ExcelFile("products.xlsx")
-        df_our = xl_prod.parse("Our_Products")
-        df_comp = xl_prod.parse("Competitors")
-        
-        # 加载经济 ROI 模型数据
-        xl_v1 = pd.ExcelFile("Cleanuva_Economic_Model_v1.xlsx")
-        df_sce = xl_v1.parse("Scenarios")
-        df_dev = xl_v1.parse("Devices")
-
-        # 加载全球定价、汇率设置及物流规则配置表
-        xl_price = pd.ExcelFile("Cleanuva_Price.xlsx")
-        df_base = xl_price.parse("Base_Models")
-        df_sku = xl_price.parse("SKU_Library")
-        # 将 Settings 表设为索引，方便快速提取汇率等参数
-        df_settings = xl_price.parse("Settings").set_index('Parameter')
-        df_shipping = xl_price.parse("Shipping_Rules")
-        
-        return df_our, df_comp, df_sce, df_dev, df_base, df_sku, df_settings, df_shipping
-    except Exception as e:
-        st.error(f"⚠️ System Loading Error: {e}")
-        return [None]*8
-
-# 解包 8 个 DataFrame 供全局使用
-df_our, df_comp, df_sce, df_dev, df_base, df_sku, df_settings, df_shipping = load_all_databases()
+from cleanuva import cashflow, fleet_sim, optimizer, roi, sensitivity, soiling
+from cleanuva.fleet import FleetModel
+from cleanuva.loader import AUXILIARY_SHEETS, DATABASE_SHEETS, WorkbookLoader
+from cleanuva.snapshot import SNAPSHOT_DIR
+from cleanuva.store import DataStore, approx_bytes
+
+# 增量加载器全局共享：按文件 mtime / 内容哈希及 sheet 指纹判断，只重新解析变化的 sheet
+# 冷启动优先读取列式快照 (python -m cleanuva.snapshot 预先生成)，源文件更新时才回退到 Excel
+@st.cache_resource
+def get_workbook_loader():
+    return WorkbookLoader(DATABASE_SHEETS + AUXILIARY_SHEETS, snapshot_dir=SNAPSHOT_DIR)
+
+# 每张表一次性的整理，结果随快照在所有会话间共享
+def prepare_table(key, df):
+    # 将 Settings 表设为索引，方便快速提取汇率等参数
+    if key == ("Cleanuva_Price.xlsx", "Settings"):
+        return df.set_index('Parameter')
+    return df
+
+# 共享只读数据仓库：所有会话直接引用同一份 DataFrame (st.cache_data 每次重跑都会反序列化一份副本)，
+# 文本列压缩为 category，同步 Excel 时构建新版本快照并原子切换
+@st.cache_resource
+def get_data_store():
+    return DataStore(get_workbook_loader(), prepare=prepare_table)
+
+# 机队测算引擎按 Devices 表版本缓存 (DataFrame 参数不参与哈希)
+@metrics.cached(st.cache_resource(max_entries=4), "fleet_model")
+def get_fleet_model(version, _df_dev):
+    return FleetModel(_df_dev)
+
+# 机队组合优化结果按 (设备表版本, 场景参数) 缓存
+@metrics.cached(st.cache_data(max_entries=32), "fleet_optimizer")
+def run_fleet_optimizer(version, _fleet_model, plant, window, shifts, freq, redundancy, horizon, discount_rate):
+    return optimizer.optimize_fleet(_fleet_model, plant, window, shifts, freq, redundancy, horizon, discount_rate)
+
+# 一轮清洗的离散事件仿真 (多次重复分批交给进程池)，按 (设备表版本, 机队配置, 场景参数, 停机假设) 缓存
+@metrics.cached(st.cache_data(max_entries=16), "fleet_simulation")
+def run_fleet_simulation(version, _fleet_model, devices, units, plant, shifts, window, freq, battery, charge, repair, n):
+    sim = fleet_sim.FleetSimulator(_fleet_model, devices, units, plant, shifts, window, freq,
+                                   battery_hours=battery, charge_hours=charge, repair_hours=repair)
+    with metrics.span("fleet.simulate"):
+        summary, hist = fleet_sim.summarize(sim.replicate(n, workers=os.cpu_count()), window)
+    summary["dropped"] = sim.dropped
+    return summary, hist
+
+# 应用优化方案：写入组合并清掉对应台数输入框的旧值，使其按新方案重新初始化
+def apply_fleet_mix(units, context):
+    st.session_state["fleet_mix"] = list(units)
+    st.session_state["fleet_units_override"] = {"context": context, "units": units}
+    for device in units:
+        st.session_state.pop(f"custom_q_{device}", None)
+
+# fragment 渲染耗时读数：每个 fragment 末尾显示本次重算用时
+def show_render_time(label, t0, container=st):
+    ms = (time.perf_counter() - t0) * 1000
+    metrics.record(f"render.{label}", ms)
+    container.caption(f"⏱️ {label} rendered in {ms:.1f} ms")
+
+# 解包 8 个 DataFrame 供全局使用 (data 为本次运行使用的快照，版本号也从同一快照读取)
+try:
+    with metrics.span("load.data_store"):
+        data = get_data_store().current()
+    df_our, df_comp, df_sce, df_dev, df_base, df_sku, df_settings, df_shipping = data.frames(DATABASE_SHEETS)
+except Exception as e:
+    st.error(f"⚠️ System Loading Error: {e}")
+    data = None
+    df_our, df_comp, df_sce, df_dev, df_base, df_sku, df_settings, df_shipping = [None]*8
 
 # --- 侧边栏 Logo (白字透明图专用版) ---
 with st.sidebar:
@@ -71,149 +121,287 @@ with st.sidebar:
 # --- 4. 侧边栏：ROI 经济模型 (保持全英文界面) ---
 st.sidebar.markdown("<p class='sidebar-title'>� Economic Model (v1)</p>", unsafe_allow_html=True)
 
-if df_sce is not None and df_dev is not None:
-    # 案例选择器
-    client_name = st.sidebar.selectbox("� Select Project Case:", options=df_sce['Client/Project'].tolist())
-    s = df_sce[df_sce['Client/Project'] == client_name].iloc[0]
+# 页面拆成可独立重算的 fragment，依赖关系如下 (上游重算时下游随之重算，其余部分保持不动)：
+#   经济模型 (侧边栏) -> 财务展望、敏感性分析
+#   产品对比、报价生成、批量 ROI 互相独立
+@st.fragment
+def economic_model():
+    t0 = time.perf_counter()
+    economics = None
+    if df_sce is not None and df_dev is not None:
+        # 案例选择器
+        client_name = st.sidebar.selectbox("� Select Project Case:", options=df_sce['Client/Project'].tolist())
+        s = df_sce[df_sce['Client/Project'] == client_name].iloc[0]
     
-    # 场景基本信息展示
-    st.sidebar.markdown(f"""
-    <div class='constrain-box'>
-        <div class='constrain-item'>Scenario Mode: <span class='constrain-val'>{s['Scenario']}</span></div>
-        <div class='constrain-item'>Region: <span class='constrain-val'>{s['Region']}</span></div>
-        <div class='constrain-item'>Analysis Date: <span class='constrain-val'>{str(s['Date'])[:10]}</span></div>
-        <div class='constrain-item'>Plant Capacity: <span class='constrain-val'>{s['Plant']} MW</span></div>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # --- 方案选择逻辑 (增量升级：支持工程师多机型配置方案及单价自定义) ---
-    st.sidebar.markdown("### 🛠️ Engineering Fleet Setup", help="Engineer defines the optimal robot mix based on site layout.")
+        # 场景基本信息展示
+        st.sidebar.markdown(f"""
+        <div class='constrain-box'>
+            <div class='constrain-item'>Scenario Mode: <span class='constrain-val'>{s['Scenario']}</span></div>
+            <div class='constrain-item'>Region: <span class='constrain-val'>{s['Region']}</span></div>
+            <div class='constrain-item'>Analysis Date: <span class='constrain-val'>{str(s['Date'])[:10]}</span></div>
+            <div class='constrain-item'>Plant Capacity: <span class='constrain-val'>{s['Plant']} MW</span></div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # --- 方案选择逻辑 (增量升级：支持工程师多机型配置方案及单价自定义) ---
+        st.sidebar.markdown("### 🛠️ Engineering Fleet Setup", help="Engineer defines the optimal robot mix based on site layout.")
     
-    st.sidebar.markdown("### Technical Assumptions")
-    # 窗口期悬浮解释 (严格保留原 app_v0.1.py 内容)
-    p_window = st.sidebar.number_input("Cleaning Window (Days)", value=int(s['Window']), 
-                                       help="The time limit (days) to complete one full cleaning cycle. A shorter window requires more robots to work simultaneously.")
+        st.sidebar.markdown("### Technical Assumptions")
+        # 窗口期悬浮解释 (严格保留原 app_v0.1.py 内容)
+        p_window = st.sidebar.number_input("Cleaning Window (Days)", value=int(s['Window']), 
+                                           help="The time limit (days) to complete one full cleaning cycle. A shorter window requires more robots to work simultaneously.")
     
-    # 班次悬浮解释 (严格保留原 app_v0.1.py 内容)
-    p_shifts = st.sidebar.number_input("Shifts per Day", value=int(s['Shifts']), 
-                                       help="Number of work shifts per 24 hours. Increasing to 2 shifts (Day+Night) reduces the number of units required.")
+        # 班次悬浮解释 (严格保留原 app_v0.1.py 内容)
+        p_shifts = st.sidebar.number_input("Shifts per Day", value=int(s['Shifts']), 
+                                           help="Number of work shifts per 24 hours. Increasing to 2 shifts (Day+Night) reduces the number of units required.")
     
-    # 污损收益悬浮解释 (严格保留原 app_v0.1.py 内容)
-    p_soiling = st.sidebar.slider("Soiling Recovery (%)", 0.5, 6.0, float(s['Soiling']), 
-                                      help="The expected efficiency gain from automated cleaning compared to infrequent manual cleaning.")
-
-    available_devices = df_dev['Device'].tolist()
-    # 升级为多选，支持组合方案
-    selected_fleet = st.sidebar.multiselect(
-        "Select Fleet Mix:", 
-        options=available_devices, 
-        default=[available_devices[1]] if len(available_devices) > 1 else [available_devices[0]],
-        help="Engineering step: Choose one or multiple robot models based on terrain (e.g., NuvaSpan for ground + NuvaTrack for trackers)."
-    )
-
-    # 变量初始化
-    total_fleet_cycle_cap = 0
-    total_initial_capex = 0
-    total_annual_robot_opex = 0
-
-    # 动态渲染每种选定设备的配置项
-    for robot_name in selected_fleet:
-        d_spec = df_dev[df_dev['Device'] == robot_name].iloc[0]
-        with st.sidebar.expander(f"⚙️ {robot_name} Config", expanded=True):
-            # 支持手动修改单价 (考虑折扣或实际采购价)
-            custom_unit_price = st.number_input(
-                f"Unit Price ($) - {robot_name}", 
-                value=float(d_spec['Unit price']),
-                key=f"custom_p_{robot_name}",
-                help="Actual quoted price. Adjust this if there are bulk discounts or extra hardware costs."
-            )
+        # 污损收益悬浮解释 (严格保留原 app_v0.1.py 内容)
+        p_soiling = st.sidebar.slider("Soiling Recovery (%)", 0.5, 6.0, float(s['Soiling']), 
+                                          help="The expected efficiency gain from automated cleaning compared to infrequent manual cleaning. "
+                                               "The hourly model calibrates the uncleaned soiling loss so that cleaning Freq times a year within "
+                                               "the cleaning window recovers exactly this gain; an undersized fleet recovers less.")
+
+        # 发电增收模型：原年度平均公式 (缺省) 或逐时污损仿真 (污损在清洗间隔内累积、按施工窗逐区块清除)
+        with st.sidebar.expander("🌦️ Generation Model", expanded=False):
+            gen_model = st.radio("Extra Revenue Model", ["Flat annual formula", "Hourly simulation"], key="gen_model",
+                                 help="Flat: Plant × 8760 h × CapFactor × Soiling Recovery × ElecPrice. "
+                                      "Hourly: soiling builds up between cleaning cycles (Freq) and is removed block by block over the cleaning "
+                                      "window; it matches the flat figure when the fleet keeps to the window and falls short when it cannot.")
+            p_soiling_days = st.number_input("Soiling Build-up (Days)", min_value=1.0,
+                                             value=float(s['SoilingDays']) if pd.notna(s.get('SoilingDays')) else float(soiling.DEFAULT_SOILING_DAYS), key="soiling_days",
+                                             help="Days for soiling to reach ~63% of the uncleaned loss after a clean. The 30-day default is an "
+                                                  "assumption, not a measurement; add a SoilingDays column to Scenarios for site data.")
+            p_soiling_loss = st.number_input("Uncleaned Soiling Loss (%)", min_value=0.0, max_value=50.0,
+                                             value=float(s['SoilingLoss']) if pd.notna(s.get('SoilingLoss')) else 0.0, step=0.5, key="soiling_loss",
+                                             help="Measured generation loss of panels that are never cleaned. 0 = calibrate it from Soiling Recovery.")
+            p_degradation = st.number_input("Panel Degradation (%/yr)", min_value=0.0, max_value=5.0, value=cashflow.DEFAULT_DEGRADATION,
+                                            step=0.1, key="degradation")
+            profile = soiling.load_profile()
+            st.caption(f"Hourly profile: {profile.source or 'built-in irradiance curve, flat price'}")
+
+        available_devices = df_dev['Device'].tolist()
+        # 组合方案保存在 session_state 中，便于 "Optimal Fleet Mix" 一键应用
+        if "fleet_mix" not in st.session_state:
+            st.session_state["fleet_mix"] = [available_devices[1]] if len(available_devices) > 1 else [available_devices[0]]
+        st.session_state["fleet_mix"] = [d for d in st.session_state["fleet_mix"] if d in available_devices]
+        # 升级为多选，支持组合方案
+        selected_fleet = st.sidebar.multiselect(
+            "Select Fleet Mix:", 
+            options=available_devices, 
+            key="fleet_mix",
+            help="Engineering step: Choose one or multiple robot models based on terrain (e.g., NuvaSpan for ground + NuvaTrack for trackers)."
+        )
+
+        # 建议数量 (按比例分配产能)：整支机队一次向量化计算
+        fleet_model = get_fleet_model(data.version("Cleanuva_Economic_Model_v1.xlsx", "Devices"), df_dev)
+        suggested_units = fleet_model.suggested_units(selected_fleet, s['Plant'], p_window, p_shifts, s.get('Redundancy', 1.1))
+        custom_prices, fleet_units = [], []
+        # 优化器方案仅在同一案例 / 窗口期 / 班次下生效，参数变化后回到建议台数
+        fleet_context = (client_name, p_window, p_shifts)
+        applied_mix = st.session_state.get("fleet_units_override", {})
+        applied_units = applied_mix.get("units", {}) if applied_mix.get("context") == fleet_context else {}
+
+        # 动态渲染每种选定设备的配置项 (循环内只负责控件，不再逐台计算)
+        for robot_name, suggested_q, default_price in zip(selected_fleet, suggested_units, fleet_model.unit_price[fleet_model.indices(selected_fleet)]):
+            with st.sidebar.expander(f"⚙️ {robot_name} Config", expanded=True):
+                # 支持手动修改单价 (考虑折扣或实际采购价)
+                custom_prices.append(st.number_input(
+                    f"Unit Price ($) - {robot_name}", 
+                    value=float(default_price),
+                    key=f"custom_p_{robot_name}",
+                    help="Actual quoted price. Adjust this if there are bulk discounts or extra hardware costs."
+                ))
             
-            # 计算建议数量 (按比例分配产能)
-            target_share = s['Plant'] / len(selected_fleet)
-            suggested_q = int(np.ceil((target_share / p_window) / (d_spec['Capacity'] * p_shifts) * s.get('Redundancy', 1.1)))
-            
-            q_fleet = st.number_input(
-                f"Units Count - {robot_name}", 
-                min_value=0, value=suggested_q, 
-                key=f"custom_q_{robot_name}",
-                help="Adjust based on suggested minimum units to ensure project deadline is met."
+                fleet_units.append(st.number_input(
+                    f"Units Count - {robot_name}", 
+                    min_value=0, value=int(applied_units.get(robot_name, suggested_q)), 
+                    key=f"custom_q_{robot_name}",
+                    help="Adjust based on suggested minimum units to ensure project deadline is met."
+                ))
+
+        # 汇总计算 (周期产能、投入总额、运维支出)
+        with metrics.span("fleet.evaluate"):
+            fleet_result = fleet_model.evaluate(selected_fleet, fleet_units, custom_prices,
+                                                shifts=p_shifts, window=p_window, freq=s['Freq'], plant=s['Plant'])
+        total_fleet_cycle_cap = float(fleet_result.total_cycle_cap)
+        total_initial_capex = float(fleet_result.total_capex)
+        total_annual_robot_opex = float(fleet_result.total_opex)
+
+        # 产能达标看板 (Engineering Adequacy Check)
+        is_adequate = bool(fleet_result.is_adequate)
+        status_color = "#58a6ff" if is_adequate else "#ff4b4b"
+        st.sidebar.markdown(f"""
+        <div style='border:1px solid {status_color}; padding:10px; border-radius:5px; margin-bottom:15px; background:rgba(0,0,0,0.2);'>
+            <p style='color:#8b949e; font-size:11px; margin:0;'>FLEET CAPACITY CHECK</p>
+            <p style='color:{status_color}; font-size:16px; font-weight:bold; margin:0;'>{total_fleet_cycle_cap:.1f} MW / cycle</p>
+            <p style='color:#666; font-size:10px; margin:0;'>Target: {s['Plant']} MW | Adequacy: {'YES' if is_adequate else 'NO (Add Units)'}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # --- 产能校验仿真：计入充电、故障、耗材更换及区块间转场后，一轮清洗实际完成时间的分布 ---
+        with st.sidebar.expander("🎲 Cleaning Cycle Simulation", expanded=False):
+            sim_on = st.toggle("Simulate cleaning cycle", value=False,
+                               help="Discrete-event simulation of one full cleaning cycle on 1 MW plant blocks, repeated with random breakdowns.")
+            sim_runs = st.select_slider("Replications", options=[100, 200, 500, 1000], value=200)
+            sim_battery = st.number_input("Battery Runtime (h)", min_value=0.5, max_value=24.0, value=fleet_sim.DEFAULT_BATTERY_HOURS, step=0.5)
+            sim_charge = st.number_input("Charging Time (h)", min_value=0.0, max_value=24.0, value=fleet_sim.DEFAULT_CHARGE_HOURS, step=0.5)
+            sim_repair = st.number_input("Repair Downtime (h)", min_value=0.0, max_value=240.0, value=fleet_sim.DEFAULT_REPAIR_HOURS, step=1.0,
+                                         help="Breakdowns per robot-year are derived from Warranty / (10% of unit price).")
+            if sim_on and sum(fleet_units) > 0:
+                sim_summary, sim_hist = run_fleet_simulation(
+                    data.version("Cleanuva_Economic_Model_v1.xlsx", "Devices"), fleet_model, tuple(selected_fleet),
+                    tuple(int(q) for q in fleet_units), float(s['Plant']), int(p_shifts), float(p_window), float(s['Freq']),
+                    sim_battery, sim_charge, sim_repair, sim_runs)
+                sim_color = "#58a6ff" if sim_summary["on_time"] >= 0.9 else "#ff4b4b"
+                sim_days = lambda d: f"{d:.1f} d" if np.isfinite(d) else "never"
+                st.markdown(f"""
+                <div style='border:1px solid {sim_color}; padding:10px; border-radius:5px; margin-bottom:10px; background:rgba(0,0,0,0.2);'>
+                    <p style='color:#8b949e; font-size:11px; margin:0;'>SIMULATED CYCLE TIME</p>
+                    <p style='color:{sim_color}; font-size:16px; font-weight:bold; margin:0;'>P50 {sim_days(sim_summary['p50'])} | P95 {sim_days(sim_summary['p95'])}</p>
+                    <p style='color:#666; font-size:10px; margin:0;'>Within {p_window}-day window: {sim_summary['on_time']:.0%} | Never finished: {sim_summary['unfinished']:.0%} | Breakdowns / cycle: {sim_summary['failures']:.2f}</p>
+                </div>
+                """, unsafe_allow_html=True)
+                if sim_summary["dropped"]:
+                    st.caption(f"⚠️ Not simulated (Capacity or Interval is 0): {', '.join(sim_summary['dropped'])}")
+                if len(sim_hist):
+                    st.bar_chart(sim_hist, height=160)
+
+        # --- 逐年现金流假设：测算年限、折现率与上涨率 (效益分析、敏感性分析与机队组合优化共用) ---
+        with st.sidebar.expander("💵 Cash-flow Assumptions", expanded=False):
+            cf_horizon = st.slider("Analysis Horizon (Years)", 1, cashflow.MAX_YEARS,
+                                   int(min(max(s.get('Horizon', 5), 1), cashflow.MAX_YEARS)), key="cf_horizon")
+            cf_rate = st.number_input("Discount Rate (%)", min_value=0.0, max_value=30.0, value=cashflow.DEFAULT_DISCOUNT_RATE * 100,
+                                      step=0.5, key="cf_rate", help="Used for NPV and the discounted payback period.")
+            cf_opex_esc = st.number_input("Labor & OPEX Escalation (%/yr)", min_value=-5.0, max_value=20.0,
+                                          value=cashflow.DEFAULT_OPEX_ESCALATION, step=0.5, key="cf_opex_esc",
+                                          help="Yearly increase of both the manual cleaning cost avoided and the robot OPEX.")
+            cf_price_esc = st.number_input("Electricity Price Escalation (%/yr)", min_value=-5.0, max_value=20.0,
+                                           value=cashflow.DEFAULT_PRICE_ESCALATION, step=0.5, key="cf_price_esc",
+                                           help="Yearly tariff increase; the generation gain also fades with Panel Degradation.")
+            st.caption("Robots are repurchased at list price when they reach their Lifetime within the horizon.")
+
+        # --- 机队组合优化 (在全部设备中搜索 CAPEX + OPEX 现值最低、且满足 Plant × Redundancy 的整数台数组合) ---
+        with st.sidebar.expander("🧠 Optimal Fleet Mix", expanded=False):
+            st.caption(f"OPEX and robot replacements are discounted at {cf_rate:.1f}% over {cf_horizon} years (Cash-flow Assumptions).")
+            opt_df = run_fleet_optimizer(
+                data.version("Cleanuva_Economic_Model_v1.xlsx", "Devices"), fleet_model,
+                s['Plant'], p_window, p_shifts, s['Freq'], s.get('Redundancy', 1.1), cf_horizon, cf_rate / 100
             )
+            if not opt_df.attrs.get("complete", True):
+                st.warning(f"Search stopped after {optimizer.MAX_NODES:,} combinations: the best mix found so far "
+                           "is shown, but it may not be the optimum.")
+            if len(opt_df):
+                st.dataframe(opt_df[["Fleet", "CAPEX", "OPEX PV", "Pareto"]], hide_index=True, width='stretch',
+                             column_config={c: st.column_config.NumberColumn(format="%.0f") for c in ["CAPEX", "OPEX PV"]})
+                opt_pick = st.selectbox("Alternative", range(len(opt_df)), format_func=lambda i: opt_df['Fleet'].iloc[i])
+                opt_units = {d: int(opt_df[d].iloc[opt_pick]) for d in available_devices if opt_df[d].iloc[opt_pick] > 0}
+                st.button("Apply to Fleet Setup", on_click=apply_fleet_mix, args=(opt_units, fleet_context), width='stretch')
+            else:
+                st.caption("No feasible fleet mix found for this plant.")
+
+        # --- 收益模型计算 (逻辑更新：Total Benefit = Savings + Extra Revenue，与批量 ROI 共用同一公式) ---
+        # 场景测算 (逐时污损仿真 -> 收益模型 -> 逐年现金流) 在 cleanuva.roi 中完成，与本地 API 共用
+        scenario_result = roi.evaluate_scenario(
+            s, fleet_model, selected_fleet, fleet_result, soiling=p_soiling, window=p_window,
+            hourly=gen_model == "Hourly simulation", soiling_days=p_soiling_days, degradation=p_degradation, profile=profile,
+            max_loss=p_soiling_loss or None,
+            horizon=cf_horizon, discount_rate=cf_rate / 100, opex_escalation=cf_opex_esc, price_escalation=cf_price_esc)
+        econ, soiling_sim, cash_flow = scenario_result["econ"], scenario_result["soiling_sim"], scenario_result["cash_flow"]
+        annual_manual_saving = float(econ['annual_manual_saving'])
+        # 发电增收：逐时仿真首年结果，或 MW * 1000 * 8760h * 容量系数 * 提升率 * 电价
+        annual_gen_gain = float(econ['annual_gen_gain'])
+        net_benefit = float(econ['net_benefit'])
+        # 回本年限：采用你定义的累计收益覆盖 CAPEX 逻辑
+        payback_yrs = float(econ['payback_yrs'])
+
+        # --- 测算结果指标展示 (修复 NameError: 移除 suggested_qty 引用) ---
+        st.sidebar.markdown(f"""
+        <div class='metric-card'>
+            <p style='color:#8b949e; font-size:11px; margin:0;'>TOTAL INVESTMENT (CAPEX)</p>
+            <h3 style='color:#ffffff; margin:0;'>$ {total_initial_capex:,.0f}</h3>
+            <p style='color:#58a6ff; font-size:12px; margin:0;'>Fleet Configuration Applied</p>
+        </div>
+        <div class='metric-card'>
+            <p style='color:#8b949e; font-size:11px; margin:0;'>PAYBACK PERIOD</p>
+            <h3 style='color:#f0ad4e; margin:0;'>{payback_yrs:.2f} Years</h3>
+            <p style='color:#8b949e; font-size:10px; margin:0;'>Based on Saving + Generation Gain</p>
+        </div>
+        """, unsafe_allow_html=True)
 
-            # 汇总计算 (周期产能、投入总额、运维支出)
-            total_fleet_cycle_cap += q_fleet * d_spec['Capacity'] * p_shifts * p_window
-            total_initial_capex += q_fleet * custom_unit_price
-            total_annual_robot_opex += (d_spec.get('Consumable', 500) * s['Freq'] + d_spec.get('Warranty', 390)) * q_fleet
-
-    # 产能达标看板 (Engineering Adequacy Check)
-    is_adequate = total_fleet_cycle_cap >= s['Plant']
-    status_color = "#58a6ff" if is_adequate else "#ff4b4b"
-    st.sidebar.markdown(f"""
-    <div style='border:1px solid {status_color}; padding:10px; border-radius:5px; margin-bottom:15px; background:rgba(0,0,0,0.2);'>
-        <p style='color:#8b949e; font-size:11px; margin:0;'>FLEET CAPACITY CHECK</p>
-        <p style='color:{status_color}; font-size:16px; font-weight:bold; margin:0;'>{total_fleet_cycle_cap:.1f} MW / cycle</p>
-        <p style='color:#666; font-size:10px; margin:0;'>Target: {s['Plant']} MW | Adequacy: {'YES' if is_adequate else 'NO (Add Units)'}</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # --- 收益模型计算 (逻辑更新：Total Benefit = Savings + Extra Revenue) ---
-    total_capex = total_initial_capex
-    annual_manual_saving = (s['Plant'] * s['Manual'] * s['Freq']) - total_annual_robot_opex
+        # --- [增量] 侧边栏：测算期 (Analysis Horizon) 内的长期效益指标 ---
+        horizon_benefit = float(econ['total_benefit'])
+        horizon_roi = float(econ['roi'])
     
-    # 发电增收计算公式：MW * 1000 * 8760h * 容量系数 * 提升率 * 电价
-    annual_gen_gain = (s['Plant'] * 1000 * 8760 * (s.get('CapFactor', 17)/100)) * (p_soiling/100) * s['ElecPrice']
-    
-    net_benefit = annual_manual_saving + annual_gen_gain
-    # 回本年限：采用你定义的累计收益覆盖 CAPEX 逻辑
-    payback_yrs = total_capex / net_benefit if net_benefit > 0 else 99
-
-    # --- 测算结果指标展示 (修复 NameError: 移除 suggested_qty 引用) ---
-    st.sidebar.markdown(f"""
-    <div class='metric-card'>
-        <p style='color:#8b949e; font-size:11px; margin:0;'>TOTAL INVESTMENT (CAPEX)</p>
-        <h3 style='color:#ffffff; margin:0;'>$ {total_initial_capex:,.0f}</h3>
-        <p style='color:#58a6ff; font-size:12px; margin:0;'>Fleet Configuration Applied</p>
-    </div>
-    <div class='metric-card'>
-        <p style='color:#8b949e; font-size:11px; margin:0;'>PAYBACK PERIOD</p>
-        <h3 style='color:#f0ad4e; margin:0;'>{payback_yrs:.2f} Years</h3>
-        <p style='color:#8b949e; font-size:10px; margin:0;'>Based on Saving + Generation Gain</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # --- [增量] 侧边栏：5 年长期效益指标 (对齐 Yearly 表逻辑) ---
-    total_5y_benefit = net_benefit * 5
-    roi_5y = (total_5y_benefit / total_initial_capex * 100) if total_initial_capex > 0 else 0
-    
-    st.sidebar.markdown(f"""
-    <div class='metric-card'>
-        <p style='color:#8b949e; font-size:11px; margin:0;'>5-YEAR PROJECTED PROFIT</p>
-        <h3 style='color:#58a6ff; margin:0;'>$ {total_5y_benefit:,.0f}</h3>
-        <p style='color:#8b949e; font-size:10px; margin:0;'>Cumulative ROI (5Y): {roi_5y:.1f}%</p>
-    </div>
-    """, unsafe_allow_html=True)
+        st.sidebar.markdown(f"""
+        <div class='metric-card'>
+            <p style='color:#8b949e; font-size:11px; margin:0;'>{cf_horizon}-YEAR PROJECTED PROFIT</p>
+            <h3 style='color:#58a6ff; margin:0;'>$ {horizon_benefit:,.0f}</h3>
+            <p style='color:#8b949e; font-size:10px; margin:0;'>Cumulative ROI ({cf_horizon}Y): {horizon_roi:.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        economics = {
+            "scenario": s, "fleet_model": fleet_model, "selected_fleet": selected_fleet, "fleet_result": fleet_result,
+            "p_soiling": p_soiling, "total_initial_capex": total_initial_capex,
+            "total_annual_robot_opex": total_annual_robot_opex, "annual_gen_gain": annual_gen_gain,
+            "net_benefit": net_benefit, "payback_yrs": payback_yrs, "soiling_sim": soiling_sim,
+            "cash_flow": cash_flow, "horizon": cf_horizon, "discount_rate": cf_rate, "opex_escalation": cf_opex_esc,
+            "price_escalation": cf_price_esc, "degradation": p_degradation,
+        }
+
+    # 依赖经济模型结果的部分：写入各自 Tab，随本 fragment 一起重算
+    with tab_roi:
+        financial_outlook(economics)
+    with tab_sens:
+        sensitivity_analysis(economics)
+    show_render_time("Economic model", t0, st.sidebar)
 
 # --- 5. 主界面：多维工作区 (严格保留所有对比逻辑) ---
-# 创建三个 Tab，分别对应：参数对比、报价生成、效益分析
-tab_compare, tab_quote, tab_roi = st.tabs([
+# 创建五个 Tab，分别对应：参数对比、报价生成、效益分析、全部场景批量 ROI、敏感性分析
+tab_compare, tab_quote, tab_roi, tab_batch, tab_sens = st.tabs([
     "📊 Product Battlecards", 
     "📜 Quotation Builder", 
-    "📈 Financial Outlook"
+    "📈 Financial Outlook",
+    "🗂️ Portfolio ROI",
+    "🎯 Sensitivity"
 ])
 
 # --- 5. 主界面：产品参数对比 (完全保留原有功能) ---
-import base64
+from cleanuva import battlecard, competitors, images
 
-# --- 辅助函数：将本地图片转为网页可显示的 Base64 编码 ---
-def get_image_base64(path):
-    try:
-        with open(path, "rb") as f:
-            data = base64.b64encode(f.read()).decode()
-        return f"data:image/png;base64,{data}"
-    except:
-        return None
+# --- 辅助函数：产品渲染图 (缩略图 + 静态文件服务，替代每次重跑都内联数 MB 的 Base64 PNG) ---
+def render_image_file(model):
+    # 自动寻找对应的图片，例如 NuvaSpan.png
+    return f"{model.replace(' ', '_')}.png"
 
-with tab_compare:
+@st.cache_resource
+def warm_render_images(models):
+    # 启动时预生成缩略图并写入 static/，进程内所有会话共享
+    return images.warm([render_image_file(m) for m in models], st.get_option("server.enableStaticServing"))
+
+def get_render_src(model):
+    return images.render_src(render_image_file(model), st.get_option("server.enableStaticServing"))
+
+if df_our is not None:
+    warm_render_images(tuple(df_our['Model'].unique()))
+
+# --- 辅助函数：Battlecard 宽表构建器 (按 products.xlsx 两个 sheet 的版本号缓存，DataFrame 参数不参与哈希) ---
+@metrics.cached(st.cache_resource(max_entries=4), "battlecard_builder")
+def get_battlecard_builder(version, _df_our, _df_comp):
+    return battlecard.BattlecardBuilder(_df_our, _df_comp)
+
+# 竞品参数索引 (数值解析 + 按参数排序的列式索引)，与 Battlecard 共用数据版本
+@metrics.cached(st.cache_resource(max_entries=4), "competitor_index")
+def get_competitor_index(version, _df_our, _df_comp):
+    return competitors.CompetitorIndex(_df_our, _df_comp)
+
+def battlecard_version():
+    return data.versions((("products.xlsx", "Our_Products"), ("products.xlsx", "Competitors")))
+
+@st.fragment
+def product_battlecards():
     # --- 5. 主界面：产品参数对比 (带机器人渲染图版) ---
+    t0 = time.perf_counter()
     st.title("☀️ Cleanuva | Global Product Hub")
 
     if df_our is not None:
@@ -225,103 +413,122 @@ with tab_compare:
         selected = st.multiselect("Models to Display:", options=all_models, default=all_models[:2])
 
         if selected:
-            full_df = pd.concat([df_our, df_comp]) if df_comp is not None else df_our
-            compare_df = full_df[full_df['Model'].isin(selected)]
-            
-            # 建立数据透视表
-            pivot_df = compare_df.pivot_table(
-                index=['Primary Category', 'Secondary Parameter'], 
-                columns='Model', 
-                values='Value', 
-                aggfunc='first'
-            ).reset_index()
-
-            # --- 开始构建带图片的 HTML 表格 ---
-            html = "<table class='autohome-table'>"
-            
-            # 第一行：显示机器人渲染图
-            html += "<tr style='background-color: #1c2128;'><td class='param-name'>Product Render</td>"
-            for m in selected:
-                # 自动寻找对应的图片，例如 NuvaSpan.png
-                img_file = f"{m.replace(' ', '_')}.png" 
-                img_base64 = get_image_base64(img_file)
-                if img_base64:
-                    html += f"<td><img src='{img_base64}' style='width:180px; border-radius:8px; margin:10px;'></td>"
-                else:
-                    html += "<td><div style='height:120px; display:flex; align-items:center; justify-content:center; color:#444; font-size:12px;'>Image not found<br>({img_file})</div></td>"
-            html += "</tr>"
-
-            # 第二行：显示型号名称
-            html += "<tr class='model-header'><td class='param-name'>Model Name</td>"
-            for m in selected:
-                html += f"<td>{m}</td>"
-            html += "</tr>"
-
-            # 后续数据行
-            current_cat = ""
-            for _, row in pivot_df.iterrows():
-                # 插入分类标题行 (如 Technical, Power 等)
-                if str(row['Primary Category']) != current_cat:
-                    current_cat = str(row['Primary Category'])
-                    html += f"<tr><td colspan='{len(selected)+1}' class='cat-header'>■ {current_cat}</td></tr>"
-                
-                # 检查参数是否一致，不一致则高亮 (diff-row)
-                vals = [str(row[m]) for m in selected]
-                row_class = "diff-row" if len(set(vals)) > 1 and len(selected) > 1 else ""
-                
-                html += f"<tr class='{row_class}'><td class='param-name'>{row['Secondary Parameter']}</td>"
-                for m in selected:
-                    val = row[m]
-                    html += f"<td>{val if str(val) != 'nan' else '--'}</td>"
-                html += "</tr>"
-                
-            html += "</table>"
+            # 参数 × 型号宽表每个数据版本只构建一次，HTML 按 (选中型号, 图片地址) 缓存
+            builder = get_battlecard_builder(battlecard_version(), df_our, df_comp)
+            html = builder.html(
+                selected,
+                image_srcs=[get_render_src(m) for m in selected],
+                image_files=[render_image_file(m) for m in selected],
+            )
             
             # 在 Streamlit 中渲染 HTML
             st.markdown(html, unsafe_allow_html=True)
 
-with tab_quote:
+        # 竞品检索：按数值参数筛选 + 与我方型号最接近的竞品
+        if show_comp and df_comp is not None:
+            with st.expander("🔎 Competitor Finder (Internal Only)", expanded=False):
+                comp_index = get_competitor_index(battlecard_version(), df_our, df_comp)
+                param_df = comp_index.params()
+                filter_params = st.multiselect("Filter by Parameter:", param_df["Parameter"].tolist(), key="comp_filter_params")
+                filters = []
+                for _, p in param_df[param_df["Parameter"].isin(filter_params)].iterrows():
+                    col_op, col_v = st.columns([1, 3])
+                    op = col_op.selectbox(p["Parameter"], competitors.OPERATORS, index=2, key=f"comp_op_{p['Parameter']}")
+                    value = col_v.number_input(f"{p['Parameter']} ({p['Unit'] or '-'})", value=float(p["Min"]),
+                                               key=f"comp_value_{p['Parameter']}")
+                    filters.append((p["Parameter"], op, value))
+                st.dataframe(comp_index.query(filters), hide_index=True, width='stretch')
+
+                ref_model = st.selectbox("Nearest Competitors to:", df_our['Model'].unique().tolist(), key="comp_nearest_to")
+                st.dataframe(comp_index.nearest(ref_model), hide_index=True, width='stretch',
+                             column_config={"Distance": st.column_config.NumberColumn(format="%.2f",
+                                            help="Standardized distance over the numeric parameters both models publish.")})
+    show_render_time("Battlecards", t0)
+
+with tab_compare:
+    product_battlecards()
+
+# --- 辅助函数：报价 PDF (生成逻辑在 cleanuva.quote_pdf，首次出 PDF 时才加载 ReportLab；批量出单在 cleanuva.quote_batch) ---
+from cleanuva import export, history, quote_batch
+from cleanuva.pricing import CURRENCIES, PriceBook
+
+PRICE_SHEETS = tuple(key for key in DATABASE_SHEETS if key[0] == quote_batch.PRICE_BOOK)
+
+# 定价索引 (型号 -> 适用选件、(目的地, 物流方式) -> 运费) 按价格本版本只构建一次
+@metrics.cached(st.cache_resource(max_entries=4), "price_book")
+def get_price_book(version, _df_base, _df_sku, _df_settings, _df_shipping):
+    return PriceBook(_df_base, _df_sku, _df_settings, _df_shipping, version=version)
+
+# 报价 / ROI 历史 (本地 SQLite + 文件目录)，进程内所有会话共用一个实例
+@st.cache_resource
+def get_history():
+    return history.ResultStore()
+
+def render_quote_pdf(quote, client):
+    """单张报价：同一配置 (含客户与价格本版本) 在有效期内直接取历史中已生成的 PDF。"""
+    pdf, _ = quote_batch.quote_pdf_bytes(quote, quote_version(), client, get_history())
+    return pdf
+
+def quote_version():
+    return data.versions(PRICE_SHEETS)
+
+
+def build_results_workbook(**kwargs):
+    """测算结果工作簿 (参数见 cleanuva.export.export_results)，以 write-only 模式写入内存并返回 xlsx 字节。"""
+    buffer = io.BytesIO()
+    with metrics.span("export.workbook"):
+        export.export_results(buffer, "xlsx", **kwargs)
+    return buffer.getvalue()
+
+
+def build_quote_zip(orders, price_book):
+    """批量报价：渲染全部订单并返回 zip 字节 (下载按钮点击时才执行)。"""
+    buffer = io.BytesIO()
+    quote_batch.render_batch(orders, price_book, buffer, workers=os.cpu_count(), history_dir=get_history().root)
+    return buffer.getvalue()
+
+
+@st.fragment
+def quotation_builder():
     # --- 6. 全球报价配置系统 (Global Quotation Builder) ---
+    t0 = time.perf_counter()
     if df_base is not None and df_settings is not None:
         st.markdown("<br><br>", unsafe_allow_html=True)
         st.markdown("<h2 style='color: #f0ad4e;'>� Global Configuration & Quotation Hub</h2>", unsafe_allow_html=True)
         
-        # 【修复点 1】在这里初始化变量，防止后面 PDF 函数找不到它
-        user_selections = []
+        # 价格本索引按 Cleanuva_Price.xlsx 各 sheet 版本缓存，报价只做查表和数组运算
+        price_book = get_price_book(quote_version(), df_base, df_sku, df_settings, df_shipping)
 
         # 获取 Excel 中定义的汇率参数 (EUR 对 USD)
-        eur_to_usd = float(df_settings.loc['EUR_to_USD', 'Value'])
+        eur_to_usd = price_book.eur_to_usd
         
         # 报价基础配置栏
         col_cfg1, col_cfg2, col_cfg3 = st.columns([1, 1, 2])
         with col_cfg1:
             # 货币切换逻辑
             currency = st.radio("Currency Selection", ["EUR (€)", "USD ($)"], horizontal=True)
-            rate = 1.0 if "EUR" in currency else eur_to_usd
-            sym = "€" if "EUR" in currency else "$"
+            currency_code = currency[:3]
+            rate = price_book.rate(currency_code)
+            sym = CURRENCIES[currency_code]
         
         with col_cfg2:
-            # 物流及交货地点选择逻辑
-            dest_region = st.selectbox("Destination Region", df_shipping['Region'].unique())
-            methods = df_shipping[df_shipping['Region'] == dest_region]
-            ship_method = st.selectbox("Shipping Mode", methods['Delivery_Method'].tolist())
-            # 从 Excel 获取对应的欧元运费成本
-            ship_cost_base = methods[methods['Delivery_Method'] == ship_method]['Cost_EUR'].values[0]
-
-        # --- IMPORTANT FIX: Define 'm_info' BEFORE using it in columns ---
-        # 【核心修复】：在进入 columns 之前就定义好选中的型号数据
-        sel_model = st.selectbox("Core Robot Platform", df_base['Model_Name'].tolist(), key="main_model_select")
-        m_info = df_base[df_base['Model_Name'] == sel_model].iloc[0]
-        # -----------------------------------------------------------
+            # 物流及交货地点选择逻辑 (目的地 -> 物流方式 -> 运费 均为预先建好的查找表)
+            dest_region = st.selectbox("Destination Region", price_book.regions)
+            ship_method = st.selectbox("Shipping Mode", price_book.methods(dest_region))
+
+        with col_cfg3:
+            # 客户名印在 PDF 上并写入报价历史 (可按客户检索)
+            quote_client = st.text_input("Client / Project", key="quote_client",
+                                         help="Printed on the PDF and used to search the quote history.")
 
         with st.container():
             c_left, c_right = st.columns([1, 2])
             
             with c_left:
-                # 第一步：选择整机型号
+                # 第一步：选择整机型号 (只查一次，选件过滤与 PDF 共用同一行数据)
                 st.markdown("#### 1. System Selection")
-                sel_model = st.selectbox("Core Robot Platform", df_base['Model_Name'].tolist())
-                m_data = df_base[df_base['Model_Name'] == sel_model].iloc[0]
+                sel_model = st.selectbox("Core Robot Platform", price_book.model_names, key="main_model_select")
+                m_data = price_book.model(sel_model)
                 
                 # 计算并显示换算后的整机基础价
                 base_p_conv = m_data['Price_EUR'] * rate
@@ -335,43 +542,29 @@ with tab_quote:
 
             with c_right:
                 st.markdown("#### 2. Options & Logistics")
-                # 过滤可选配件
-                valid_skus = df_sku[(df_sku['Applicable_To'] == 'ALL') | (df_sku['Applicable_To'].str.contains(m_info['Model_ID']))]
-                
-                # 初始化选件总价
-                opt_total = 0
-
-                # 遍历并显示每个选配件
-                for _, row in valid_skus.iterrows():
-                    # 换算当前选件的单价
-                    p_opt_conv = row['Price_EUR'] * rate
-                    
-                    # --- 关键修复：创建列变量 ---
-                    col_n, col_p, col_q = st.columns([3, 1.5, 1])
-                    
-                    with col_n:
-                        st.write(f"**{row['Item_Name']}**")
-                    with col_p:
-                        st.write(f"{sym} {p_opt_conv:,.0f}")
-                    with col_q:
-                        # 获取用户输入的数量
-                        qty = st.number_input("Qty", min_value=0, step=1, key=f"sku_input_{row['SKU_ID']}")
-                    
-                    # 如果数量大于 0，累加到总价并记录到 PDF 清单
-                    if qty > 0:
-                        opt_total += (p_opt_conv * qty)
-                        user_selections.append({
-                            "name": row['Item_Name'], 
-                            "price": p_opt_conv, 
-                            "qty": qty
-                        })
-                
-                # 计算并展示运费 (自动根据目的地换算)
-                ship_total = ship_cost_base * rate
+                # 全部适用选件放在一个表格里填写数量：选件再多也只有一个组件，
+                # 按型号区分 key，切换币种时已填数量保留
+                sku_grid = st.data_editor(
+                    price_book.options(sel_model, currency_code),
+                    key=f"sku_grid_{m_data['Model_ID']}",
+                    hide_index=True,
+                    width='stretch',
+                    disabled=["Item", "Unit price"],
+                    column_config={
+                        "Item": st.column_config.TextColumn("Item"),
+                        "Unit price": st.column_config.NumberColumn(f"Unit price ({sym})", format="localized"),
+                        "Qty": st.column_config.NumberColumn("Qty", min_value=0, step=1),
+                    },
+                )
+
+                # 整篮选件 + 运费一次计算，结果同时用于汇总卡片和 PDF
+                quote = price_book.price_basket(sel_model, sku_grid["Qty"].to_numpy(), dest_region, ship_method, currency_code)
+                user_selections = quote["selected_skus"]
+                ship_total = quote["ship_cost"]
                 st.markdown(f"**Logistics Charge ({ship_method}):** {sym} {ship_total:,.0f}")
 
         # 计算最终总计
-        grand_total = base_p_conv + opt_total + ship_total
+        grand_total = quote["total_price"]
 
         # 最终报价汇总卡片 (如果免运费显示蓝色边框，否则显示金黄色边框)
         st.markdown(f"""
@@ -390,113 +583,6 @@ with tab_quote:
         </div>
         """, unsafe_allow_html=True)
 
-    # 同步 Excel 按钮逻辑
-    if st.sidebar.button("� Sync with Excel"):
-        st.cache_data.clear()
-        st.rerun()
-
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    import io
-
-    # --- 7. PDF 生成函数 (修复重叠与 Logo 显示问题) ---
-    def generate_pdf_quote(model_name, inclusions, selected_skus, ship_method, ship_cost, total_price, currency_sym):
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        # --- 绘制页眉背景 ---
-        p.setFillColor(colors.HexColor("#161b22"))
-        p.rect(0, height - 1.5*inch, width, 1.5*inch, fill=1)
-        
-        # --- 修复 1：调整 Logo 绘制顺序和位置 ---
-        # 先画背景再画 Logo，确保 Logo 在最上层
-        try:
-            # 调整了 Y 坐标，确保在 1.5inch 的页眉区域内居中
-            p.drawImage("logo_b.png", 0.5*inch, height - 1.1*inch, width=1.5*inch, preserveAspectRatio=True, mask='auto')
-        except:
-            p.setFillColor(colors.white)
-            p.setFont("Helvetica-Bold", 24)
-            p.drawString(0.5*inch, height - 0.8*inch, "CLEANUVA")
-        
-        # 页眉文字
-        p.setFillColor(colors.white)
-        p.setFont("Helvetica", 10)
-        p.drawRightString(width - 0.5*inch, height - 0.8*inch, "OFFICIAL SALES QUOTATION")
-        p.drawRightString(width - 0.5*inch, height - 1.0*inch, f"REF: {pd.Timestamp.now().strftime('%Y%m%d%H%M')}")
-        
-        # --- 基础信息区域 ---
-        p.setFillColor(colors.black)
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(0.5*inch, height - 2*inch, f"Product Model: {model_name}")
-        p.setFont("Helvetica", 10)
-        p.drawString(0.5*inch, height - 2.2*inch, f"Date: {pd.Timestamp.now().strftime('%Y-%m-%d')}")
-        p.drawString(0.5*inch, height - 2.4*inch, f"Shipping Terms: {ship_method}")
-
-        # 1. Standard inclusions
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(0.5*inch, height - 3*inch, "1. Standard Package Includes:")
-        p.setFont("Helvetica", 10)
-        y_pos = height - 3.2*inch
-        for item in inclusions.split(','):
-            p.drawString(0.7*inch, y_pos, f"- {item.strip()}")
-            y_pos -= 0.15*inch
-
-        # 2. Options 表头
-        y_pos -= 0.4*inch
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(0.5*inch, y_pos, "2. Custom Options & Logistics:")
-        
-        y_pos -= 0.3*inch
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(0.7*inch, y_pos, "Item Description")
-        p.drawString(4*inch, y_pos, "Qty")
-        p.drawString(5*inch, y_pos, "Subtotal")
-        p.line(0.5*inch, y_pos - 0.05*inch, 5.5*inch, y_pos - 0.05*inch)
-
-        # --- 修复 2：动态计算 Y 轴位置，防止重叠 ---
-        p.setFont("Helvetica", 10)
-        y_pos -= 0.2*inch
-        for item in selected_skus:
-            # 如果项目太多快到底部了，简单处理：这里可以加分页逻辑，或者缩小间距
-            p.drawString(0.7*inch, y_pos, item['name'])
-            p.drawString(4.1*inch, y_pos, str(item['qty']))
-            p.drawString(5*inch, y_pos, f"{currency_sym} {item['price']*item['qty']:,.2f}")
-            y_pos -= 0.2*inch
-
-        # 打印运费
-        p.drawString(0.7*inch, y_pos, f"Logistics Charge ({ship_method})")
-        p.drawString(4.1*inch, y_pos, "1")
-        p.drawString(5*inch, y_pos, f"{currency_sym} {ship_cost:,.2f}")
-
-        # --- 修复核心：无论上面有多少项，总价框都跟在最后一项后面，而不是固定死位置 ---
-        # 我们给 y_pos 下移一段距离再画总价框
-        y_pos -= 0.6*inch 
-        
-        # 如果 y_pos 太低（比如小于 1.5 inch），PDF 可能会画到纸外面
-        # 正常配件量不会遇到，这里我们预留足够空间
-        p.setStrokeColor(colors.HexColor("#f0ad4e"))
-        p.setLineWidth(1)
-        p.roundRect(3.5*inch, y_pos, 2*inch, 0.4*inch, 5, stroke=1, fill=0)
-        
-        p.setFont("Helvetica-Bold", 11)
-        # 调整文字在框内居中显示
-        p.drawString(3.6*inch, y_pos + 0.15*inch, "GRAND TOTAL:")
-        p.drawRightString(5.4*inch, y_pos + 0.15*inch, f"{currency_sym} {total_price:,.2f}")
-
-        # 页脚
-        p.setFont("Helvetica-Oblique", 8)
-        p.setFillColor(colors.gray)
-        footer_text = "* Valid for 30 days. All prices exclude local import duties and taxes."
-        p.drawCentredString(width/2, 0.5*inch, footer_text)
-
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return buffer
-
     # --- 8. 显示下载 PDF 按钮 (PDF Download Section) ---
     st.markdown("<br>", unsafe_allow_html=True)
     col_pdf, _ = st.columns([1, 3])
@@ -504,58 +590,326 @@ with tab_quote:
     with col_pdf:
         # 检查总价是否大于 0 且变量已定义
         if 'grand_total' in locals() and grand_total > 0:
-            pdf_data = generate_pdf_quote(
-                sel_model, 
-                str(m_data['Standard_Includes']), 
-                user_selections, 
-                ship_method, 
-                ship_total, 
-                grand_total, 
-                sym
-            )
-            
+            # PDF 只在点击下载时才生成 (data 传入可调用对象)，调整选件时不再每次重跑都重绘一遍
             st.download_button(
                 label="� Download Official Quote (PDF)",
-                data=pdf_data,
+                # 同一配置在报价有效期内只渲染一次，REF 编号由配置内容哈希得到
+                data=functools.partial(render_quote_pdf, dict(quote, selected_skus=list(user_selections)), quote_client.strip()),
                 file_name=f"Cleanuva_Quote_{sel_model}_{pd.Timestamp.now().strftime('%Y%m%d')}.pdf",
                 mime="application/pdf",
+                on_click="ignore",
                 width='stretch'  # 这里也要改
             )
 
-# [增量] 5年财务展望分析
-with tab_roi:
-    st.markdown("### 📈 5-Year Financial & ROI Analysis")
-    if 'total_initial_capex' in locals() and total_initial_capex > 0:
-        # 抓取 Yearly 表逻辑：计算 5 年累计现金流
-        chart_years = ["Year 0 (Inv.)", "Year 1", "Year 2", "Year 3", "Year 4", "Year 5"]
-        cumulative_cash_flow = [-total_initial_capex]
-        for year in range(1, 6):
-            # 累计值 = (年度收益 * 年份) - 初始投入
-            cumulative_cash_flow.append((net_benefit * year) - total_initial_capex)
-        
-        roi_df = pd.DataFrame({"Timeline": chart_years, "Net Cash Flow ($)": cumulative_cash_flow})
-        
-        # 绘制回本曲线图
-        st.area_chart(roi_df.set_index("Timeline"), width='stretch')
-        
+    # --- 9. 批量报价 (上传 CSV / JSONL 订单，多进程并行生成 PDF 并打包下载) ---
+    if df_base is not None and df_settings is not None:
+        with st.expander("📦 Bulk Quotes (CSV / JSONL)"):
+            st.caption("Columns: order_id, model, skus (e.g. S01:2;S03:1), region, shipping_mode, currency (EUR/USD).")
+            orders_file = st.file_uploader("Order file", type=["csv", "jsonl"], key="bulk_orders")
+            if orders_file is not None:
+                try:
+                    bulk_orders = quote_batch.read_orders(orders_file.getvalue(), orders_file.name)
+                except (KeyError, ValueError) as e:
+                    st.error(f"Cannot parse order file: {e}")
+                    bulk_orders = []
+                if bulk_orders:
+                    st.write(f"{len(bulk_orders)} orders loaded.")
+                    col_zip, col_items = st.columns(2)
+                    col_zip.download_button(
+                        label=f"📥 Generate & Download {len(bulk_orders)} Quotes (ZIP)",
+                        data=functools.partial(build_quote_zip, bulk_orders, price_book),
+                        file_name=f"Cleanuva_Quotes_{pd.Timestamp.now().strftime('%Y%m%d')}.zip",
+                        mime="application/zip",
+                        on_click="ignore",
+                    )
+                    col_items.download_button(
+                        label="📊 Download Line Items (Excel)",
+                        data=functools.partial(build_results_workbook, orders=bulk_orders, price_book=price_book,
+                                               version=quote_version()),
+                        file_name=f"Cleanuva_Quote_Items_{pd.Timestamp.now().strftime('%Y%m%d')}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        on_click="ignore",
+                    )
+
+    # --- 10. 报价 / ROI 历史检索 (按客户、型号、日期) ---
+    with st.expander("🗄️ Quote & ROI History"):
+        store = get_history()
+        col_c, col_m, col_k, col_d = st.columns([2, 2, 1, 2])
+        h_client = col_c.text_input("Client contains", key="hist_client")
+        h_model = col_m.text_input("Model contains", key="hist_model")
+        h_kind = col_k.selectbox("Type", ["All", "quote", "roi"], key="hist_kind")
+        today = pd.Timestamp.now(tz="UTC").date()
+        h_dates = col_d.date_input("Created (UTC)", (today - pd.Timedelta(days=history.QUOTE_VALIDITY_DAYS), today), key="hist_dates")
+        since, until = (h_dates[0], h_dates[-1]) if len(h_dates) else (None, None)
+        hist_df = store.search(h_client, h_model, None if h_kind == "All" else h_kind, since,
+                               pd.Timestamp(until) + pd.Timedelta(days=1) if until else None)
+        stats = store.stats()
+        st.caption(f"{stats['entries']} stored results, {stats['bytes'] / 1e6:,.1f} MB of {stats['max_bytes'] / 1e6:,.0f} MB "
+                   f"(least recently used entries are evicted beyond {stats['max_entries']:,} entries or the size limit).")
+        st.dataframe(hist_df.drop(columns="Key"), hide_index=True, width='stretch')
+        if len(hist_df):
+            h_pick = st.selectbox("Download", range(len(hist_df)), key="hist_pick",
+                                  format_func=lambda i: f"{hist_df['Created (UTC)'].iloc[i]} · {hist_df['Kind'].iloc[i]} · "
+                                                        f"{hist_df['Client'].iloc[i] or '-'} · {hist_df['Model'].iloc[i] or '-'}")
+            h_key, h_kind_pick = hist_df['Key'].iloc[h_pick], hist_df['Kind'].iloc[h_pick]
+            st.download_button(
+                label="📥 Download Stored File",
+                data=functools.partial(store.load, h_key),
+                file_name=f"Cleanuva_{h_kind_pick}_{h_key[:10]}.{'pdf' if h_kind_pick == 'quote' else 'csv'}",
+                mime="application/pdf" if h_kind_pick == "quote" else "text/csv",
+                on_click="ignore",
+            )
+    show_render_time("Quotation", t0)
+
+with tab_quote:
+    quotation_builder()
+
+# [增量] 多年财务展望分析 (逐年现金流，年限 / 折现率 / 上涨率见侧边栏 Cash-flow Assumptions)
+def financial_outlook(economics):
+    t0 = time.perf_counter()
+    horizon = economics["horizon"] if economics else 5
+    st.markdown(f"### 📈 {horizon}-Year Financial & ROI Analysis")
+    if economics and economics["total_initial_capex"] > 0:
+        annual_gen_gain = economics["annual_gen_gain"]
+        total_annual_robot_opex = economics["total_annual_robot_opex"]
+        cash_flow = economics["cash_flow"]
+        years = np.arange(horizon + 1)
+        timeline = pd.Index(["Year 0 (Inv.)"] + [f"Year {t}" for t in years[1:]], name="Timeline")
+
+        c_npv, c_irr, c_pb, c_dpb = st.columns(4)
+        c_npv.metric(f"NPV @ {economics['discount_rate']:.1f}%", f"$ {float(cash_flow['npv']):,.0f}")
+        c_irr.metric("IRR", f"{float(cash_flow['irr']):,.1f}%" if np.isfinite(cash_flow['irr']) else "n/a")
+        for col, label, value in [(c_pb, "Payback", cash_flow['payback_yrs']), (c_dpb, "Discounted Payback", cash_flow['discounted_payback_yrs'])]:
+            col.metric(label, f"{float(value):.2f} yrs" if value < cashflow.NO_PAYBACK else f"> {horizon} yrs")
+
+        # 累计现金流 (名义 / 折现)：设备更换年份出现回落
+        roi_df = pd.DataFrame({
+            "Cumulative Cash Flow ($)": cash_flow["cumulative"],
+            "Discounted Cumulative ($)": cash_flow["discounted_cumulative"],
+        }, index=timeline)
+        st.line_chart(roi_df, width='stretch')
+        st.caption(f"Labor & OPEX escalate {economics['opex_escalation']:.1f}%/yr, electricity price {economics['price_escalation']:.1f}%/yr, "
+                   f"panels degrade {economics['degradation']:.1f}%/yr; robots are repurchased at the end of their lifetime.")
+
         # --- [增量] 增加：发电损失挽回分析 (针对不清洗客户的止损逻辑) ---
         st.markdown("<br><h3 style='color: #58a6ff;'>💎 Revenue Recovery Analysis</h3>", unsafe_allow_html=True)
-        
-        # 逻辑：即使之前不清洗（人工费为0），如果不洗，每年丢掉的电费（annual_gen_gain）也是巨大的
+
+        # 逻辑：即使之前不清洗（人工费为0），如果不洗，每年丢掉的电费（annual_gen_gain）也是巨大的；逐年按上涨率 / 衰减率变化
+        k = years[1:] - 1
         recovery_data = pd.DataFrame({
-            'Year': [f"Year {i}" for i in range(1, 6)],
-            'Potential Revenue Loss (No Clean)': [annual_gen_gain] * 5,
-            'Robot Operation Cost': [total_annual_robot_opex] * 5
-        }).set_index('Year')
+            'Potential Revenue Loss (No Clean)': annual_gen_gain * ((1 + economics['price_escalation'] / 100) * (1 - economics['degradation'] / 100)) ** k,
+            'Robot Operation Cost': total_annual_robot_opex * (1 + economics['opex_escalation'] / 100) ** k,
+        }, index=timeline[1:].rename('Year'))
 
         # 使用堆叠柱状图，直观展示“损失”与“投入”的悬殊比例
         st.bar_chart(recovery_data, width='stretch')
-        
+
         st.info(f"💡 **The Cost of Doing Nothing:** By not cleaning, you are effectively losing **${annual_gen_gain:,.0f}** in potential revenue every year. "
                 f"The robotic solution recovers this massive loss with an annual maintenance cost of only **${total_annual_robot_opex:,.0f}**.")
-        
+
+        # 逐时仿真：首年每日平均污损损失 (锯齿随清洗周期起伏)
+        soiling_sim = economics.get("soiling_sim")
+        if soiling_sim is not None:
+            st.markdown("#### 🌦️ Soiling Loss Profile (Year 1, daily mean)")
+            daily_loss = soiling_sim["hourly_loss"].reshape(-1, 24).mean(axis=1)
+            st.line_chart(pd.DataFrame({"Soiling loss (%)": daily_loss}, index=pd.RangeIndex(1, len(daily_loss) + 1, name="Day")),
+                          width='stretch')
+            st.caption(f"Weighted mean loss {soiling_sim['mean_loss']:.2f}% with robotic cleaning vs {soiling_sim['max_loss']:.2f}% uncleaned: "
+                       f"the fleet recovers {soiling_sim['recovery']:.2f} percentage points of generation in year 1 "
+                       f"(Soiling Recovery target {economics['p_soiling']:.2f}%).")
+
         # 显示回本结论
-        st.success(f"💰 Projected Breakeven Point: **{payback_yrs:.2f}** years.")
+        if cash_flow["payback_yrs"] < cashflow.NO_PAYBACK:
+            st.success(f"💰 Projected Breakeven Point: **{float(cash_flow['payback_yrs']):.2f}** years.")
+        else:
+            st.warning(f"The investment does not break even within {horizon} years.")
         st.info("📊 Logic: This forecast includes both Manual Savings and Extra Generation Gains.")
+
+        # 把本次测算 (场景 + 机队 + 逐年现金流) 存入历史，按内容哈希去重
+        if st.button("💾 Save ROI Run to History"):
+            s = economics["scenario"]
+            fleet = {d: int(q) for d, q in zip(economics["selected_fleet"], economics["fleet_result"].quantities)}
+            flows_df = pd.DataFrame({"Cash Flow": cash_flow["flows"], "Cumulative": cash_flow["cumulative"],
+                                     "Discounted Cumulative": cash_flow["discounted_cumulative"]}, index=timeline)
+            summary = {"CAPEX": economics["total_initial_capex"], "NPV": float(cash_flow["npv"]), "IRR (%)": float(cash_flow["irr"]),
+                       "Payback (years)": float(cash_flow["payback_yrs"]), "Horizon": horizon}
+            _, key, hit = get_history().cached(
+                "roi", {"scenario": s.to_dict(), "fleet": fleet, "flows": np.round(cash_flow["flows"], 2)},
+                lambda key: flows_df.to_csv().encode("utf-8"), client=str(s['Client/Project']),
+                model=", ".join(f"{q}× {d}" for d, q in fleet.items()), summary=summary, ext=".csv")
+            st.success(f"{'Already in' if hit else 'Saved to'} history as ROI-{key[:10].upper()}.")
+    else:
+        st.warning("Please configure your Fleet Setup in the sidebar to view the financial projection.")
+    show_render_time("Financial outlook", t0)
+
+# [增量] Scenarios 表全部项目批量 ROI (无需逐个切换侧边栏案例)
+@st.fragment
+def portfolio_roi():
+    t0 = time.perf_counter()
+    st.markdown("### 🗂️ Portfolio ROI (All Scenarios)")
+    if df_sce is not None and df_dev is not None:
+        batch_fleet = st.multiselect(
+            "Fleet Mix for All Scenarios:",
+            options=df_dev['Device'].tolist(),
+            default=st.session_state.get("fleet_mix") or df_dev['Device'].tolist()[:1],
+            help="Each scenario is sized with the suggested units for this mix, using its own window, shifts and redundancy."
+        )
+        if batch_fleet:
+            batch_model = get_fleet_model(data.version("Cleanuva_Economic_Model_v1.xlsx", "Devices"), df_dev)
+            # 发电增收口径与侧边栏 Generation Model 一致
+            roi_options = dict(hourly=st.session_state.get("gen_model", "Flat annual formula") == "Hourly simulation",
+                               soiling_days=st.session_state.get("soiling_days", soiling.DEFAULT_SOILING_DAYS),
+                               degradation=st.session_state.get("degradation", cashflow.DEFAULT_DEGRADATION),
+                               discount_rate=st.session_state.get("cf_rate", cashflow.DEFAULT_DISCOUNT_RATE * 100) / 100,
+                               opex_escalation=st.session_state.get("cf_opex_esc", cashflow.DEFAULT_OPEX_ESCALATION),
+                               price_escalation=st.session_state.get("cf_price_esc", cashflow.DEFAULT_PRICE_ESCALATION))
+            batch_df = roi.batch_roi(df_sce, batch_model, batch_fleet, **roi_options)
+            # st.dataframe 自带按列排序
+            st.dataframe(batch_df, width='stretch', hide_index=True, column_config={
+                c: st.column_config.NumberColumn(format="%.0f") for c in
+                ["CAPEX", "Annual manual cost", "Annual robot cost", "Annual savings", "Extra revenue", "Net benefit", "NPV"]
+            })
+            col_csv, col_xlsx = st.columns(2)
+            col_csv.download_button(
+                label="⬇️ Export Portfolio ROI (CSV)",
+                data=batch_df.to_csv(index=False).encode("utf-8"),
+                file_name=f"Cleanuva_Portfolio_ROI_{pd.Timestamp.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+            # Summary / Yearly / Fleet / Assumptions 工作簿，点击下载时才测算并写出
+            col_xlsx.download_button(
+                label="📊 Export Results Workbook (Excel)",
+                data=functools.partial(build_results_workbook, scenario_chunks=[df_sce], fleet_model=batch_model, devices=batch_fleet,
+                                       version=data.versions([("Cleanuva_Economic_Model_v1.xlsx", "Scenarios"),
+                                                              ("Cleanuva_Economic_Model_v1.xlsx", "Devices")]), **roi_options),
+                file_name=f"Cleanuva_Results_{pd.Timestamp.now().strftime('%Y%m%d')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore",
+            )
+        else:
+            st.warning("Select at least one device to evaluate the portfolio.")
+    show_render_time("Portfolio ROI", t0)
+
+# [增量] 敏感性分析 (龙卷风图 / 二维网格 / Monte Carlo)，结果按场景基准 + 输入区间缓存
+@metrics.cached(st.cache_data(max_entries=32), "tornado")
+def run_tornado(case, ranges, metric):
+    return sensitivity.tornado(case, ranges, metric)
+
+@metrics.cached(st.cache_data(max_entries=32), "sensitivity_grid")
+def run_grid(case, x_name, x_values, y_name, y_values, metric):
+    return sensitivity.grid(case, x_name, x_values, y_name, y_values, metric)
+
+@metrics.cached(st.cache_data(max_entries=16), "monte_carlo")
+def run_monte_carlo(case, dists, n, metric, workers):
+    # 只缓存分位数与直方图，不缓存百万级样本本身
+    return sensitivity.summarize(sensitivity.monte_carlo(case, dists, n, metric, workers=workers))
+
+# 敏感性分析自身的控件只重算本 fragment；经济模型变化时随上游一起重算
+@st.fragment
+def sensitivity_analysis(economics):
+    t0 = time.perf_counter()
+    st.markdown("### 🎯 Sensitivity & Risk Analysis")
+    if economics and economics["total_initial_capex"] > 0:
+        s = economics["scenario"]
+        fleet_model = economics["fleet_model"]
+        selected_fleet = economics["selected_fleet"]
+        fleet_result = economics["fleet_result"]
+        p_soiling = economics["p_soiling"]
+        fleet_idx = fleet_model.indices(selected_fleet)
+        soiling_sim = economics.get("soiling_sim")
+        sens_case = sensitivity.make_case(s, fleet_result, fleet_model.consumable[fleet_idx], fleet_model.warranty[fleet_idx],
+                                          p_soiling, s.get('CapFactor', roi.DEFAULT_CAPFACTOR),
+                                          years=economics["horizon"], recovery=soiling_sim["recovery"] if soiling_sim else None,
+                                          lifetime=fleet_model.lifetime[fleet_idx], discount_rate=economics["discount_rate"] / 100,
+                                          opex_escalation=economics["opex_escalation"], price_escalation=economics["price_escalation"],
+                                          degradation=economics["degradation"])
+        col_m, col_r = st.columns(2)
+        with col_m:
+            sens_metric = st.selectbox("Output Metric", list(sensitivity.METRICS), format_func=sensitivity.METRICS.get)
+        with col_r:
+            spread = st.slider("Input Range (± %)", 5, 50, 20,
+                               help="Each uncertain input varies between base × (1 - range) and base × (1 + range).")
+        uncertain = ["soiling", "elec_price", "capfactor", "manual", "unit_price"]
+        ranges = {v: (sens_case[v] * (1 - spread / 100), sens_case[v] * (1 + spread / 100)) for v in uncertain}
+
+        # 龙卷风图：单因素偏离基准的影响
+        tornado_df, base_val = run_tornado(sens_case, ranges, sens_metric)
+        st.markdown(f"#### 🌪️ Tornado ({sensitivity.METRICS[sens_metric]}, base = {base_val:,.2f})")
+        st.bar_chart(tornado_df.set_index("Variable")[["At Low", "At High"]], horizontal=True, stack=False, width='stretch')
+
+        # 二维网格：默认坐标轴取自经济模型 Sensitivity 表 (Manual × Freq)
+        st.markdown("#### 🧮 Grid Sweep")
+        try:
+            freq_axis, manual_axis = sensitivity.sheet_axes(data.frame("Cleanuva_Economic_Model_v1.xlsx", "Sensitivity"))
+        except Exception:
+            freq_axis, manual_axis = [], []
+        freq_axis = freq_axis or [4, 6, 8, 10, 12]
+        manual_axis = manual_axis or [1200, 1800, 2200, 2600, 3000]
+        grid_df = run_grid(sens_case, "freq", tuple(freq_axis), "manual", tuple(manual_axis), sens_metric)
+        st.dataframe(grid_df.style.format("{:,.2f}"), width='stretch')
+
+        # Monte Carlo：三角分布 (最小, 基准, 最大)，百万级样本一次广播计算
+        st.markdown("#### 🎲 Monte Carlo")
+        col_n, col_w = st.columns(2)
+        with col_n:
+            n_samples = st.select_slider("Samples", options=[100_000, 1_000_000, 2_000_000, 5_000_000], value=1_000_000)
+        with col_w:
+            mc_workers = st.number_input("Worker Processes", min_value=1, max_value=os.cpu_count() or 1, value=1)
+        dists = {v: (lo, sens_case[v], hi) for v, (lo, hi) in ranges.items()}
+        mc_stats, mc_hist = run_monte_carlo(sens_case, dists, n_samples, sens_metric, int(mc_workers))
+        c5, c50, c95 = st.columns(3)
+        c5.metric("P5", f"{mc_stats['p5']:,.2f}")
+        c50.metric("P50", f"{mc_stats['p50']:,.2f}")
+        c95.metric("P95", f"{mc_stats['p95']:,.2f}")
+        st.bar_chart(mc_hist, width='stretch')
     else:
-        st.warning("Please configure your Fleet Setup in the sidebar to view the financial projection.")
\ No newline at end of file
+        st.warning("Please configure your Fleet Setup in the sidebar to run the sensitivity analysis.")
+    show_render_time("Sensitivity", t0)
+
+# --- 页面装配：经济模型 fragment 先运行 (批量 ROI 默认沿用其机队组合) ---
+economic_model()
+
+# 同步 Excel 按钮逻辑
+# 只重新解析实际发生变化的 sheet 并切换到新快照，其它缓存对象保持不动
+if st.sidebar.button("� Sync with Excel"):
+    get_data_store().refresh()
+    st.rerun()
+
+# 内存报告：共享表只有一份 (按表列出)，会话私有的只有 session_state
+if data is not None:
+    ctx = get_script_run_ctx()
+    get_data_store().touch(ctx.session_id if ctx else "local", sum(approx_bytes(v) for v in st.session_state.to_dict().values()))
+    with st.sidebar.expander("🧮 Memory Report", expanded=False):
+        mem = get_data_store().session_report()
+        st.dataframe(data.memory_report()[["Sheet", "Rows", "Categorical", "Bytes"]], hide_index=True, width='stretch')
+        own = mem["session_state_bytes"].get(ctx.session_id if ctx else "local", 0)
+        st.caption(f"Snapshot #{data.serial} shared by {mem['sessions']} active session(s): "
+                   f"{mem['shared_bytes'] / 1024:,.1f} KB in total, {mem['shared_bytes_per_session'] / 1024:,.1f} KB per session "
+                   f"(a per-session copy would be {mem['copy_bytes_per_session'] / 1024:,.1f} KB). "
+                   f"This session's own state: {own / 1024:,.1f} KB.")
+
+with tab_batch:
+    portfolio_roi()
+
+# 性能面板 (?admin=1)：各区间耗时分位数、缓存命中率、p95 走势及最近一次采样报告
+metrics.record("app.full_rerun", (time.perf_counter() - RUN_T0) * 1000)
+if profiler is not None:
+    # 只采样一次：报告存入会话，去掉 URL 参数，之后的重跑不再采样
+    st.session_state["profile_report"] = profiler.stop()
+    del st.query_params["profile"]
+
+if st.query_params.get("admin") == "1":
+    with st.sidebar.expander("🛠️ Performance", expanded=False):
+        st.dataframe(metrics.METRICS.summary(), hide_index=True, width='stretch',
+                     column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ["p50 (ms)", "p95 (ms)", "Max (ms)", "Last (ms)"]})
+        thumbs = images.cache_stats()
+        st.dataframe(metrics.METRICS.cache_summary({"thumbnail": (thumbs["hits"], thumbs["misses"])}), hide_index=True, width='stretch',
+                     column_config={"Hit rate": st.column_config.NumberColumn(format="percent")})
+        timeline = metrics.METRICS.timeline()
+        if len(timeline):
+            st.caption("p95 per minute (ms)")
+            st.line_chart(timeline)
+        if "profile_report" in st.session_state:
+            st.code(st.session_state["profile_report"], language=None)
+        st.caption("Append ?profile=cpu or ?profile=mem to the URL to capture the next rerun. "
+                   f"Set {metrics.LOG_ENV} to also append every sample to a JSONL file.")
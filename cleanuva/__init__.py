@@ -0,0 +1,14 @@
+# Cleanuva Hub 计算核心 (数据加载、缓存等可在 Streamlit 之外复用的逻辑)
+# 子模块按需导入：import cleanuva 不加载任何子模块，cleanuva.roi 等首次访问时才导入 (ReportLab / PIL 只在出 PDF / 缩略图时加载)
+import importlib
+
+
+def __getattr__(name):
+    if name.startswith("_"):
+        raise AttributeError(name)
+    try:
+        return importlib.import_module(f"{__name__}.{name}")
+    except ModuleNotFoundError as e:
+        if e.name != f"{__name__}.{name}":
+            raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,427 @@
+"""本地 HTTP / JSON 服务：不经过 Streamlit 直接调用报价、机队测算与 ROI (供 CRM 等系统批量调用)。
+
+计算全部复用 cleanuva 各模块，与页面口径一致；工作簿按 sheet 版本增量加载，派生对象 (价格本、机队模型)
+按版本缓存。PDF (ReportLab) 只在请求 /quote/pdf 时才导入，服务冷启动只加载 numpy / pandas。
+
+接口 (请求与响应均为 JSON；批量接口接收 {"items": [...]} 或直接一个数组，逐项返回 ok / error)：
+    GET  /health                 数据版本
+    GET  /scenarios              Scenarios 表 (Client/Project 等)
+    GET  /devices                Devices 表
+    POST /quote                  {"model", "skus", "region", "shipping_mode", "currency"} -> 报价明细
+    POST /quote/batch            多张报价
+    POST /quote/pdf              同 /quote，另可带 "client"，返回 application/pdf
+    POST /fleet                  {"plant", "window", "shifts", "freq", "fleet", ...} -> 建议台数与机队测算
+    POST /roi                    {"scenario", "fleet", ...} -> 单个场景的收益测算 (同侧边栏，gen_model 缺省为 flat)
+    POST /roi/batch              多个场景 / 配置
+    POST /portfolio              {"fleet": [...], ...} -> Scenarios 表全部场景批量 ROI
+
+比例类参数 (soiling、degradation、discount_rate、escalation) 与侧边栏一致，单位均为 %。
+
+用法：
+    python -m cleanuva.api --port 8750
+    curl -s localhost:8750/quote -d '{"model": "M01", "skus": "S01:2", "region": "Germany", "shipping_mode": "Land Transport"}'
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import cashflow, metrics, roi, soiling
+from cleanuva.fleet import DEFAULT_REDUNDANCY, FleetModel
+from cleanuva.loader import DATABASE_SHEETS, WorkbookLoader
+from cleanuva.pricing import PriceBook, PricingError, parse_skus
+from cleanuva.store import DataStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+# 距上次检查工作簿超过该秒数才重新检查 (stat 文件)，高频请求不必每次都检查
+REFRESH_SECONDS = 2.0
+MAX_BODY_BYTES = 16 * 1024 * 1024
+ECONOMIC_MODEL = "Cleanuva_Economic_Model_v1.xlsx"
+PRICE_SHEETS = tuple(key for key in DATABASE_SHEETS if key[0] == "Cleanuva_Price.xlsx")
+API_SHEETS = PRICE_SHEETS + ((ECONOMIC_MODEL, "Scenarios"), (ECONOMIC_MODEL, "Devices"))
+
+
+class RequestError(ValueError):
+    """请求内容不完整或取值无效 (返回 400)。"""
+
+
+def _jsonable(value):
+    """numpy / pandas 取值转为 JSON 可序列化的 Python 对象；NaN / inf 转为 null。"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, pd.DataFrame):
+        return _jsonable(value.to_dict(orient="records"))
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _number(value, name, positive=False, integer=False, minimum=0.0, maximum=None):
+    """请求中的数值字段：非数值、NaN / inf、超出 [minimum, maximum] (positive=True 时不含 0) 或非整数台数均返回 400。"""
+    if isinstance(value, bool):
+        raise RequestError(f"'{name}' must be a number, got {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"'{name}' must be a number, got {value!r}") from None
+    if not math.isfinite(number) or (positive and number <= 0):
+        raise RequestError(f"'{name}' must be positive, got {value!r}")
+    if number < minimum or (maximum is not None and number > maximum):
+        bound = f"between {minimum:g} and {maximum:g}" if maximum is not None else f"at least {minimum:g}"
+        raise RequestError(f"'{name}' must be {bound}, got {value!r}")
+    if integer:
+        if number != int(number):
+            raise RequestError(f"'{name}' must be a whole number, got {value!r}")
+        return int(number)
+    return number
+
+
+def _option(req, name, default=None, **bounds):
+    """可选数值字段：缺省或 null 时返回 default，否则按 _number 校验。"""
+    value = req.get(name)
+    return default if value is None else _number(value, name, **bounds)
+
+
+# 百分比 (%) 与逐年上涨率的取值范围
+PERCENT = {"maximum": 100.0}
+ESCALATION = {"minimum": -100.0, "maximum": 100.0}
+# 场景 overrides 中数值列的校验 (与 Scenarios 表同名)；未列出的列 (Notes 等) 原样使用
+SCENARIO_NUMBERS = {
+    "Plant": {"positive": True}, "Window": {"positive": True}, "Shifts": {"positive": True},
+    "Freq": {"positive": True}, "Manual": {}, "ElecPrice": {}, "Soiling": PERCENT, "CapFactor": PERCENT,
+    "Redundancy": {"positive": True}, "Horizon": {"positive": True},
+    "SoilingDays": {"positive": True}, "SoilingLoss": PERCENT,
+}
+
+
+def _items(body):
+    items = body.get("items") if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        raise RequestError("Expected a JSON array or {\"items\": [...]}")
+    return items
+
+
+class Engine:
+    """无界面计算核心：工作簿 -> 价格本 / 机队模型 / 场景表，派生对象按 sheet 版本缓存，可被多线程共用。"""
+
+    def __init__(self, base_dir=".", snapshot_dir=None, refresh_seconds=REFRESH_SECONDS, history_dir=None):
+        self.store = DataStore(WorkbookLoader(API_SHEETS, base_dir=base_dir, snapshot_dir=snapshot_dir))
+        self.refresh_seconds = refresh_seconds
+        self.history_dir = history_dir
+        self._derived = {}
+        self._lock = threading.Lock()
+        self._checked = None
+        self._history = None
+
+    def _snapshot(self):
+        now = time.monotonic()
+        if self._checked is None or now - self._checked > self.refresh_seconds:
+            self._checked = now
+            self.store.refresh()
+        return self.store.current()
+
+    def _derive(self, name, keys, build):
+        """按 keys 的版本缓存 build(快照) 的结果 (每个名称只保留最新版本)。"""
+        snap = self._snapshot()
+        version = snap.versions(keys)
+        cached = self._derived.get(name)
+        if cached is None or cached[0] != version:
+            with self._lock:
+                cached = self._derived.get(name)
+                if cached is None or cached[0] != version:
+                    cached = (version, build(snap, version))
+                    self._derived[name] = cached
+        return cached[1]
+
+    def price_book(self):
+        def build(snap, version):
+            df_base, df_sku, df_settings, df_shipping = snap.frames(PRICE_SHEETS)
+            return PriceBook(df_base, df_sku, df_settings.set_index("Parameter"), df_shipping, version=version)
+        return self._derive("price_book", PRICE_SHEETS, build)
+
+    def fleet_model(self):
+        return self._derive("fleet_model", ((ECONOMIC_MODEL, "Devices"),),
+                            lambda snap, version: FleetModel(snap.frame(ECONOMIC_MODEL, "Devices")))
+
+    def scenarios(self):
+        return self._snapshot().frame(ECONOMIC_MODEL, "Scenarios")
+
+    def _scenario_rows(self):
+        """Client/Project -> 场景行 (dict)，按 Scenarios 版本缓存；逐个请求查表不必再过滤 DataFrame。"""
+        return self._derive("scenario_rows", ((ECONOMIC_MODEL, "Scenarios"),), lambda snap, version: {
+            str(row["Client/Project"]): row for row in snap.frame(ECONOMIC_MODEL, "Scenarios").to_dict(orient="records")})
+
+    def devices(self):
+        return self._snapshot().frame(ECONOMIC_MODEL, "Devices")
+
+    def versions(self):
+        snap = self._snapshot()
+        return {f"{book}:{sheet}": snap.version(book, sheet) for book, sheet in API_SHEETS}
+
+    # --- 报价 ---
+    def quote(self, order):
+        try:
+            return self.price_book().price_order(
+                order["model"], parse_skus(order.get("skus")), order["region"], order["shipping_mode"],
+                str(order.get("currency") or "EUR").upper())
+        except KeyError as e:
+            raise RequestError(f"Missing or unknown field: {e}") from None
+
+    def quote_pdf(self, order):
+        """报价 PDF 字节；服务带 history_dir 时按报价内容复用已生成的文件。"""
+        # 只有 PDF 接口需要 ReportLab，首次请求时才导入
+        from cleanuva import history, quote_batch
+
+        if self.history_dir and self._history is None:
+            with self._lock:
+                if self._history is None:
+                    self._history = history.ResultStore(self.history_dir)
+        pdf, _ = quote_batch.quote_pdf_bytes(self.quote(order), self.price_book().version, order.get("client"), self._history)
+        return pdf
+
+    # --- 机队 / ROI ---
+    def _fleet_devices(self, req):
+        """校验请求中的 fleet (设备名列表或 {设备: 台数})，返回 (fleet, 设备列表)。"""
+        fleet = req.get("fleet")
+        if not isinstance(fleet, (list, dict)) or not fleet:
+            raise RequestError("'fleet' must be a non-empty list of devices or a {device: units} object")
+        devices = list(fleet)
+        known = set(self.fleet_model().names)
+        unknown = [d for d in devices if not isinstance(d, str) or d not in known]
+        if unknown:
+            raise RequestError(f"Unknown device(s): {', '.join(map(str, unknown))}")
+        return fleet, devices
+
+    @staticmethod
+    def _fleet_units(fleet, devices):
+        """{设备: 台数} 时返回台数数组，设备列表时返回 None (按建议台数)。"""
+        if not isinstance(fleet, dict):
+            return None
+        return np.array([_number(fleet[d], f"fleet.{d}", integer=True) for d in devices], dtype=int)
+
+    def _fleet_args(self, req, plant, window, shifts, redundancy):
+        """请求中的 fleet 可为设备列表 (取建议台数) 或 {设备: 台数}；unit_prices 为 {设备: 单价}。"""
+        model = self.fleet_model()
+        fleet, devices = self._fleet_devices(req)
+        units = self._fleet_units(fleet, devices)
+        if units is None:
+            units = model.suggested_units(devices, plant, window, shifts, redundancy)
+        prices = req.get("unit_prices") or {}
+        if not isinstance(prices, dict):
+            raise RequestError("'unit_prices' must be a {device: price} object")
+        unit_prices = model.unit_price[model.indices(devices)].copy()
+        for i, d in enumerate(devices):
+            if d in prices:
+                unit_prices[i] = _number(prices[d], f"unit_prices.{d}")
+        return model, devices, units, unit_prices
+
+    def fleet(self, req):
+        missing = [k for k in ("plant", "window", "shifts", "freq") if k not in req]
+        if missing:
+            raise RequestError(f"Missing field: {', '.join(missing)}")
+        plant, window, shifts = (_number(req[k], k, positive=True) for k in ("plant", "window", "shifts"))
+        freq = _number(req["freq"], "freq", positive=True)
+        redundancy = _number(req.get("redundancy", DEFAULT_REDUNDANCY), "redundancy", positive=True)
+        model, devices, units, unit_prices = self._fleet_args(req, plant, window, shifts, redundancy)
+        result = model.evaluate(devices, units, unit_prices, shifts=shifts, window=window, freq=freq, plant=plant)
+        return {
+            "devices": result.per_device(),
+            "total_cycle_cap": result.total_cycle_cap, "total_capex": result.total_capex, "total_opex": result.total_opex,
+            "is_adequate": result.is_adequate,
+        }
+
+    def _scenario(self, req):
+        """按 Client/Project 取 Scenarios 表的一行，再用 overrides 覆盖 (也可不指定场景、全部由 overrides 给出)。"""
+        row = {}
+        name = req.get("scenario")
+        if name is not None:
+            row = self._scenario_rows().get(str(name))
+            if row is None:
+                raise RequestError(f"Unknown scenario: {name}")
+        overrides = req.get("overrides") or {}
+        if not isinstance(overrides, dict):
+            raise RequestError("'overrides' must be an object of Scenarios columns")
+        overrides = {k: _number(v, k, **SCENARIO_NUMBERS[k]) if k in SCENARIO_NUMBERS and v is not None else v
+                     for k, v in overrides.items()}
+        row = {**row, **overrides}
+        missing = [c for c in ("Plant", "Manual", "Freq", "Soiling", "ElecPrice", "Window", "Shifts") if c not in row]
+        if missing:
+            raise RequestError(f"Scenario is missing: {', '.join(missing)}")
+        return pd.Series(row)
+
+    def roi(self, req):
+        """单个场景的收益测算，参数与侧边栏一致 (window / shifts / soiling 覆盖场景值，gen_model 为 hourly 或 flat)。"""
+        s = self._scenario(req)
+        window = _option(req, "window", s["Window"], positive=True)
+        shifts = _option(req, "shifts", s["Shifts"], positive=True)
+        redundancy = s.get("Redundancy")
+        redundancy = DEFAULT_REDUNDANCY if redundancy is None or pd.isna(redundancy) else float(redundancy)
+        model, devices, units, unit_prices = self._fleet_args(req, s["Plant"], window, shifts, redundancy)
+        fleet_result = model.evaluate(devices, units, unit_prices, shifts=shifts, window=window, freq=s["Freq"], plant=s["Plant"])
+        result = roi.evaluate_scenario(
+            s, model, devices, fleet_result, soiling=_option(req, "soiling", **PERCENT), window=window,
+            hourly=req.get("gen_model", "flat") == "hourly",
+            soiling_days=_option(req, "soiling_days", positive=True),
+            max_loss=_option(req, "soiling_loss", **PERCENT),
+            horizon=_option(req, "horizon", positive=True), **self._cash_options(req))
+        econ, cash = result["econ"], result["cash_flow"]
+        return {
+            "scenario": s.get("Client/Project"),
+            "fleet": dict(zip(devices, units.tolist())),
+            "total_cycle_cap": fleet_result.total_cycle_cap, "is_adequate": fleet_result.is_adequate,
+            "capex": fleet_result.total_capex, "annual_robot_opex": fleet_result.total_opex,
+            **{k: econ[k] for k in ("annual_manual_cost", "annual_manual_saving", "annual_gen_gain", "net_benefit", "payback_yrs")},
+            "horizon": result["horizon"], "npv": cash["npv"], "irr": cash["irr"],
+            # 逐年现金流口径 (含上涨、衰减与更换) 的回本年限；payback_yrs 为侧边栏的首年简化口径
+            "cash_payback_yrs": cash["payback_yrs"], "discounted_payback_yrs": cash["discounted_payback_yrs"],
+            "cash_flows": cash["flows"],
+        }
+
+    def portfolio(self, req):
+        """Scenarios 表全部场景批量 ROI：fleet 为设备列表时每个场景按其窗口期 / 班次 / 冗余系数取建议台数，
+        为 {设备: 台数} 时所有场景使用同一组台数。"""
+        fleet, devices = self._fleet_devices(req)
+        df = roi.batch_roi(
+            self.scenarios(), self.fleet_model(), devices, quantities=self._fleet_units(fleet, devices),
+            hourly=req.get("gen_model", "flat") == "hourly",
+            soiling_days=_option(req, "soiling_days", soiling.DEFAULT_SOILING_DAYS, positive=True), **self._cash_options(req))
+        return {"rows": df}
+
+    @staticmethod
+    def _cash_options(req):
+        """逐年现金流参数 (%，同侧边栏 Cash-flow Assumptions)。"""
+        return {
+            "degradation": _option(req, "degradation", cashflow.DEFAULT_DEGRADATION, **PERCENT),
+            "discount_rate": _option(req, "discount_rate", cashflow.DEFAULT_DISCOUNT_RATE * 100, **PERCENT) / 100,
+            "opex_escalation": _option(req, "opex_escalation", cashflow.DEFAULT_OPEX_ESCALATION, **ESCALATION),
+            "price_escalation": _option(req, "price_escalation", cashflow.DEFAULT_PRICE_ESCALATION, **ESCALATION),
+        }
+
+    def batch(self, fn, items):
+        """逐项执行，单项出错不影响其它项。"""
+        results = []
+        for item in items:
+            try:
+                results.append({"ok": True, "result": fn(item)})
+            except (RequestError, PricingError, KeyError, ValueError, TypeError) as e:
+                results.append({"ok": False, "error": str(e)})
+        return {"results": results}
+
+
+def make_handler(engine):
+    routes_get = {
+        "/health": lambda: {"status": "ok", "versions": engine.versions()},
+        "/scenarios": lambda: {"rows": engine.scenarios()},
+        "/devices": lambda: {"rows": engine.devices()},
+    }
+    routes_post = {
+        "/quote": engine.quote,
+        "/quote/batch": lambda body: engine.batch(engine.quote, _items(body)),
+        "/fleet": engine.fleet,
+        "/roi": engine.roi,
+        "/roi/batch": lambda body: engine.batch(engine.roi, _items(body)),
+        "/portfolio": engine.portfolio,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        # 保持连接，批量调用方可复用同一连接
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload, content_type="application/json"):
+            data = payload if isinstance(payload, bytes) else \
+                json.dumps(_jsonable(payload), ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, fn):
+            path = self.path.split("?", 1)[0].rstrip("/") or "/"
+            try:
+                with metrics.span(f"api{path.replace('/', '.')}"):
+                    fn(path)
+            except (RequestError, PricingError, ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+            except KeyError as e:
+                self._send(400, {"error": f"Missing or unknown field: {e}"})
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def do_GET(self):
+            def handle(path):
+                if path not in routes_get:
+                    return self._send(404, {"error": f"Unknown endpoint: {path}"})
+                self._send(200, routes_get[path]())
+            self._dispatch(handle)
+
+        def do_POST(self):
+            def handle(path):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    return self._send(413, {"error": f"Request body exceeds {MAX_BODY_BYTES} bytes"})
+                raw = self.rfile.read(length)
+                if path != "/quote/pdf" and path not in routes_post:
+                    return self._send(404, {"error": f"Unknown endpoint: {path}"})
+                try:
+                    body = json.loads(raw or b"{}")
+                except json.JSONDecodeError as e:
+                    raise RequestError(f"Invalid JSON: {e}") from None
+                if not isinstance(body, (dict, list)) or (isinstance(body, list) and not path.endswith("/batch")):
+                    raise RequestError("Expected a JSON object")
+                if path == "/quote/pdf":
+                    return self._send(200, engine.quote_pdf(body), "application/pdf")
+                self._send(200, routes_post[path](body))
+            self._dispatch(handle)
+
+        def log_message(self, format, *args):
+            # 批量调用时访问日志太多，只保留错误
+            pass
+
+    return Handler
+
+
+def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), make_handler(engine))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local JSON API for Cleanuva quotes, fleet sizing and ROI.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Bind address (default: localhost only).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--base-dir", default=".", help="Directory containing the workbooks.")
+    parser.add_argument("--snapshot-dir", default=None, help="Columnar snapshots written by python -m cleanuva.snapshot.")
+    parser.add_argument("--history", default=None, metavar="DIR", help="Reuse and record rendered PDF quotes in this directory.")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    engine = Engine(args.base_dir, args.snapshot_dir, history_dir=args.history)
+    engine.versions()
+    server = serve(engine, args.host, args.port)
+    print(f"Cleanuva API listening on http://{args.host}:{args.port} (data loaded in {time.perf_counter() - t0:.2f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import metrics
+from cleanuva.images import DISPLAY_WIDTH
+
+INDEX_COLS = ["Primary Category", "Secondary Parameter"]
+_MISSING_IMG = ("<td><div style='height:120px; display:flex; align-items:center; justify-content:center; "
+                "color:#444; font-size:12px;'>Image not found<br>({})</div></td>")
+
+
+def build_matrix(df_our, df_comp=None):
+    """参数 × 型号宽表 (行: 主分类 + 参数，列: 型号)，与原 pivot_table(aggfunc='first') 结果一致。"""
+    frames = [df_our] if df_comp is None else [df_our, df_comp]
+    long_df = pd.concat([f[INDEX_COLS + ["Model", "Value"]] for f in frames], ignore_index=True)
+    long_df = long_df.astype({c: object for c in INDEX_COLS + ["Model"]})
+    return long_df.groupby(INDEX_COLS + ["Model"], sort=True)["Value"].first().unstack("Model")
+
+
+class BattlecardBuilder:
+    """每个数据版本构建一次宽表，按 (选中型号, 图片地址) 缓存渲染好的 HTML 片段。"""
+
+    def __init__(self, df_our, df_comp=None, max_entries=128):
+        with metrics.span("battlecard.build_matrix"):
+            self.matrix = build_matrix(df_our, df_comp)
+        # 整表取值编码为整数 (NaN = -1)，差异判断只需比较整数列
+        codes, _ = pd.factorize(self.matrix.to_numpy().ravel(), use_na_sentinel=True)
+        codes = codes.reshape(self.matrix.shape).astype(np.int32)
+        self._codes = np.column_stack([codes, np.full(len(codes), -1, dtype=np.int32)])
+        # 预先生成每个单元格的 <td>，切换对比型号时只需按列切片、拼接
+        cells = "<td>" + self.matrix.where(self.matrix.notna(), "--").astype(str) + "</td>"
+        self._cells = np.column_stack([cells.to_numpy(), np.full(len(cells), "<td>--</td>", dtype=object)])
+        self._cols = self.matrix.columns
+        self._cat = self.matrix.index.get_level_values(0).astype(str).to_numpy()
+        self._param = self.matrix.index.get_level_values(1).astype(str).to_numpy()
+        self._html = OrderedDict()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _columns(self, selected):
+        # 未出现在参数表中的型号映射到末尾的哨兵列 (全为空值 / "--")
+        idx = self._cols.get_indexer(list(selected))
+        return np.where(idx < 0, len(self._cols), idx)
+
+    def compare(self, selected):
+        """返回 (保留行掩码, 差异标记)：至少一个型号有值的行保留；取值不全相同 (NaN 视为一种取值) 即为差异。"""
+        codes = self._codes[:, self._columns(selected)]
+        keep = (codes >= 0).any(axis=1)
+        diff = (codes != codes[:, :1]).any(axis=1) & (len(selected) > 1)
+        return keep, diff[keep]
+
+    def html(self, selected, image_srcs=None, image_files=None):
+        selected = tuple(selected)
+        image_srcs = tuple(image_srcs or (None,) * len(selected))
+        key = (selected, image_srcs)
+        with self._lock:
+            if key in self._html:
+                self._html.move_to_end(key)
+                metrics.count("battlecard_html", hit=True)
+                return self._html[key]
+
+        metrics.count("battlecard_html", hit=False)
+        with metrics.span("battlecard.render_html"):
+            out = self._render(selected, image_srcs, image_files or selected)
+        with self._lock:
+            self._html[key] = out
+            while len(self._html) > self.max_entries:
+                self._html.popitem(last=False)
+        return out
+
+    def _render(self, selected, image_srcs, image_files, img_width=DISPLAY_WIDTH):
+        keep, diff = self.compare(selected)
+        cells = self._cells[keep][:, self._columns(selected)]
+        cats, params = self._cat[keep], self._param[keep]
+
+        parts = ["<table class='autohome-table'>"]
+        # 第一行：显示机器人渲染图
+        parts.append("<tr style='background-color: #1c2128;'><td class='param-name'>Product Render</td>")
+        for src, img_file in zip(image_srcs, image_files):
+            if src:
+                parts.append(f"<td><img src='{src}' style='width:{img_width}px; border-radius:8px; margin:10px;'></td>")
+            else:
+                parts.append(_MISSING_IMG.format(img_file))
+        parts.append("</tr>")
+
+        # 第二行：显示型号名称
+        parts.append("<tr class='model-header'><td class='param-name'>Model Name</td>")
+        parts.extend(f"<td>{m}</td>" for m in selected)
+        parts.append("</tr>")
+
+        # 后续数据行：分类标题行 + 参数行 (不一致的参数高亮 diff-row)
+        current_cat = ""
+        colspan = len(selected) + 1
+        for cat, param, is_diff, row in zip(cats, params, diff, cells):
+            if cat != current_cat:
+                current_cat = cat
+                parts.append(f"<tr><td colspan='{colspan}' class='cat-header'>■ {cat}</td></tr>")
+            parts.append(f"<tr class='{'diff-row' if is_diff else ''}'><td class='param-name'>{param}</td>")
+            parts.append("".join(row))
+            parts.append("</tr>")
+        parts.append("</table>")
+        return "".join(parts)
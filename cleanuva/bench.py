@@ -0,0 +1,283 @@
+"""性能基准：按 1× / 10× / 100× 生成合成工作簿，脱离 Streamlit 测量各热点路径。
+
+生成的工作簿沿用真实文件的表结构，只放大行数 (型号、竞品、选件、场景、设备、物流规则)。
+结果写入 JSON；与阈值文件 (各规模、各项的中位耗时上限，单位 ms) 比对，超限时退出码为 1。
+
+用法：
+    python -m cleanuva.bench                         # 1× / 10× / 100×，比对 bench_thresholds.json
+    python -m cleanuva.bench --scales 1 10 -o bench_results.json
+    python -m cleanuva.bench --calibrate 3           # 以实测中位数 × 3 重写阈值文件
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import roi
+from cleanuva.battlecard import BattlecardBuilder
+from cleanuva.competitors import CompetitorIndex
+from cleanuva.fleet import FleetModel
+from cleanuva.loader import AUXILIARY_SHEETS, DATABASE_SHEETS, WorkbookLoader
+from cleanuva.pricing import PriceBook
+from cleanuva.store import DataStore
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_REPEAT = 5
+THRESHOLDS_PATH = "bench_thresholds.json"
+# 校准阈值的下限 (ms)：毫秒级的项目计时抖动大，避免误报
+MIN_THRESHOLD_MS = 10
+# 竞品检索基准的查询次数 (固定，便于观察单次延迟随竞品库规模的变化)
+COMPETITOR_LOOKUPS = 20
+# 需要生成的 sheet (其余 sheet 与基准无关，不写入合成工作簿)
+BOOKS = {}
+for _book, _sheet in DATABASE_SHEETS + AUXILIARY_SHEETS:
+    BOOKS.setdefault(_book, []).append(_sheet)
+
+
+def _replicate(df, scale, rename):
+    """整表复制 scale 份，第 i 份 (i >= 1) 经 rename(copy, i) 改名 / 扰动，保证键唯一。"""
+    parts = [df]
+    for i in range(1, scale):
+        parts.append(rename(df.copy(), i))
+    return pd.concat(parts, ignore_index=True)
+
+
+def synthetic_frames(base_dir=".", scale=1, seed=0):
+    """读取真实工作簿并按 scale 放大，返回 {book: {sheet: DataFrame}}。"""
+    rng = np.random.default_rng(seed)
+    src = {book: pd.read_excel(os.path.join(base_dir, book), sheet_name=sheets, engine="openpyxl")
+           for book, sheets in BOOKS.items()}
+    if scale <= 1:
+        return src
+
+    def models(df, i):
+        df["Model"] = df["Model"].astype(str) + f" {i}"
+        return df
+
+    def competitors(df, i):
+        df["Company"] = df["Company"].astype(str) + f" {i}"
+        return models(df, i)
+
+    def base_models(df, i):
+        df["Model_ID"] = df["Model_ID"].astype(str) + f"-{i}"
+        df["Model_Name"] = df["Model_Name"].astype(str) + f" {i}"
+        df["Price_EUR"] = (df["Price_EUR"] * rng.uniform(0.8, 1.2, len(df))).round()
+        return df
+
+    n_base = len(src["Cleanuva_Price.xlsx"]["Base_Models"])
+    base_ids = None
+
+    def skus(df, i):
+        df["SKU_ID"] = df["SKU_ID"].astype(str) + f"-{i}"
+        df["Item_Name"] = df["Item_Name"].astype(str) + f" Mk{i}"
+        # 适用型号随机取 1~3 个 (部分保留 ALL)
+        df["Applicable_To"] = [
+            value if value == "ALL" else ", ".join(rng.choice(base_ids, size=min(3, len(base_ids)), replace=False))
+            for value in df["Applicable_To"].astype(str)
+        ]
+        return df
+
+    def shipping(df, i):
+        df["Region"] = df["Region"].astype(str) + f" {i}"
+        df["Cost_EUR"] = (df["Cost_EUR"] * rng.uniform(0.8, 1.5, len(df))).round()
+        return df
+
+    def scenarios(df, i):
+        df["Client/Project"] = df["Client/Project"].astype(str) + f" #{i}"
+        for col in ("Plant", "Manual", "Freq"):
+            df[col] = np.maximum(1, (df[col] * rng.uniform(0.5, 2.0, len(df))).round()).astype(int)
+        df["Soiling"] = rng.uniform(0.5, 6.0, len(df)).round(1)
+        return df
+
+    def devices(df, i):
+        df["Device"] = df["Device"].astype(str) + f" {i}"
+        df["Unit price"] = (df["Unit price"] * rng.uniform(0.7, 1.3, len(df))).round()
+        df["Capacity"] = (df["Capacity"] * rng.uniform(0.7, 1.3, len(df))).round(2)
+        return df
+
+    out = {book: dict(sheets) for book, sheets in src.items()}
+    products, price, econ = out["products.xlsx"], out["Cleanuva_Price.xlsx"], out["Cleanuva_Economic_Model_v1.xlsx"]
+    products["Our_Products"] = _replicate(products["Our_Products"], scale, models)
+    products["Competitors"] = _replicate(products["Competitors"], scale, competitors)
+    price["Base_Models"] = _replicate(price["Base_Models"], scale, base_models)
+    base_ids = price["Base_Models"]["Model_ID"].astype(str).to_numpy()[:n_base * scale]
+    price["SKU_Library"] = _replicate(price["SKU_Library"], scale, skus)
+    price["Shipping_Rules"] = _replicate(price["Shipping_Rules"], scale, shipping)
+    econ["Scenarios"] = _replicate(econ["Scenarios"], scale, scenarios)
+    econ["Devices"] = _replicate(econ["Devices"], scale, devices)
+    return out
+
+
+def write_workbooks(out_dir, frames):
+    os.makedirs(out_dir, exist_ok=True)
+    for book, sheets in frames.items():
+        with pd.ExcelWriter(os.path.join(out_dir, book), engine="openpyxl") as writer:
+            for sheet, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet, index=False)
+
+
+def _time(fn, repeat, setup=None):
+    """运行 repeat 次 (setup 不计时)，返回耗时统计 (ms) 及最后一次的返回值。"""
+    samples, result = [], None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        result = fn(arg) if setup else fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "runs": repeat,
+    }, result
+
+
+def run_scale(workdir, repeat=DEFAULT_REPEAT):
+    """在一套 (合成) 工作簿上测量全部热点路径。"""
+    results = {}
+
+    # 1. 数据加载：冷启动解析 Excel + 压缩 dtype 构建共享快照 (对应原 load_all_databases)
+    def load():
+        return DataStore(WorkbookLoader(DATABASE_SHEETS + AUXILIARY_SHEETS, base_dir=workdir)).current()
+    results["load_databases"], data = _time(load, max(1, repeat // 2))
+    df_our, df_comp, df_sce, df_dev, df_base, df_sku, df_settings, df_shipping = data.frames(DATABASE_SHEETS)
+    df_settings = df_settings.set_index("Parameter")
+
+    # 2. Battlecard：参数 × 型号宽表 (pivot) 与 HTML (每次用新的构建器，不命中 HTML 缓存)
+    results["battlecard_pivot"], builder = _time(lambda: BattlecardBuilder(df_our, df_comp), repeat)
+    selected = list(dict.fromkeys(df_our["Model"].astype(str)))[:6] + list(dict.fromkeys(df_comp["Model"].astype(str)))[:6]
+    srcs = [None] * len(selected)
+    results["battlecard_html"], _ = _time(lambda b: b.html(selected, srcs, srcs), repeat,
+                                          setup=lambda: BattlecardBuilder(df_our, df_comp))
+
+    # 竞品检索：构建索引，再对前 COMPETITOR_LOOKUPS 个我方型号各做一次双条件筛选 + 最近竞品
+    results["competitor_index"], index = _time(lambda: CompetitorIndex(df_our, df_comp), repeat)
+    params = index.params()
+
+    def competitor_queries():
+        filters = [(p, ">=", v) for p, v in zip(params["Parameter"][:2], params["Min"][:2])]
+        for model in list(dict.fromkeys(df_our["Model"].astype(str)))[:COMPETITOR_LOOKUPS]:
+            index.query(filters)
+            index.nearest(model)
+    results["competitor_query"], _ = _time(competitor_queries, repeat)
+
+    # 3. 机队 / ROI：整支机队测算 + 全部场景批量 ROI
+    fleet_model = FleetModel(df_dev)
+    devices = list(fleet_model.names[:3])
+
+    def fleet_roi():
+        fleet_model.evaluate(list(fleet_model.names), np.ones(len(fleet_model.names)), shifts=1, window=7, freq=6, plant=10)
+        return roi.batch_roi(df_sce, fleet_model, devices)
+    results["fleet_roi"], _ = _time(fleet_roi, repeat)
+    # 全部场景的 8760 h 污损仿真 (每个场景一次)
+    cycle_cap = fleet_model.evaluate(devices, np.ones(len(devices)), plant=df_sce["Plant"].to_numpy(dtype=float)).total_cycle_cap
+    results["soiling_hourly"], _ = _time(lambda: roi.hourly_gen_gain(df_sce, cycle_cap), repeat)
+
+    # 4. 报价：构建价格本索引 + 每个型号整篮选件计价
+    results["price_book_build"], book = _time(lambda: PriceBook(df_base, df_sku, df_settings, df_shipping), repeat)
+    region = book.regions[0]
+    method = book.methods(region)[0]
+
+    def price_all():
+        for model in book.model_ids:
+            qty = np.ones(len(book.options(model)))
+            book.price_basket(model, qty, region, method, "USD")
+    results["quote_pricing"], _ = _time(price_all, repeat)
+
+    # 5. PDF：选件行数随目录规模增长 (至少 1 页)；ReportLab 到这里才导入，导入耗时不计入
+    from cleanuva.quote_pdf import generate_pdf_quote
+
+    quote = book.price_order(book.model_ids[0], {sku: 1 for sku in book.options(book.model_ids[0]).index}, region, method)
+    lines = quote["selected_skus"] * max(1, len(df_sku) // max(1, len(quote["selected_skus"])))
+    quote["selected_skus"] = lines
+    results["generate_pdf_quote"], _ = _time(lambda: generate_pdf_quote(**quote), repeat)
+
+    sizes = {f"{b}:{s}": len(data.frame(b, s)) for b, s in DATABASE_SHEETS}
+    sizes["pdf_lines"] = len(lines)
+    return results, sizes
+
+
+def check(results, thresholds):
+    """返回超出阈值的项目列表 [(规模, 项目, 实测中位数, 阈值)]。"""
+    failures = []
+    for scale, limits in thresholds.items():
+        for name, limit in limits.items():
+            measured = results.get(scale, {}).get(name)
+            if measured is not None and measured["median_ms"] > limit:
+                failures.append((scale, name, measured["median_ms"], limit))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Cleanuva hot paths on synthetic scaled workbooks.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="Scale factors to run.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark.")
+    parser.add_argument("--base-dir", default=".", help="Directory containing the source workbooks.")
+    parser.add_argument("--workdir", default=None, help="Where to write synthetic workbooks (default: temp dir).")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Results JSON file.")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="Thresholds JSON file (median ms per benchmark).")
+    parser.add_argument("--calibrate", type=float, default=None, metavar="FACTOR",
+                        help="Rewrite the thresholds file as measured median × FACTOR instead of checking.")
+    args = parser.parse_args(argv)
+
+    report = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": {},
+        "sizes": {},
+    }
+    # 未指定 --workdir 时合成工作簿写入临时目录，结束后删除
+    workspace = (contextlib.nullcontext(args.workdir) if args.workdir
+                 else tempfile.TemporaryDirectory(prefix="cleanuva-bench-"))
+    with workspace as workroot:
+        for scale in args.scales:
+            key = f"{scale}x"
+            workdir = os.path.join(workroot, key)
+            write_workbooks(workdir, synthetic_frames(args.base_dir, scale))
+            report["results"][key], report["sizes"][key] = run_scale(workdir, args.repeat)
+            for name, stats in report["results"][key].items():
+                print(f"{key:>5} {name:<20} {stats['median_ms']:>10.2f} ms (min {stats['min_ms']:.2f})")
+
+    if args.calibrate:
+        thresholds = {scale: {name: max(MIN_THRESHOLD_MS, math.ceil(stats["median_ms"] * args.calibrate))
+                              for name, stats in results.items()}
+                      for scale, results in report["results"].items()}
+        with open(args.thresholds, "w", encoding="utf-8") as f:
+            json.dump(thresholds, f, indent=2)
+            f.write("\n")
+        print(f"Thresholds written to {args.thresholds}")
+        failures = []
+    else:
+        thresholds = {}
+        if os.path.exists(args.thresholds):
+            with open(args.thresholds, encoding="utf-8") as f:
+                thresholds = json.load(f)
+        failures = check(report["results"], thresholds)
+    report["thresholds"] = thresholds
+    report["failures"] = [dict(zip(("scale", "benchmark", "median_ms", "threshold_ms"), f)) for f in failures]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    for scale, name, measured, limit in failures:
+        print(f"REGRESSION {scale} {name}: {measured:.2f} ms > {limit} ms")
+    print(f"Results written to {args.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
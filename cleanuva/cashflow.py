@@ -0,0 +1,148 @@
+"""多年现金流引擎：逐年现金流、NPV、IRR、(折现) 回本年限，全部按数组向量化计算。
+
+输入的首年数值 (人工清洗成本、机器人运维、发电增收) 可以是标量，也可以是任意形状的数组
+(批量场景 / 敏感性采样)，结果的前几维与之一致，最后一维为年份 0..years (第 0 年为初始投资)。
+
+逐年规则：
+- 人工清洗成本与机器人运维按 opex_escalation (%/年) 递增；
+- 发电增收按 price_escalation (%/年) 电价上涨、degradation (%/年) 组件衰减；
+- 机器人寿命到期 (第 L, 2L, ... 年，且早于测算期末) 按原价重新购置，与 optimizer 的现值口径一致。
+"""
+import numpy as np
+
+# 测算期内未回本时的回本年限占位值 (与侧边栏一致)
+NO_PAYBACK = 99
+MAX_YEARS = 25
+# NPV / 折现回本与机队组合优化 (optimizer) 共用的折现率
+DEFAULT_DISCOUNT_RATE = 0.08
+DEFAULT_OPEX_ESCALATION = 2.0
+DEFAULT_PRICE_ESCALATION = 2.0
+DEFAULT_DEGRADATION = 0.5
+# IRR 求解区间、最大迭代次数与收敛容差 (收益率的绝对误差)
+IRR_BOUNDS = (-0.99, 100.0)
+IRR_ITERATIONS = 60
+IRR_TOLERANCE = 1e-10
+
+
+def replacement_schedule(capex, lifetime, years, horizon=None):
+    """逐年设备更换支出：capex / lifetime 最后一维对应设备，返回 (..., years + 1)。
+
+    寿命到期年份须早于测算期末 (horizon，缺省为 years)，期末当年不再重新购置。
+    """
+    capex = np.asarray(capex, dtype=float)
+    lifetime = np.asarray(lifetime, dtype=float)
+    end = np.asarray(years if horizon is None else horizon, dtype=float)[..., None, None]
+    t = np.arange(int(years) + 1)
+    cycle = np.where(lifetime > 0, lifetime, np.inf)[..., None]
+    due = (t > 0) & (t < end) & (np.mod(t, cycle) == 0)
+    return (capex[..., None] * due).sum(axis=-2)
+
+
+def project_cash_flows(capex, manual_cost, robot_opex, gen_gain, years=5, replacement=0.0,
+                       opex_escalation=DEFAULT_OPEX_ESCALATION, price_escalation=DEFAULT_PRICE_ESCALATION,
+                       degradation=DEFAULT_DEGRADATION, horizon=None):
+    """逐年净现金流 (..., years + 1)。
+
+    replacement 为 replacement_schedule 的结果 (或可广播的标量 / 数组)；horizon 可按场景给出各自的测算年限
+    (<= years)，超出部分现金流为 0。
+    """
+    years = int(min(max(years, 1), MAX_YEARS))
+    capex, manual_cost, robot_opex, gen_gain = (np.asarray(v, dtype=float)[..., None]
+                                                for v in (capex, manual_cost, robot_opex, gen_gain))
+    t = np.arange(years + 1)
+    k = np.maximum(t - 1, 0)
+    opex_growth = (1 + np.asarray(opex_escalation, dtype=float)[..., None] / 100) ** k
+    gen_growth = ((1 + np.asarray(price_escalation, dtype=float)[..., None] / 100)
+                  * (1 - np.asarray(degradation, dtype=float)[..., None] / 100)) ** k
+    flows = np.where(t > 0, (manual_cost - robot_opex) * opex_growth + gen_gain * gen_growth, 0.0)
+    flows = flows - np.asarray(replacement, dtype=float) - np.where(t == 0, capex, 0.0)
+    if horizon is not None:
+        flows = np.where(t <= np.asarray(horizon, dtype=float)[..., None], flows, 0.0)
+    return flows
+
+
+def npv(flows, rate=DEFAULT_DISCOUNT_RATE):
+    """净现值；rate 可为数组 (与 flows 前几维广播)。按 Horner 法逐年累加，不做幂运算 (IRR 迭代时反复调用)。"""
+    v = 1 / (1 + np.asarray(rate, dtype=float))
+    acc = flows[..., -1]
+    for t in range(flows.shape[-1] - 2, -1, -1):
+        acc = acc * v + flows[..., t]
+    return acc
+
+
+def _npv_slope(flows, rate):
+    """NPV 及其对 rate 的导数 (Horner 法同时累加多项式与导数)。"""
+    v = 1 / (1 + rate)
+    acc = flows[..., -1]
+    slope = np.zeros_like(acc)
+    for t in range(flows.shape[-1] - 2, -1, -1):
+        slope = slope * v + acc
+        acc = acc * v + flows[..., t]
+    # d NPV / d rate = d P(v) / d v × (-v²)
+    return acc, -slope * v * v
+
+
+def irr(flows):
+    """内部收益率 (小数)，所有行同时求解：牛顿法加二分区间保护 (牛顿步越界时取中点)，每轮只计算尚未收敛的行。
+    区间内 NPV 不变号 (例如测算期内从未回本) 时为 NaN。"""
+    shape = flows.shape[:-1]
+    flows = flows.reshape(-1, flows.shape[-1])
+    # 先在 [0, 上界] 找正收益率；没有再到 [下界, 0] 找 (更换年份的负现金流可能造成多个根，
+    # 下界附近的根没有经济含义，优先取常规投资项目的那个)
+    f_zero = flows.sum(axis=-1)
+    positive = np.sign(f_zero) * np.sign(npv(flows, IRR_BOUNDS[1])) <= 0
+    f_bottom = npv(flows, IRR_BOUNDS[0])
+    valid = positive | (np.sign(f_bottom) * np.sign(f_zero) <= 0)
+    lo = np.where(positive, 0.0, IRR_BOUNDS[0])
+    hi = np.where(positive, IRR_BOUNDS[1], 0.0)
+    f_lo = np.where(positive, f_zero, f_bottom)
+    rate = np.where(positive, 0.1, (IRR_BOUNDS[0] + 0.0) / 2)
+
+    active = np.flatnonzero(valid)
+    for _ in range(IRR_ITERATIONS):
+        if len(active) == 0:
+            break
+        r = rate[active]
+        f, slope = _npv_slope(flows[active], r)
+        # 收缩区间：与下界同号的一侧被排除
+        left = np.sign(f) == np.sign(f_lo[active])
+        lo[active] = np.where(left, r, lo[active])
+        hi[active] = np.where(left, hi[active], r)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = r - f / slope
+        inside = np.isfinite(newton) & (newton > lo[active]) & (newton < hi[active])
+        new_rate = np.where(inside, newton, (lo[active] + hi[active]) / 2)
+        rate[active] = new_rate
+        active = active[np.abs(new_rate - r) >= IRR_TOLERANCE]
+    return np.where(valid, rate, np.nan).reshape(shape)
+
+
+def payback(flows, rate=0.0):
+    """(折现) 回本年限：累计现金流首次转正的年份，年内按线性插值；测算期内未回本为 NO_PAYBACK。"""
+    t = np.arange(flows.shape[-1])
+    disc = flows * (1 + np.asarray(rate, dtype=float)[..., None]) ** -t
+    cum = np.cumsum(disc, axis=-1)
+    positive = cum >= 0
+    # 第 0 年即为非负 (无投资) 时回本年限为 0
+    first = np.where(positive.any(axis=-1), positive.argmax(axis=-1), -1)
+    idx = np.maximum(first, 1)
+    prev = np.take_along_axis(cum, (idx - 1)[..., None], axis=-1)[..., 0]
+    step = np.take_along_axis(disc, idx[..., None], axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        years = idx - 1 + np.where(step > 0, -prev / step, 1.0)
+    return np.where(first < 0, NO_PAYBACK, np.where(first == 0, 0.0, years))
+
+
+def analyze(flows, rate=DEFAULT_DISCOUNT_RATE):
+    """现金流指标汇总：累计 / 折现累计现金流、NPV、IRR (%)、回本与折现回本年限。"""
+    t = np.arange(flows.shape[-1])
+    disc = flows * (1 + np.asarray(rate, dtype=float)[..., None]) ** -t
+    return {
+        "flows": flows,
+        "cumulative": np.cumsum(flows, axis=-1),
+        "discounted_cumulative": np.cumsum(disc, axis=-1),
+        "npv": disc.sum(axis=-1),
+        "irr": irr(flows) * 100,
+        "payback_yrs": payback(flows),
+        "discounted_payback_yrs": payback(flows, rate),
+    }
@@ -0,0 +1,137 @@
+"""竞品参数查询引擎：Our_Products / Competitors 长表整理为带类型的参数表，取值尽量解析为数值并按参数建列式索引。
+
+- 取值 "1500 m²/h"、"20°"、"48-80 kg" 解析为 lo / hi / 单位，num 为区间中点 (单值时 lo = hi = num)；
+  无法解析的文本只保留原文。
+- 参数名经 PARAM_ALIASES 归一 (例如 Max Efficiency -> Efficiency)，我方与竞品可直接比较。
+- 条件查询 (参数 + 比较符 + 数值，多个条件取交集)：每个参数一份按 num 排序的 (数值, 型号) 列，
+  searchsorted 定位区间后按型号掩码求交，耗时与命中行数成正比，不扫描整表。
+- 最近竞品按数值参数标准化后的欧氏距离，在 numpy 宽表上一次算完。
+每个数据版本构建一次，只读；同一实例可被多个会话线程共用。
+"""
+import numpy as np
+import pandas as pd
+
+from cleanuva import metrics
+
+# 同一参数在不同表中的写法 -> 统一名称
+PARAM_ALIASES = {"Max Efficiency": "Efficiency"}
+OPERATORS = ("<", "<=", ">", ">=", "=", "!=")
+# 数值 (可带千分位)，可选 "-" / "~" 区间上限，其后为单位
+_VALUE_PATTERN = r"^\s*(-?\d[\d,]*(?:\.\d+)?)\s*(?:[-–~]\s*(-?\d[\d,]*(?:\.\d+)?))?\s*(.*?)\s*$"
+
+
+def parse_values(values):
+    """把文本取值解析为 DataFrame[lo, hi, num, unit]，无法解析的行为 NaN / None。"""
+    text = pd.Series(values, dtype=object).astype(str)
+    parts = text.str.extract(_VALUE_PATTERN)
+    lo = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+    hi = pd.to_numeric(parts[1].str.replace(",", "", regex=False), errors="coerce").fillna(lo)
+    unit = parts[2].where(lo.notna() & (parts[2] != ""))
+    return pd.DataFrame({"lo": lo.to_numpy(float), "hi": hi.to_numpy(float),
+                         "num": ((lo + hi) / 2).to_numpy(float), "unit": unit.to_numpy(object)})
+
+
+class CompetitorIndex:
+    """我方 + 竞品全部型号的参数索引。"""
+
+    def __init__(self, df_our, df_comp=None):
+        with metrics.span("competitors.build_index"):
+            frames = [(df_our, 1)] + ([] if df_comp is None else [(df_comp, 0)])
+            long_df = pd.concat([f[["Company", "Model", "Primary Category", "Secondary Parameter", "Value"]].assign(ours=ours)
+                                 for f, ours in frames], ignore_index=True)
+            long_df = long_df.astype({c: object for c in ["Company", "Model", "Primary Category", "Secondary Parameter"]})
+            long_df["param"] = long_df["Secondary Parameter"].astype(str).str.strip().replace(PARAM_ALIASES)
+
+            # 型号表：同名型号以首次出现为准 (我方在前)
+            models = long_df.drop_duplicates("Model")[["Model", "Company", "ours"]].reset_index(drop=True)
+            self.models = models.rename(columns={"Model": "model", "Company": "company"})
+            model_id = pd.Index(self.models["model"]).get_indexer(long_df["Model"])
+            parsed = parse_values(long_df["Value"])
+
+            self.specs = pd.DataFrame({
+                "model_id": model_id.astype(np.int32), "category": long_df["Primary Category"].astype(str),
+                "param": long_df["param"], "value": long_df["Value"].astype(str),
+                "num": parsed["num"], "lo": parsed["lo"], "hi": parsed["hi"], "unit": parsed["unit"],
+            }).astype({"category": "category", "param": "category"})
+
+            # 列式索引：参数 -> (升序数值, 对应型号 id)
+            numeric = self.specs.dropna(subset=["num"])
+            self._columns = {
+                param: (g["num"].to_numpy(dtype=float)[order], g["model_id"].to_numpy()[order])
+                for param, g in numeric.groupby("param", observed=True, sort=False)
+                for order in [np.argsort(g["num"].to_numpy(dtype=float), kind="stable")]
+            }
+
+            # 数值宽表 (型号 × 数值参数)，最近竞品查询用；列按全体型号标准化
+            wide = numeric.astype({"param": object}).groupby(["model_id", "param"], sort=True)["num"].first().unstack("param")
+            wide = wide.reindex(range(len(self.models)))
+            self.numeric_params = list(wide.columns)
+            values = wide.to_numpy(dtype=float)
+            mean, std = np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+            self._values = values
+            self._scaled = (values - mean) / np.where(std > 0, std, 1.0)
+            self._ours = self.models["ours"].to_numpy(dtype=bool)
+            self._names = self.models["model"].astype(str).to_numpy(dtype=object)
+            self._by_name = np.argsort(self._names, kind="stable")
+            self._params = numeric.astype({"param": object}).groupby("param", sort=True).agg(
+                Unit=("unit", "first"), Min=("num", "min"), Max=("num", "max"), Models=("model_id", "nunique")
+            ).rename_axis("Parameter").reset_index()
+
+    def params(self):
+        """可查询的数值参数：名称、单位、取值范围及有取值的型号数。"""
+        return self._params.copy()
+
+    def _match(self, param, op, value):
+        """满足单个条件的型号 id (未排序)。"""
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        nums, ids = self._columns.get(PARAM_ALIASES.get(param, param), (np.empty(0), np.empty(0, dtype=np.int32)))
+        value = float(value)
+        left, right = np.searchsorted(nums, value, "left"), np.searchsorted(nums, value, "right")
+        if op == "!=":
+            return np.concatenate([ids[:left], ids[right:]])
+        lo, hi = {"<": (0, left), "<=": (0, right), ">": (right, len(nums)), ">=": (left, len(nums)),
+                  "=": (left, right)}[op]
+        return ids[lo:hi]
+
+    def query(self, filters, include_ours=False, limit=None):
+        """满足全部条件的型号 (默认只含竞品)。filters 为 [(参数, 比较符, 数值), ...]，参数名可用别名。
+
+        返回 DataFrame：Model、Company 及各条件参数的数值 (单位见 params())，按型号名排序。
+        """
+        with metrics.span("competitors.query"):
+            mask = np.ones(len(self.models), dtype=bool) if include_ours else ~self._ours
+            for param, op, value in filters:
+                hit = np.zeros(len(self.models), dtype=bool)
+                hit[self._match(param, op, value)] = True
+                mask &= hit
+            ids = self._by_name[mask[self._by_name]][:limit]
+            out = pd.DataFrame({"Model": self._names[ids], "Company": self.models["company"].to_numpy(dtype=object)[ids]})
+            for param in dict.fromkeys(PARAM_ALIASES.get(p, p) for p, _, _ in filters):
+                out[param] = self._values[ids, self.numeric_params.index(param)] if param in self.numeric_params else np.nan
+        return out
+
+    def nearest(self, model, k=5, params=None):
+        """与 model 数值参数最接近的 k 个竞品 (标准化欧氏距离，只比较双方都有取值的参数)。
+
+        params 可限定参与比较的参数；返回 DataFrame：Model、Company、Distance、Shared (共同参数数)。
+        """
+        with metrics.span("competitors.nearest"):
+            hit = np.flatnonzero(self._names == model)
+            if len(hit) == 0:
+                raise KeyError(model)
+            cols = slice(None) if params is None else \
+                [self.numeric_params.index(PARAM_ALIASES.get(p, p)) for p in params
+                 if PARAM_ALIASES.get(p, p) in self.numeric_params]
+            scaled = self._scaled[:, cols]
+            diff = scaled[~self._ours] - scaled[hit[0]]
+            shared = np.isfinite(diff).sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                # 按共同参数数取均方，缺失参数不计入距离
+                dist = np.sqrt(np.nansum(diff * diff, axis=1) / shared)
+            dist = np.where(shared > 0, dist, np.inf)
+            order = np.argsort(dist, kind="stable")[:k]
+            order = order[np.isfinite(dist[order])]
+            comp = self.models[~self._ours].iloc[order]
+            return pd.DataFrame({"Model": comp["model"].to_numpy(), "Company": comp["company"].to_numpy(),
+                                 "Distance": dist[order], "Shared": shared[order]})
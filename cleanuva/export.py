@@ -0,0 +1,343 @@
+"""测算结果导出：批量场景 ROI、逐年现金流、机队配置与报价明细流式写入新工作簿或列式文件。
+
+- xlsx：openpyxl write-only 模式，行直接写入各 sheet 的临时文件，内存占用与行数无关；
+  单个 sheet 超过 Excel 行数上限时自动续写到 "Yearly (2)" 等新 sheet。
+- parquet / csv：输出目录下每张表一个文件，按块追加 (Parquet 每块一个 row group)，适合数万行以上的结果。
+场景按 CHUNK_ROWS 分块测算、分块写出，整个导出过程中只有一块结果在内存里。
+
+表 (xlsx 中的 sheet 名与经济模型工作簿一致)：
+    Assumptions   导出参数 (机队、折现率、上涨率、数据版本等，仅 ROI 导出)
+    Summary       每个场景一行 (同 Portfolio ROI)
+    Yearly        场景 × 年份：现金流、累计、折现累计
+    Fleet         场景 × 设备：台数、单价、周期产能、CAPEX、年度 OPEX
+    Quote Items   订单 × 明细行：整机、选件、运费
+    Quote Errors  报价失败的订单及原因 (仅有失败单时写出)
+
+用法：
+    python -m cleanuva.export -o results.xlsx --fleet "NuvaTrack U"
+    python -m cleanuva.export -o results/ --format parquet --scenarios scenarios.csv --orders orders.csv
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import cashflow, metrics, roi, soiling
+
+CHUNK_ROWS = 5000
+FORMATS = ("xlsx", "parquet", "csv")
+# Excel 单个 sheet 的行数上限 (含表头)
+EXCEL_MAX_ROWS = 1_048_576
+TABLES = {"assumptions": "Assumptions", "summary": "Summary", "yearly": "Yearly", "fleet": "Fleet",
+          "quote_items": "Quote Items", "quote_errors": "Quote Errors"}
+MIN_COLUMN_WIDTH = 10
+
+
+def _plain(df):
+    """category 列转回普通对象列：各块的类别集合不同，不能直接拼接写出。"""
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.astype({c: object for c in cats}) if cats else df
+
+
+class ExcelWriter:
+    """write-only 工作簿；append 按块写入，close 时才打包为 xlsx (out 可为路径或二进制文件对象)。"""
+
+    def __init__(self, out, max_rows=EXCEL_MAX_ROWS):
+        from openpyxl import Workbook
+
+        self.out = out
+        self.max_rows = max_rows
+        self._wb = Workbook(write_only=True)
+        self._sheets = {}                        # 表名 -> [worksheet, 已写行数, 续页序号, 表头]
+
+    def _new_sheet(self, table, columns, part):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
+
+        title = TABLES.get(table, table)
+        ws = self._wb.create_sheet(title if part == 1 else f"{title} ({part})")
+        ws.freeze_panes = "A2"
+        # write-only 模式下列宽须在写入第一行之前设置
+        for i, name in enumerate(columns, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = max(len(str(name)) + 2, MIN_COLUMN_WIDTH)
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(ws, value=str(name))
+            cell.font = Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+        self._sheets[table] = [ws, 1, part, list(columns)]
+
+    def append(self, table, df):
+        df = _plain(df)
+        if table not in self._sheets:
+            self._new_sheet(table, df.columns, 1)
+        # NaN / inf 在 Excel 中无对应值，写为空单元格
+        values = df.astype(object).where(df.notna() & ~df.isin([np.inf, -np.inf]), None)
+        for row in values.itertuples(index=False, name=None):
+            state = self._sheets[table]
+            if state[1] >= self.max_rows:
+                self._new_sheet(table, state[3], state[2] + 1)
+                state = self._sheets[table]
+            state[0].append(row)
+            state[1] += 1
+
+    def close(self):
+        with metrics.span("export.xlsx_save"):
+            self._wb.save(self.out)
+
+
+class TableWriter:
+    """输出目录下每张表一个 parquet / csv 文件，按块追加。"""
+
+    def __init__(self, out_dir, fmt="parquet"):
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow); use --format csv instead.") from None
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self._files = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def path(self, table):
+        return os.path.join(self.out_dir, f"{table}.{self.fmt}")
+
+    def append(self, table, df):
+        df = _plain(df)
+        if self.fmt == "csv":
+            f = self._files.get(table)
+            if f is None:
+                f = self._files[table] = open(self.path(table), "w", encoding="utf-8", newline="")
+                df.iloc[:0].to_csv(f, index=False)
+            df.to_csv(f, header=False, index=False)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = self._files.get(table)
+        if writer is None:
+            # 首块确定表结构，后续各块按同一结构写入 (列中全为空值的块也能对齐类型)
+            data = pa.Table.from_pandas(df, preserve_index=False)
+            writer = self._files[table] = pq.ParquetWriter(self.path(table), data.schema)
+        else:
+            data = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+        writer.write_table(data)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def open_writer(out, fmt=None):
+    """fmt 缺省按 out 推断：.xlsx 或文件对象为工作簿，其它视为 parquet 输出目录。"""
+    fmt = fmt or ("xlsx" if not isinstance(out, str) or out.lower().endswith(".xlsx") else "parquet")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return ExcelWriter(out) if fmt == "xlsx" else TableWriter(out, fmt)
+
+
+def chunked(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def read_scenarios(path, chunk_rows=CHUNK_ROWS):
+    """按块读取 CSV / Parquet 场景文件 (列同 Scenarios 表)，不一次性载入整个文件。"""
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def yearly_table(df_sce, result):
+    """batch_evaluate 结果的逐年现金流长表：每个场景第 0 年 (初始投资) 到其 Horizon 年各一行。"""
+    cash = result["cash_flow"]
+    n, width = cash["flows"].shape
+    years = np.arange(width)
+    keep = (years[None, :] <= result["horizon"][:, None]).reshape(-1)
+    rows = np.repeat(np.arange(n), width)[keep]
+    return pd.DataFrame({
+        "Client/Project": df_sce["Client/Project"].to_numpy(dtype=object)[rows],
+        "Scenario": df_sce["Scenario"].to_numpy(dtype=object)[rows],
+        "Year": np.tile(years, n)[keep],
+        "Cash flow": cash["flows"].reshape(-1)[keep],
+        "Cumulative": cash["cumulative"].reshape(-1)[keep],
+        "Discounted cumulative": cash["discounted_cumulative"].reshape(-1)[keep],
+    })
+
+
+def fleet_table(df_sce, result):
+    """batch_evaluate 结果的机队配置长表：场景 × 设备各一行 (列同 FleetResult.per_device)。"""
+    fleet = result["fleet"]
+    n, d = len(df_sce), len(fleet.devices)
+    rows = np.repeat(np.arange(n), d)
+
+    def flat(values):
+        return np.broadcast_to(np.asarray(values, dtype=float), (n, d)).reshape(-1)
+
+    return pd.DataFrame({
+        "Client/Project": df_sce["Client/Project"].to_numpy(dtype=object)[rows],
+        "Scenario": df_sce["Scenario"].to_numpy(dtype=object)[rows],
+        "Device": np.tile(np.array(fleet.devices, dtype=object), n),
+        "Units": flat(fleet.quantities).astype(int),
+        "Unit price": flat(fleet.unit_prices),
+        "Cycle capacity (MW)": flat(fleet.cycle_cap),
+        "CAPEX": flat(fleet.capex),
+        "Annual OPEX": flat(fleet.opex),
+    })
+
+
+def quote_items(order, quote):
+    """一张报价单的明细行：整机、各选件、运费 (金额为报价币种)。"""
+    options = sum(item["price"] * item["qty"] for item in quote["selected_skus"])
+    base = quote["total_price"] - options - quote["ship_cost"]
+    lines = [("Base platform", quote["model_name"], 1, base)]
+    lines += [("Option", item["name"], item["qty"], item["price"]) for item in quote["selected_skus"]]
+    lines.append(("Shipping", f"{order['region']} / {quote['ship_method']}", 1, quote["ship_cost"]))
+    return [{"Order": order.get("order_id"), "Client": order.get("client") or "", "Model": quote["model_name"],
+             "Type": kind, "Item": item, "Qty": qty, "Unit price": price, "Amount": price * qty,
+             "Currency": order.get("currency", "EUR")} for kind, item, qty, price in lines]
+
+
+def export_roi(writer, scenario_chunks, fleet_model, devices, **kwargs):
+    """逐块测算场景并写入 Summary / Yearly / Fleet；kwargs 同 roi.batch_evaluate。返回场景数。"""
+    count = 0
+    for df_sce in scenario_chunks:
+        if not len(df_sce):
+            continue
+        with metrics.span("export.roi_chunk"):
+            result = roi.batch_evaluate(df_sce, fleet_model, devices, **kwargs)
+        with metrics.span("export.write_chunk"):
+            writer.append("summary", result["summary"])
+            writer.append("yearly", yearly_table(df_sce, result))
+            writer.append("fleet", fleet_table(df_sce, result))
+        count += len(df_sce)
+    return count
+
+
+def export_quotes(writer, orders, price_book, chunk_rows=CHUNK_ROWS):
+    """逐单报价并按块写入 Quote Items；失败的订单写入 Quote Errors。返回 (成功单数, 错误信息列表)。"""
+    from cleanuva.pricing import PricingError
+
+    done, errors, rows, failed = 0, [], [], []
+    for i, order in enumerate(orders, start=1):
+        try:
+            quote = price_book.price_order(order["model"], order["skus"], order["region"], order["shipping_mode"],
+                                           order["currency"])
+        except (PricingError, KeyError, ValueError) as e:
+            errors.append(f"{order.get('order_id')}: {e}")
+            failed.append({"Order": order.get("order_id"), "Client": order.get("client") or "",
+                           "Model": order.get("model"), "Error": str(e)})
+        else:
+            rows.extend(quote_items(order, quote))
+            done += 1
+        if rows and (i % chunk_rows == 0 or i == len(orders)):
+            writer.append("quote_items", pd.DataFrame(rows))
+            rows = []
+    if rows:
+        writer.append("quote_items", pd.DataFrame(rows))
+    if failed:
+        writer.append("quote_errors", pd.DataFrame(failed))
+    return done, errors
+
+
+def assumptions_table(devices=None, version=None, options=None):
+    """导出所用参数 (options 同 roi.batch_evaluate 的关键字参数；比例类按 % 显示，与侧边栏一致)，便于核对结果的口径。"""
+    options = options or {}
+    params = {
+        "Exported at": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M"),
+        "Fleet": ", ".join(devices or []),
+        "Generation model": "Hourly simulation" if options.get("hourly") else "Flat annual formula",
+        "Soiling days": options.get("soiling_days", soiling.DEFAULT_SOILING_DAYS),
+        "Degradation (%/yr)": options.get("degradation", cashflow.DEFAULT_DEGRADATION),
+        "Discount rate (%)": options.get("discount_rate", cashflow.DEFAULT_DISCOUNT_RATE) * 100,
+        "OPEX escalation (%/yr)": options.get("opex_escalation", cashflow.DEFAULT_OPEX_ESCALATION),
+        "Electricity price escalation (%/yr)": options.get("price_escalation", cashflow.DEFAULT_PRICE_ESCALATION),
+        "Data version": json.dumps(version, default=str) if version is not None else "",
+    }
+    return pd.DataFrame({"Parameter": list(params), "Value": [str(v) for v in params.values()]})
+
+
+def export_results(out, fmt=None, scenario_chunks=None, fleet_model=None, devices=None, orders=None, price_book=None,
+                   version=None, **kwargs):
+    """一次导出：(给出场景时) 参数表与 ROI 三张表 + (给出订单时) 报价明细。参数表只描述 ROI / 现金流的口径，
+    只导出报价时不写。
+
+    scenario_chunks 为场景 DataFrame 的迭代器 (chunked / read_scenarios)；kwargs 同 roi.batch_evaluate。
+    返回 dict：scenarios、quotes (成功单数)、errors。
+    """
+    writer = open_writer(out, fmt)
+    stats = {"scenarios": 0, "quotes": 0, "errors": []}
+    try:
+        if scenario_chunks is not None:
+            writer.append("assumptions", assumptions_table(devices, version, kwargs))
+            stats["scenarios"] = export_roi(writer, scenario_chunks, fleet_model, devices, **kwargs)
+        if orders:
+            stats["quotes"], stats["errors"] = export_quotes(writer, orders, price_book)
+    finally:
+        writer.close()
+    return stats
+
+
+def main(argv=None):
+    from cleanuva.fleet import FleetModel
+    from cleanuva.loader import WorkbookLoader
+    from cleanuva.quote_batch import load_price_book, read_orders
+
+    parser = argparse.ArgumentParser(description="Export Cleanuva ROI, cash-flow, fleet and quote results.")
+    parser.add_argument("-o", "--output", required=True, help="Output .xlsx file, or a directory for parquet / csv.")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Default: from the output name (.xlsx or parquet).")
+    parser.add_argument("--base-dir", default=".", help="Directory containing the workbooks.")
+    parser.add_argument("--scenarios", default=None, help="CSV / Parquet with Scenarios columns (default: the Scenarios sheet).")
+    parser.add_argument("--fleet", action="append", default=None, metavar="DEVICE",
+                        help="Device in the fleet mix (repeatable; default: devices with Enable = 1).")
+    parser.add_argument("--orders", default=None, help="CSV / JSONL order file for the Quote Items table.")
+    parser.add_argument("--no-roi", action="store_true", help="Only export quote items.")
+    parser.add_argument("--hourly", action="store_true", help="Use the 8760 h soiling simulation for extra revenue.")
+    parser.add_argument("--discount-rate", type=float, default=cashflow.DEFAULT_DISCOUNT_RATE * 100, help="Percent.")
+    parser.add_argument("--opex-escalation", type=float, default=cashflow.DEFAULT_OPEX_ESCALATION, help="Percent per year.")
+    parser.add_argument("--price-escalation", type=float, default=cashflow.DEFAULT_PRICE_ESCALATION, help="Percent per year.")
+    parser.add_argument("--degradation", type=float, default=cashflow.DEFAULT_DEGRADATION, help="Percent per year.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    book = "Cleanuva_Economic_Model_v1.xlsx"
+    loader = WorkbookLoader([(book, "Scenarios"), (book, "Devices")], base_dir=args.base_dir)
+    df_sce, df_dev = loader.frames()
+    fleet_model = FleetModel(df_dev)
+    devices = args.fleet
+    if not devices and "Enable" in df_dev.columns:
+        devices = df_dev.loc[df_dev["Enable"] == 1, "Device"].astype(str).tolist()
+    devices = devices or df_dev["Device"].astype(str).tolist()[:1]
+    scenario_chunks = None
+    if not args.no_roi:
+        scenario_chunks = read_scenarios(args.scenarios, args.chunk_rows) if args.scenarios else chunked(df_sce, args.chunk_rows)
+    orders, price_book = None, None
+    if args.orders:
+        with open(args.orders, "rb") as f:
+            orders = read_orders(f.read(), args.orders)
+        price_book = load_price_book(args.base_dir)
+
+    stats = export_results(
+        args.output, args.format, scenario_chunks, fleet_model, devices, orders, price_book, version=loader.versions(),
+        hourly=args.hourly, degradation=args.degradation, discount_rate=args.discount_rate / 100,
+        opex_escalation=args.opex_escalation, price_escalation=args.price_escalation)
+    for error in stats["errors"]:
+        print(f"ERROR {error}")
+    print(f"{stats['scenarios']} scenarios, {stats['quotes']} quotes exported to {args.output} "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Devices 表缺少对应列时沿用侧边栏原有的默认值
+DEFAULT_CONSUMABLE = 500
+DEFAULT_WARRANTY = 390
+DEFAULT_REDUNDANCY = 1.1
+# 耗材更换间隔 (月)
+DEFAULT_INTERVAL = 6
+
+
+class FleetResult:
+    """一次机队测算的结果。各数组最后一维对应设备，前面的维度可以是批量场景 / 采样。"""
+
+    def __init__(self, devices, quantities, unit_prices, cycle_cap, capex, opex, plant):
+        self.devices = devices
+        self.quantities = quantities
+        self.unit_prices = unit_prices
+        self.cycle_cap = cycle_cap          # 每台设备类型的周期产能 (MW / cycle)
+        self.capex = capex                  # 初始投入
+        self.opex = opex                    # 年度运维 (耗材 × 清洗频次 + 质保)
+        self.total_cycle_cap = cycle_cap.sum(axis=-1)
+        self.total_capex = capex.sum(axis=-1)
+        self.total_opex = opex.sum(axis=-1)
+        self.is_adequate = self.total_cycle_cap >= plant
+
+    def per_device(self):
+        """单个配置的逐设备明细表 (用于展示 / 导出)。"""
+        return pd.DataFrame({
+            "Device": list(self.devices),
+            "Units": np.asarray(self.quantities).reshape(-1),
+            "Unit price": np.asarray(self.unit_prices).reshape(-1),
+            "Cycle capacity (MW)": self.cycle_cap.reshape(-1),
+            "CAPEX": self.capex.reshape(-1),
+            "Annual OPEX": self.opex.reshape(-1),
+        })
+
+
+class FleetModel:
+    """机队测算引擎：设备参数预先整理成数组，整支机队 (或一批场景) 一次向量化计算完成。"""
+
+    def __init__(self, df_dev):
+        self.names = df_dev["Device"].astype(str).to_numpy()
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.capacity = df_dev["Capacity"].to_numpy(dtype=float)
+        self.unit_price = df_dev["Unit price"].to_numpy(dtype=float)
+        self.consumable = self._column(df_dev, "Consumable", DEFAULT_CONSUMABLE)
+        self.warranty = self._column(df_dev, "Warranty", DEFAULT_WARRANTY)
+        self.interval = self._column(df_dev, "Interval", DEFAULT_INTERVAL)
+        # 设备寿命 (年)，0 表示不考虑更换
+        self.lifetime = self._column(df_dev, "Lifetime", 0)
+
+    @staticmethod
+    def _column(df, name, default):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=float)
+        return np.full(len(df), float(default))
+
+    def indices(self, devices):
+        return np.array([self._index[d] for d in devices], dtype=np.intp)
+
+    def suggested_units(self, devices, plant, window, shifts, redundancy=DEFAULT_REDUNDANCY):
+        """按设备数平均分摊电站容量的建议台数 (与原侧边栏 suggested_q 一致)。"""
+        idx = self.indices(devices)
+        if len(idx) == 0:
+            return np.zeros(0, dtype=int)
+        target_share = np.asarray(plant, dtype=float)[..., None] / len(idx)
+        daily_cap = self.capacity[idx] * np.asarray(shifts, dtype=float)[..., None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            q = np.ceil((target_share / np.asarray(window, dtype=float)[..., None]) / daily_cap
+                        * np.asarray(redundancy, dtype=float)[..., None])
+        return np.where(np.isfinite(q), q, 0).astype(int)
+
+    def evaluate(self, devices, quantities, unit_prices=None, shifts=1, window=1, freq=1, plant=0):
+        """整支机队一次计算：周期产能、CAPEX、年度 OPEX 及合计。
+
+        quantities / unit_prices 最后一维对应 devices；shifts / window / freq / plant 可为标量，
+        也可为批量场景数组 (自动广播)。
+        """
+        idx = self.indices(devices)
+        q = np.asarray(quantities, dtype=float)
+        prices = self.unit_price[idx] if unit_prices is None else np.asarray(unit_prices, dtype=float)
+        shifts, window, freq = (np.asarray(v, dtype=float)[..., None] for v in (shifts, window, freq))
+
+        cycle_cap = q * self.capacity[idx] * shifts * window
+        capex = q * prices
+        opex = (self.consumable[idx] * freq + self.warranty[idx]) * q
+        shape = np.broadcast_shapes(cycle_cap.shape, capex.shape, opex.shape)
+        return FleetResult(
+            list(devices), q, prices,
+            np.broadcast_to(cycle_cap, shape), np.broadcast_to(capex, shape), np.broadcast_to(opex, shape),
+            np.asarray(plant, dtype=float),
+        )
@@ -0,0 +1,213 @@
+"""内容寻址的报价 / 测算结果缓存与历史记录：本地 SQLite 索引 + blob 目录。
+
+键为 (类型, 完整配置, 数据版本) 规范化 JSON 的 SHA-256：同一配置再次请求时直接返回已渲染的文件，
+不同会话、批量出单进程之间共享。索引表记录客户、型号、创建 / 最近使用时间和摘要，可按客户、型号、日期检索。
+总大小或条目数超限时按最近使用时间淘汰最旧的条目。
+
+目录结构：
+    <root>/history.sqlite
+    <root>/blobs/ab/abcdef....pdf
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import metrics
+
+HISTORY_DIR = os.environ.get("CLEANUVA_HISTORY_DIR", ".history")
+DB_NAME = "history.sqlite"
+BLOB_DIR = "blobs"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 10_000
+# 报价有效期 (天，与 PDF 页脚一致)：超过有效期的缓存报价重新生成
+QUOTE_VALIDITY_DAYS = 30
+DEFAULT_LIMIT = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, kind TEXT NOT NULL, client TEXT, model TEXT,
+    created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0, blob TEXT, summary TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_kind_created ON entries (kind, created);
+CREATE INDEX IF NOT EXISTS entries_client ON entries (client COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS entries_model ON entries (model COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+_COLUMNS = ["key", "kind", "client", "model", "created", "last_used", "hits", "size", "blob", "summary"]
+
+
+def _json_default(v):
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, np.ndarray):
+        return v.tolist()
+    return str(v)
+
+
+def _like_escape(text):
+    """转义 LIKE 通配符 (% _) 与转义符本身，使检索词按字面子串匹配。"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def content_key(kind, config, version=None):
+    """(类型, 配置, 数据版本) 的内容哈希；配置中的字典按键排序，numpy 标量按数值处理。"""
+    payload = json.dumps({"kind": kind, "version": version, "config": config}, sort_keys=True,
+                         separators=(",", ":"), default=_json_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def quote_ref(key):
+    """报价单 REF 编号：由内容哈希得到，同一配置的报价编号不变。"""
+    return f"Q-{key[:10].upper()}"
+
+
+class ResultStore:
+    """一个目录对应一个存储；数据库连接按线程各开一个，可跨会话 / 进程共用同一目录。"""
+
+    def __init__(self, root=HISTORY_DIR, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(os.path.join(root, BLOB_DIR), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, DB_NAME), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, name):
+        return os.path.join(self.root, BLOB_DIR, name[:2], name)
+
+    def get(self, key, max_age_days=None):
+        """返回 (记录 dict, 文件字节)；不存在、文件缺失或超过 max_age_days 时返回 None。命中时更新使用时间。"""
+        conn = self._conn()
+        row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(_COLUMNS, row))
+        if max_age_days is not None and time.time() - record["created"] > max_age_days * 86400:
+            return None
+        data = None
+        if record["blob"]:
+            try:
+                with open(self._blob_path(record["blob"]), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # 文件被外部删除 (或被其它进程淘汰)：索引一并清掉
+                with conn:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+        with conn:
+            conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        record["summary"] = json.loads(record["summary"]) if record["summary"] else {}
+        return record, data
+
+    def put(self, key, kind, data=None, ext=".pdf", client=None, model=None, summary=None):
+        """写入 (覆盖) 一条记录；data 为文件字节 (可为空，只记历史)。写完后按上限淘汰。"""
+        name = None
+        if data is not None:
+            name = key + ext
+            path = self._blob_path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，读取方不会看到写了一半的文件
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, client, model, created, last_used, hits, size, blob, summary) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (key, kind, client or None, model or None, now, now, len(data) if data is not None else 0, name,
+                 json.dumps(summary or {}, default=_json_default)))
+        self.evict()
+
+    def cached(self, kind, config, render, version=None, client=None, model=None, summary=None, ext=".pdf",
+               max_age_days=None):
+        """按内容哈希取缓存；未命中时调用 render(key) 生成字节并写入。返回 (字节, key, 是否命中)。"""
+        key = content_key(kind, config, version)
+        found = self.get(key, max_age_days)
+        metrics.count(f"history_{kind}", hit=found is not None)
+        if found is not None:
+            return found[1], key, True
+        data = render(key)
+        self.put(key, kind, data, ext, client, model, summary)
+        return data, key, False
+
+    def load(self, key):
+        """按 key 读取文件字节 (历史记录下载用)，不存在时为 None。"""
+        found = self.get(key)
+        return found[1] if found else None
+
+    def search(self, client=None, model=None, kind=None, since=None, until=None, limit=DEFAULT_LIMIT):
+        """按客户 / 型号 (子串，不区分大小写)、类型、创建日期区间 (UTC) 检索，最新的在前。
+
+        返回 DataFrame：Key、Kind、Client、Model、Created (UTC)、Hits、Size 及摘要字段 (各类型摘要的键各自成列)。
+        """
+        sql = "SELECT key, kind, client, model, created, hits, size, summary FROM entries WHERE 1 = 1"
+        args = []
+        if client:
+            sql += " AND client LIKE ? ESCAPE '\\'"
+            args.append(f"%{_like_escape(client)}%")
+        if model:
+            sql += " AND model LIKE ? ESCAPE '\\'"
+            args.append(f"%{_like_escape(model)}%")
+        if kind:
+            sql += " AND kind = ?"
+            args.append(kind)
+        if since is not None:
+            sql += " AND created >= ?"
+            args.append(pd.Timestamp(since).timestamp())
+        if until is not None:
+            sql += " AND created < ?"
+            args.append(pd.Timestamp(until).timestamp())
+        sql += " ORDER BY created DESC LIMIT ?"
+        args.append(int(limit))
+        rows = self._conn().execute(sql, args).fetchall()
+        df = pd.DataFrame(rows, columns=["Key", "Kind", "Client", "Model", "Created (UTC)", "Hits", "Size", "summary"])
+        df["Created (UTC)"] = pd.to_datetime(df["Created (UTC)"], unit="s").dt.floor("s")
+        summary = pd.DataFrame([json.loads(s) if s else {} for s in df.pop("summary")], index=df.index)
+        return pd.concat([df, summary], axis=1)
+
+    def stats(self):
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def evict(self):
+        """超出条目数或总大小上限时，按最近使用时间从旧到新删除。返回删除的条目数。"""
+        conn = self._conn()
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return 0
+        removed = []
+        for key, blob, entry_size in conn.execute("SELECT key, blob, size FROM entries ORDER BY last_used"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            removed.append((key, blob))
+            count -= 1
+            size -= entry_size
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in removed])
+        for _, blob in removed:
+            if blob:
+                try:
+                    os.remove(self._blob_path(blob))
+                except FileNotFoundError:
+                    pass
+        return len(removed)
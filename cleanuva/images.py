@@ -0,0 +1,150 @@
+import base64
+import functools
+import io
+import os
+import threading
+from collections import OrderedDict
+
+# Battlecard 中渲染图的显示宽度 (px)；按 2 倍分辨率生成，兼顾高分屏清晰度
+DISPLAY_WIDTH = 180
+RENDER_SCALE = 2
+# Streamlit 静态文件目录 (需在 .streamlit/config.toml 中开启 server.enableStaticServing)
+STATIC_DIR = "static"
+RENDER_SUBDIR = "renders"
+# JPEG 不支持透明通道，透明区域按表格底色铺底
+JPEG_BACKGROUND = (22, 27, 34)
+
+
+@functools.cache
+def _format():
+    """输出格式 (PIL 格式名, 扩展名, MIME)。PIL 在首次生成缩略图时才导入，只用计算模块的进程不必加载。"""
+    from PIL import features
+
+    return ("WEBP", "webp", "image/webp") if features.check("webp") else ("JPEG", "jpg", "image/jpeg")
+
+
+class ImageCache:
+    """缩略图编码结果的内存 LRU 缓存，key = (路径, mtime, 宽度)，源文件改动后自动失效。"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = ImageCache()
+
+
+def _encode_thumbnail(path, width):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.load()
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        if _format()[0] == "WEBP":
+            img.convert("RGBA").save(out, "WEBP", quality=82, method=4)
+        else:
+            rgba = img.convert("RGBA")
+            flat = Image.new("RGB", rgba.size, JPEG_BACKGROUND)
+            flat.paste(rgba, mask=rgba.getchannel("A"))
+            flat.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def thumbnail(path, width=DISPLAY_WIDTH * RENDER_SCALE):
+    """返回 (缩略图字节, mtime_ns)；文件不存在返回 (None, None)。"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, None
+    key = (os.path.abspath(path), mtime, width)
+    data = _cache.get(key)
+    if data is None:
+        try:
+            data = _encode_thumbnail(path, width)
+        except OSError:
+            # 损坏或无法识别的图片按 "未找到" 处理
+            return None, None
+        _cache.put(key, data)
+    return data, mtime
+
+
+def _static_name(path, width, mtime):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{width}w_{mtime:x}.{_format()[1]}"
+
+
+def publish_static(path, width=DISPLAY_WIDTH * RENDER_SCALE, static_dir=STATIC_DIR):
+    """把缩略图写入 Streamlit 静态目录，返回可直接用于 <img src> 的相对 URL。
+
+    文件名带源文件 mtime，浏览器可长期缓存；源图更新后自动换新文件名并清理旧版本。
+    """
+    data, mtime = thumbnail(path, width)
+    if data is None:
+        return None
+    out_dir = os.path.join(static_dir, RENDER_SUBDIR)
+    name = _static_name(path, width, mtime)
+    target = os.path.join(out_dir, name)
+    if not os.path.exists(target):
+        os.makedirs(out_dir, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+        prefix = name[:name.rindex("_") + 1]
+        for fn in os.listdir(out_dir):
+            if fn.startswith(prefix) and fn != name:
+                try:
+                    os.remove(os.path.join(out_dir, fn))
+                except OSError:
+                    pass
+    return f"app/{STATIC_DIR}/{RENDER_SUBDIR}/{name}"
+
+
+def data_uri(path, width=DISPLAY_WIDTH * RENDER_SCALE):
+    """静态服务未开启时的兜底：内联缩略图 (几十 KB) 而不是原始 PNG (数 MB)。"""
+    data, _ = thumbnail(path, width)
+    if data is None:
+        return None
+    return f"data:{_format()[2]};base64,{base64.b64encode(data).decode()}"
+
+
+def render_src(path, static_serving=True):
+    if static_serving:
+        try:
+            return publish_static(path)
+        except OSError:
+            pass
+    return data_uri(path)
+
+
+def warm(paths, static_serving=True):
+    """启动时预生成缩略图，首个用户打开 Battlecards 时无需再缩放编码。"""
+    return {path: render_src(path, static_serving) for path in paths}
+
+
+def cache_stats():
+    return {"entries": len(_cache), "hits": _cache.hits, "misses": _cache.misses}
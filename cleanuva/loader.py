@@ -0,0 +1,248 @@
+import hashlib
+import os
+import posixpath
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from cleanuva import metrics, snapshot
+
+# 8 个数据库变量对应的 (工作簿, 工作表)，顺序与 load_all_databases 的返回值一致
+DATABASE_SHEETS = (
+    ("products.xlsx", "Our_Products"),
+    ("products.xlsx", "Competitors"),
+    ("Cleanuva_Economic_Model_v1.xlsx", "Scenarios"),
+    ("Cleanuva_Economic_Model_v1.xlsx", "Devices"),
+    ("Cleanuva_Price.xlsx", "Base_Models"),
+    ("Cleanuva_Price.xlsx", "SKU_Library"),
+    ("Cleanuva_Price.xlsx", "Settings"),
+    ("Cleanuva_Price.xlsx", "Shipping_Rules"),
+)
+# 不属于 8 个数据库变量、按需读取的辅助 sheet (例如敏感性分析网格的坐标轴)
+AUXILIARY_SHEETS = (
+    ("Cleanuva_Economic_Model_v1.xlsx", "Sensitivity"),
+)
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+# 所有工作表共用的字符串表：sheet XML 里文本单元格只存它的下标
+_SHARED_STRINGS = "xl/sharedStrings.xml"
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _shared_strings(z):
+    if _SHARED_STRINGS not in z.namelist():
+        return []
+    root = ET.fromstring(z.read(_SHARED_STRINGS))
+    # 富文本的 <si> 由多段 <r><t> 组成，拼接后即单元格文本
+    return ["".join(t.text or "" for t in si.iter(f"{_NS_MAIN}t")) for si in root.iter(f"{_NS_MAIN}si")]
+
+
+def _strings_digest(z, part, strings):
+    """该 sheet 引用的共享字符串 (按单元格顺序) 的摘要。"""
+    h = hashlib.sha1()
+    with z.open(part) as f:
+        for _, el in ET.iterparse(f):
+            if el.tag == f"{_NS_MAIN}c":
+                if el.get("t") == "s":
+                    v = el.find(f"{_NS_MAIN}v")
+                    h.update(strings[int(v.text)].encode("utf-8") + b"\0")
+                el.clear()
+    return h.hexdigest()[:12]
+
+
+def sheet_fingerprints(path, digests=None):
+    """读取 xlsx (zip) 目录，返回 {sheet 名: 指纹}。
+
+    指纹由该 sheet 自身 XML 部件的 CRC (zip 目录里现成就有) 加上它引用的共享字符串摘要组成：
+    共享字符串表变化时，只有用到了变化字符串的 sheet 指纹才会变。digests 为调用方保存的
+    {(sheet CRC, 字符串表 CRC): 摘要} 缓存 (原地更新为本文件用到的条目)，两者都没变的 sheet 不再解析 XML。
+    """
+    known = {} if digests is None else digests
+    fresh = {}
+    with zipfile.ZipFile(path) as z:
+        crcs = {info.filename: info.CRC for info in z.infolist()}
+        workbook = ET.fromstring(z.read("xl/workbook.xml"))
+        rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+
+        targets = {}
+        for rel in rels.iter(f"{_NS_PKG_REL}Relationship"):
+            target = rel.get("Target", "")
+            # Target 可能是相对 xl/ 的路径，也可能是以 / 开头的绝对路径
+            part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            targets[rel.get("Id")] = part
+
+        shared_crc = crcs.get(_SHARED_STRINGS, 0)
+        strings = None
+        prints = {}
+        for sheet in workbook.iter(f"{_NS_MAIN}sheet"):
+            part = targets.get(sheet.get(f"{_NS_REL}id"))
+            if part not in crcs:
+                prints[sheet.get("name")] = "0"
+                continue
+            key = (crcs[part], shared_crc)
+            if key not in fresh:
+                if key in known:
+                    fresh[key] = known[key]
+                else:
+                    if strings is None:
+                        strings = _shared_strings(z)
+                    fresh[key] = _strings_digest(z, part, strings)
+            prints[sheet.get("name")] = f"{crcs[part]}:{fresh[key]}"
+    if digests is not None:
+        digests.clear()
+        digests.update(fresh)
+    return prints
+
+
+class _WorkbookState:
+    def __init__(self):
+        self.stat = None        # (mtime_ns, size)
+        self.sha1 = None        # 文件内容哈希
+        self.prints = {}        # sheet -> 指纹
+        self.digests = {}       # (sheet CRC, 字符串表 CRC) -> 共享字符串摘要
+
+
+class WorkbookLoader:
+    """按工作簿 / 工作表增量加载 Excel 数据库。
+
+    - 文件 mtime 与大小未变：直接复用缓存，不读文件；
+    - mtime 变了但内容哈希未变 (例如只是被 touch / 同步盘重写)：只更新 mtime；
+    - 内容变了：只重新解析指纹变化的 sheet，其余 DataFrame 原样保留。
+    每个 sheet 都有独立的版本号，下游缓存可以用它作为 key 精确失效。
+
+    指定 snapshot_dir 时，冷启动优先 memory-map 列式快照，只有源文件比快照新 (内容不同)
+    才回退到 Excel 解析，并顺带重写该 sheet 的快照。
+    """
+
+    def __init__(self, sheets=DATABASE_SHEETS, base_dir=".", snapshot_dir=None):
+        self.sheets = tuple(sheets)
+        self.base_dir = base_dir
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._books = {}
+        self._frames = {}
+        self._versions = {}
+        self.parse_count = 0    # 累计解析过的 sheet 数 (便于观察增量效果)
+
+    def _path(self, book):
+        return os.path.join(self.base_dir, book)
+
+    def _books_in_order(self):
+        return list(dict.fromkeys(book for book, _ in self.sheets))
+
+    def refresh(self):
+        """检查所有工作簿，仅重新解析发生变化的 sheet；返回本次变化的 (book, sheet) 列表。"""
+        changed = []
+        with self._lock:
+            for book in self._books_in_order():
+                changed += self._refresh_book(book)
+        return changed
+
+    def _refresh_book(self, book):
+        path = self._path(book)
+        st_ = os.stat(path)
+        stat = (st_.st_mtime_ns, st_.st_size)
+        state = self._books.setdefault(book, _WorkbookState())
+        wanted = [sheet for b, sheet in self.sheets if b == book]
+        missing = [sheet for sheet in wanted if (book, sheet) not in self._frames]
+
+        if state.stat == stat and not missing:
+            metrics.count("workbook_loader", hit=True)
+            return []
+        if state.stat is None and self.snapshot_dir:
+            with metrics.span("load.snapshot"):
+                loaded = self._load_snapshots(book, path, stat, state, wanted)
+            if loaded:
+                metrics.count("workbook_snapshot", hit=True)
+                return [(book, sheet) for sheet in wanted]
+            metrics.count("workbook_snapshot", hit=False)
+        sha1 = file_sha1(path)
+        if state.sha1 == sha1 and not missing:
+            state.stat = stat
+            metrics.count("workbook_loader", hit=True)
+            return []
+        metrics.count("workbook_loader", hit=False)
+
+        prints = sheet_fingerprints(path, state.digests)
+        stale = [sheet for sheet in wanted
+                 if (book, sheet) not in self._frames or state.prints.get(sheet) != prints.get(sheet)]
+        if stale:
+            with metrics.span("load.parse_excel"):
+                parsed = pd.read_excel(path, sheet_name=stale, engine="openpyxl")
+            self.parse_count += len(stale)
+            for sheet in stale:
+                self._frames[(book, sheet)] = parsed[sheet]
+                self._versions[(book, sheet)] = f"{sha1[:12]}:{prints.get(sheet)}"
+
+        state.stat, state.sha1, state.prints = stat, sha1, prints
+        if self.snapshot_dir and stale:
+            # 整本重写：快照里的 sha1 需与源文件保持一致，冷启动才能整本命中
+            for sheet in wanted:
+                try:
+                    self.save_snapshot(self.snapshot_dir, book, sheet)
+                except OSError:
+                    # 只读部署目录：快照只是加速手段，写失败不影响加载
+                    pass
+        return [(book, sheet) for sheet in stale]
+
+    def _load_snapshots(self, book, path, stat, state, wanted):
+        metas = [snapshot.read_meta(self.snapshot_dir, book, sheet) for sheet in wanted]
+        if not all(metas) or len({m["sha1"] for m in metas}) != 1:
+            return False
+        sha1 = metas[0]["sha1"]
+        # mtime/大小与生成快照时一致即可直接使用；源文件更新过则比对内容哈希 (读文件远快于解析 XML)
+        if any(tuple(m["source_stat"]) != stat for m in metas) and file_sha1(path) != sha1:
+            return False
+        try:
+            frames = [snapshot.read_snapshot(self.snapshot_dir, book, sheet, meta=m) for sheet, m in zip(wanted, metas)]
+        except (OSError, ValueError, KeyError):
+            return False
+        for sheet, meta, df in zip(wanted, metas, frames):
+            self._frames[(book, sheet)] = df
+            self._versions[(book, sheet)] = meta["version"]
+            state.prints[sheet] = meta["fingerprint"]
+        state.stat, state.sha1 = stat, sha1
+        return True
+
+    def save_snapshot(self, snapshot_dir, book, sheet):
+        state = self._books[book]
+        return snapshot.write_snapshot(snapshot_dir, book, sheet, self._frames[(book, sheet)], {
+            "source_stat": list(state.stat),
+            "sha1": state.sha1,
+            "fingerprint": state.prints.get(sheet),
+            "version": self._versions[(book, sheet)],
+        })
+
+    def frames(self, keys=None):
+        """按 keys (默认 self.sheets) 顺序返回 DataFrame 元组 (首次调用时触发加载)。
+        在锁内读取，不会与并发的 refresh 混出不同版本的组合。"""
+        if len(self._frames) < len(self.sheets):
+            self.refresh()
+        with self._lock:
+            return tuple(self._frames[key] for key in (keys or self.sheets))
+
+    def frame(self, book, sheet):
+        if (book, sheet) not in self._frames:
+            self.refresh()
+        with self._lock:
+            return self._frames[(book, sheet)]
+
+    def version(self, book, sheet):
+        with self._lock:
+            return self._versions.get((book, sheet))
+
+    def versions(self, keys=None):
+        """sheet 版本号元组 (默认全部)，可直接作为 st.cache_data 的参数 / key。"""
+        with self._lock:
+            return tuple(self._versions.get(key) for key in (keys or self.sheets))
@@ -0,0 +1,189 @@
+"""运行时埋点：耗时区间 (span)、缓存命中计数、单次重跑的 cProfile / tracemalloc 采样。
+
+进程内全局一个注册表，所有会话共用。设置环境变量 CLEANUVA_METRICS_LOG=<路径> 后，
+每个耗时样本额外追加一行 JSON 到该文件 (便于离线统计 p50 / p95 走势)。
+"""
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+LOG_ENV = "CLEANUVA_METRICS_LOG"
+# 每个区间保留的最近样本数
+MAX_SAMPLES = 2000
+PROFILE_MODES = ("cpu", "mem")
+
+
+class Metrics:
+    def __init__(self, log_path=None, max_samples=MAX_SAMPLES):
+        self.log_path = log_path
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))     # 区间 -> (时间戳, ms)
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        now = time.time()
+        with self._lock:
+            self._samples[name].append((now, ms))
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"ts": round(now, 3), "span": name, "ms": round(ms, 3)}) + "\n")
+                except OSError:
+                    # 日志只是辅助手段，写失败不影响页面
+                    pass
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000)
+
+    def timed(self, name):
+        """装饰器形式的 span。"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, hit):
+        with self._lock:
+            if hit:
+                self._hits[name] += 1
+            else:
+                self._misses[name] += 1
+
+    def cached(self, cache_decorator, name):
+        """给 st.cache_data / st.cache_resource 函数加命中计数：函数体只在未命中时执行。
+
+        用法：@metrics.cached(st.cache_resource(max_entries=4), "fleet_model")
+        """
+        local = threading.local()
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def body(*args, **kwargs):
+                local.missed = True
+                return fn(*args, **kwargs)
+            cached_fn = cache_decorator(body)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                local.missed = False
+                out = cached_fn(*args, **kwargs)
+                self.count(name, hit=not local.missed)
+                return out
+            wrapper.clear = getattr(cached_fn, "clear", None)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """各区间的样本数与 p50 / p95 / 最大值 (ms)。"""
+        with self._lock:
+            items = {name: np.array([ms for _, ms in samples]) for name, samples in self._samples.items() if samples}
+        rows = [{
+            "Section": name,
+            "Count": len(v),
+            "p50 (ms)": float(np.percentile(v, 50)),
+            "p95 (ms)": float(np.percentile(v, 95)),
+            "Max (ms)": float(v.max()),
+            "Last (ms)": float(v[-1]),
+        } for name, v in sorted(items.items())]
+        return pd.DataFrame(rows, columns=["Section", "Count", "p50 (ms)", "p95 (ms)", "Max (ms)", "Last (ms)"])
+
+    def timeline(self, freq="1min", quantile=0.95):
+        """按时间分桶的分位数 (index 为时间，每列一个区间)，用于观察随时间的变化。"""
+        with self._lock:
+            rows = [(ts, name, ms) for name, samples in self._samples.items() for ts, ms in samples]
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=["ts", "Section", "ms"])
+        df["ts"] = pd.to_datetime(df["ts"], unit="s").dt.floor(freq)
+        return df.groupby(["ts", "Section"])["ms"].quantile(quantile).unstack("Section")
+
+    def cache_summary(self, extra=None):
+        """各缓存的命中 / 未命中次数；extra 为额外的 {名称: (hits, misses)} (例如模块自带的计数)。"""
+        with self._lock:
+            counts = {name: (self._hits.get(name, 0), self._misses.get(name, 0))
+                      for name in set(self._hits) | set(self._misses)}
+        counts.update(extra or {})
+        rows = [{
+            "Cache": name,
+            "Hits": hits,
+            "Misses": misses,
+            "Hit rate": hits / (hits + misses) if hits + misses else float("nan"),
+        } for name, (hits, misses) in sorted(counts.items())]
+        return pd.DataFrame(rows, columns=["Cache", "Hits", "Misses", "Hit rate"])
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._hits.clear()
+            self._misses.clear()
+
+
+class Profiler:
+    """单次重跑的性能采样：mode="cpu" 用 cProfile，mode="mem" 用 tracemalloc。"""
+
+    def __init__(self, mode, top=30):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.top = top
+        self._profile = None
+        self._t0 = None
+        self._was_tracing = False
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._was_tracing = tracemalloc.is_tracing()
+            if not self._was_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def stop(self):
+        """结束采样，返回纯文本报告。"""
+        elapsed = (time.perf_counter() - self._t0) * 1000
+        if self.mode == "cpu":
+            self._profile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+            return f"cProfile, {elapsed:,.1f} ms wall\n{out.getvalue()}"
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+        if not self._was_tracing:
+            tracemalloc.stop()
+        lines = [f"tracemalloc, {elapsed:,.1f} ms wall, current {current / 1e6:,.2f} MB, peak {peak / 1e6:,.2f} MB",
+                 f"Top {self.top} allocation sites (by size delta):"]
+        lines += [str(stat) for stat in stats[:self.top]]
+        return "\n".join(lines)
+
+
+METRICS = Metrics(log_path=os.environ.get(LOG_ENV) or None)
+record = METRICS.record
+span = METRICS.span
+timed = METRICS.timed
+count = METRICS.count
+cached = METRICS.cached
@@ -0,0 +1,126 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from cleanuva.cashflow import DEFAULT_DISCOUNT_RATE
+from cleanuva.fleet import DEFAULT_REDUNDANCY
+
+# 搜索节点上限：超过后返回当前已找到的最优解 (保证交互响应时间)
+MAX_NODES = 200_000
+
+
+def annuity_factor(rate, years):
+    """每年末支付 1 的现值系数。"""
+    years = int(years)
+    if years <= 0:
+        return 0.0
+    if rate == 0:
+        return float(years)
+    return float((1 - (1 + rate) ** -years) / rate)
+
+
+def replacement_factor(rate, years, lifetime):
+    """寿命到期后重新购置 (第 L, 2L, ... 年，且早于测算期末) 的现值系数。"""
+    if lifetime <= 0:
+        return 0.0
+    ks = np.arange(1, int(np.ceil(years / lifetime)))
+    return float(((1 + rate) ** -(ks * lifetime)).sum())
+
+
+def unit_costs(fleet_model, idx, freq, horizon, discount_rate, unit_prices=None):
+    """每台设备的 (CAPEX, OPEX 现值)：OPEX 现值含测算期内的寿命到期更换。"""
+    prices = fleet_model.unit_price[idx] if unit_prices is None else np.asarray(unit_prices, dtype=float)
+    opex = fleet_model.consumable[idx] * freq + fleet_model.warranty[idx]
+    ann = annuity_factor(discount_rate, horizon)
+    repl = np.array([replacement_factor(discount_rate, horizon, lt) for lt in fleet_model.lifetime[idx]])
+    return prices, opex * ann + prices * repl
+
+
+def _search(cost, cap, demand, top_n, max_nodes):
+    """整数覆盖问题的分支定界：min Σ cost·q  s.t. Σ cap·q >= demand，保留最优的 top_n 个极小解。
+
+    设备按单位产能成本升序排列；下界 = 已选成本 + 剩余需求 × 剩余设备中最低的单位产能成本。
+    """
+    n = len(cost)
+    ratio = cost / cap
+    # suffix_ratio[k] = 设备 k..n-1 中最低单位产能成本
+    suffix_ratio = np.minimum.accumulate(ratio[::-1])[::-1]
+    best = []                       # 最大堆 (-cost, 序号, q)，保留 top_n 个
+    counter = 0
+    nodes = 0
+    q = [0] * n
+
+    def worst():
+        return -best[0][0] if len(best) >= top_n else np.inf
+
+    stack = [(0, demand, 0.0, None)]
+    while stack:
+        k, remaining, spent, choice = stack.pop()
+        if choice is not None:
+            q[k - 1] = choice
+            for j in range(k, n):
+                q[j] = 0
+        nodes += 1
+        if nodes > max_nodes:
+            break
+        if remaining <= 1e-9:
+            # 只保留极小解：去掉任何一台都会不达标 (否则只是多买了设备)
+            used = [cap[j] for j in range(k) if q[j] > 0]
+            if used and -remaining < min(used) - 1e-9:
+                counter += 1
+                item = (-spent, counter, tuple(q[:k]) + (0,) * (n - k))
+                if len(best) < top_n:
+                    heapq.heappush(best, item)
+                elif spent < worst():
+                    heapq.heapreplace(best, item)
+            continue
+        if k == n or spent + remaining * suffix_ratio[k] >= worst():
+            continue
+        # 台数从小到大入栈：出栈时先尝试多配单位产能成本最低的设备，尽快得到较紧的上界
+        max_q = int(np.ceil(remaining / cap[k] - 1e-9))
+        for qk in range(0, max_q + 1):
+            stack.append((k + 1, remaining - qk * cap[k], spent + qk * cost[k], qk))
+    return sorted(((-c, sol) for c, _, sol in best)), nodes
+
+
+def optimize_fleet(fleet_model, plant, window, shifts, freq, redundancy=DEFAULT_REDUNDANCY, horizon=5,
+                   discount_rate=DEFAULT_DISCOUNT_RATE, devices=None, unit_prices=None, top_n=5, max_nodes=MAX_NODES):
+    """在 devices (默认 Devices 表全部设备) 中搜索整数台数组合，使 CAPEX + OPEX 现值最小，
+    且满足 总周期产能 >= Plant × Redundancy。返回按总成本排序的前 top_n 个方案 (含 Pareto 标记)。
+    """
+    devices = list(fleet_model.names if devices is None else devices)
+    idx = fleet_model.indices(devices)
+    per_unit_cap = fleet_model.capacity[idx] * shifts * window
+    capex, opex_pv = unit_costs(fleet_model, idx, freq, horizon, discount_rate, unit_prices)
+    usable = per_unit_cap > 0
+
+    order = np.flatnonzero(usable)[np.argsort((capex + opex_pv)[usable] / per_unit_cap[usable], kind="stable")]
+    demand = float(plant) * float(redundancy)
+    solutions, nodes = _search((capex + opex_pv)[order], per_unit_cap[order], demand, top_n, max_nodes)
+
+    rows = []
+    for total, sol in solutions:
+        q = np.zeros(len(devices))
+        q[order] = sol
+        rows.append({
+            "Fleet": " + ".join(f"{int(n)}x {d}" for d, n in zip(devices, q) if n),
+            **{d: int(n) for d, n in zip(devices, q)},
+            "Total capacity (MW/cycle)": float(q @ per_unit_cap),
+            "CAPEX": float(q @ capex),
+            "OPEX PV": float(q @ opex_pv),
+            "Total cost": float(total),
+        })
+    result = pd.DataFrame(rows)
+    if len(result):
+        result["Pareto"] = _pareto(result[["CAPEX", "OPEX PV"]].to_numpy())
+    result.attrs["nodes"] = nodes
+    result.attrs["complete"] = nodes <= max_nodes
+    return result
+
+
+def _pareto(points):
+    """(CAPEX, OPEX 现值) 两个目标上不被其它方案支配的方案。"""
+    le = (points[None, :, :] <= points[:, None, :]).all(axis=2)
+    lt = (points[None, :, :] < points[:, None, :]).any(axis=2)
+    return ~(le & lt).any(axis=1)
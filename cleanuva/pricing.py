@@ -0,0 +1,167 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+CURRENCIES = {"EUR": "€", "USD": "$"}
+
+
+class PricingError(ValueError):
+    """订单中的型号 / 选件 / 物流方式在价格本中不存在或不适用。"""
+
+
+def _applicable_ids(value):
+    """SKU_Library.Applicable_To ("ALL" 或 "M01, M03") -> 型号 ID 集合，None 表示全部适用。"""
+    value = str(value).strip()
+    if value.upper() == "ALL":
+        return None
+    return {token.strip() for token in value.split(",") if token.strip()}
+
+
+def parse_skus(value):
+    """选件数量：{SKU: 数量}、[{"sku": ..., "qty": ...}] 或 "S01:2;S03:1" 形式，统一为 {SKU: 数量}。"""
+    if isinstance(value, dict):
+        return {str(k): int(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return {str(item["sku"]): int(item["qty"]) for item in value}
+    skus = {}
+    for part in re.split(r"[;|]", str(value or "")):
+        if part.strip():
+            sku, _, qty = part.partition(":")
+            skus[sku.strip()] = int(qty or 1)
+    return skus
+
+
+class PriceBook:
+    """Cleanuva_Price.xlsx 的定价规则 (整机、选件、汇率、物流)，与报价页的计算口径一致。
+
+    构建时一次性建好索引：型号 -> 行号、型号 -> 适用选件、(目的地, 物流方式) -> 运费，
+    之后每次报价只做数组运算，不再扫描 DataFrame。价格本按 sheet 版本缓存，构建后只读。
+    """
+
+    def __init__(self, df_base, df_sku, df_settings, df_shipping, version=None):
+        # 价格本数据版本 (各 sheet 版本号)，报价缓存的键包含它
+        self.version = version
+        self.df_base = df_base
+        self.df_sku = df_sku
+        self.df_shipping = df_shipping
+        # 获取 Excel 中定义的汇率参数 (EUR 对 USD)
+        self.eur_to_usd = float(df_settings.loc['EUR_to_USD', 'Value'])
+
+        # 整机：型号名称 / 型号 ID -> 行号 (重复时取第一行)
+        self.model_names = df_base['Model_Name'].astype(str).tolist()
+        self.model_ids = df_base['Model_ID'].astype(str).tolist()
+        self._model_pos = {}
+        for pos, (name, model_id) in enumerate(zip(self.model_names, self.model_ids)):
+            self._model_pos.setdefault(name, pos)
+            self._model_pos.setdefault(model_id, pos)
+        self.base_price = df_base['Price_EUR'].to_numpy(dtype=float)
+
+        # 选件：按 SKU_Library 原顺序存成数组，每个型号一份适用选件的行号 / 掩码
+        self.sku_ids = df_sku['SKU_ID'].astype(str).to_numpy()
+        self.sku_names = df_sku['Item_Name'].astype(str).to_numpy()
+        self.sku_price = df_sku['Price_EUR'].to_numpy(dtype=float)
+        self._sku_pos = {}
+        for pos, sku_id in enumerate(self.sku_ids):
+            self._sku_pos.setdefault(sku_id, pos)
+        applicable = [_applicable_ids(v) for v in df_sku['Applicable_To']]
+        self._applicable_mask = {
+            model_id: np.array([ids is None or model_id in ids for ids in applicable], dtype=bool)
+            for model_id in dict.fromkeys(self.model_ids)
+        }
+        self._applicable_pos = {model_id: np.flatnonzero(mask) for model_id, mask in self._applicable_mask.items()}
+
+        # 物流：(目的地, 物流方式) -> 欧元运费，目的地 -> 可选物流方式 (保持表内顺序)
+        self._ship_cost = {}
+        self._methods = {}
+        for region, method, cost in zip(df_shipping['Region'], df_shipping['Delivery_Method'], df_shipping['Cost_EUR']):
+            self._ship_cost.setdefault((region, method), float(cost))
+            methods = self._methods.setdefault(region, [])
+            if method not in methods:
+                methods.append(method)
+        self.regions = list(self._methods)
+        self._options = {}
+
+    def rate(self, currency):
+        if currency not in CURRENCIES:
+            raise PricingError(f"Unknown currency: {currency}")
+        return 1.0 if currency == "EUR" else self.eur_to_usd
+
+    def _model_index(self, model):
+        try:
+            return self._model_pos[model]
+        except KeyError:
+            raise PricingError(f"Unknown model: {model}") from None
+
+    def model(self, model):
+        return self.df_base.iloc[self._model_index(model)]
+
+    def methods(self, region):
+        return list(self._methods.get(region, []))
+
+    def shipping_cost(self, region, shipping_mode, currency="EUR"):
+        try:
+            return self._ship_cost[(region, shipping_mode)] * self.rate(currency)
+        except KeyError:
+            raise PricingError(f"No shipping rule for {region} / {shipping_mode}") from None
+
+    def options(self, model, currency="EUR"):
+        """型号可选配件表 (index 为 SKU_ID；Item / Unit price / Qty)，用作报价页的选件表格。"""
+        key = (self.model_ids[self._model_index(model)], currency)
+        if key not in self._options:
+            pos = self._applicable_pos[key[0]]
+            self._options[key] = pd.DataFrame({
+                "Item": self.sku_names[pos],
+                "Unit price": self.sku_price[pos] * self.rate(currency),
+                "Qty": np.zeros(len(pos), dtype=int),
+            }, index=pd.Index(self.sku_ids[pos], name="SKU_ID"))
+        return self._options[key].copy()
+
+    def _quote(self, m_pos, sku_pos, qty, region, shipping_mode, currency):
+        rate = self.rate(currency)
+        ship_cost = self.shipping_cost(region, shipping_mode, currency)
+        qty = np.asarray(qty, dtype=float)
+        picked = qty > 0
+        sku_pos, qty = sku_pos[picked], qty[picked]
+        prices = self.sku_price[sku_pos] * rate
+        opt_total = float(prices @ qty)
+        base_price = float(self.base_price[m_pos]) * rate
+        m = self.df_base.iloc[m_pos]
+        return {
+            "model_name": m['Model_Name'],
+            "inclusions": str(m['Standard_Includes']),
+            "selected_skus": [
+                {"name": name, "price": float(price), "qty": int(q)}
+                for name, price, q in zip(self.sku_names[sku_pos], prices, qty)
+            ],
+            "ship_method": shipping_mode,
+            "ship_cost": ship_cost,
+            "total_price": base_price + opt_total + ship_cost,
+            "currency_sym": CURRENCIES[currency],
+        }
+
+    def price_basket(self, model, qty, region, shipping_mode, currency="EUR"):
+        """按 options(model) 的行顺序给出数量数组，整篮选件一次计算。返回字段同 price_order。"""
+        m_pos = self._model_index(model)
+        sku_pos = self._applicable_pos[self.model_ids[m_pos]]
+        qty = np.nan_to_num(np.asarray(qty, dtype=float))
+        if qty.shape != sku_pos.shape:
+            raise PricingError(f"Expected {len(sku_pos)} quantities for {self.model_names[m_pos]}, got {qty.size}")
+        return self._quote(m_pos, sku_pos, qty, region, shipping_mode, currency)
+
+    def price_order(self, model, skus, region, shipping_mode, currency="EUR"):
+        """计算一张报价单；skus 为 {SKU_ID: 数量}。返回可直接传给 generate_pdf_quote 的字段。"""
+        m_pos = self._model_index(model)
+        mask = self._applicable_mask[self.model_ids[m_pos]]
+        sku_pos, qty = [], []
+        for sku_id, q in skus.items():
+            if q <= 0:
+                continue
+            if sku_id not in self._sku_pos:
+                raise PricingError(f"Unknown SKU: {sku_id}")
+            pos = self._sku_pos[sku_id]
+            if not mask[pos]:
+                raise PricingError(f"SKU {sku_id} is not applicable to {self.model_names[m_pos]}")
+            sku_pos.append(pos)
+            qty.append(q)
+        return self._quote(m_pos, np.array(sku_pos, dtype=np.intp), qty, region, shipping_mode, currency)
@@ -0,0 +1,166 @@
+"""批量报价：读取 CSV / JSONL 订单，多进程并行生成 PDF 并打包为 zip。
+
+CSV 列：order_id (可选), model, skus ("S01:2;S03:1"), region, shipping_mode, currency (EUR/USD), client (可选)
+JSONL 每行：{"order_id": ..., "model": ..., "skus": {"S01": 2}, "region": ..., "shipping_mode": ..., "currency": ...}
+
+指定 --history 时按报价内容哈希复用已生成的 PDF，并记入该目录的历史 (与页面共用，见 cleanuva.history)。
+
+用法：
+    python -m cleanuva.quote_batch orders.csv -o quotes.zip --workers 4
+    python -m cleanuva.quote_batch orders.csv --history .history
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from cleanuva.history import QUOTE_VALIDITY_DAYS, ResultStore, quote_ref
+from cleanuva.pricing import PriceBook, PricingError, parse_skus
+
+PRICE_BOOK = "Cleanuva_Price.xlsx"
+PRICE_SHEETS = ("Base_Models", "SKU_Library", "Settings", "Shipping_Rules")
+
+# 工作进程内的价格本与历史存储 (由 initializer 设置一次，避免每张单重复传输)
+_worker_book = None
+_worker_store = None
+
+
+def load_price_book(base_dir="."):
+    from cleanuva.loader import WorkbookLoader
+
+    loader = WorkbookLoader([(PRICE_BOOK, sheet) for sheet in PRICE_SHEETS], base_dir=base_dir)
+    df_base, df_sku, df_settings, df_shipping = loader.frames()
+    return PriceBook(df_base, df_sku, df_settings.set_index('Parameter'), df_shipping, version=loader.versions())
+
+
+def read_orders(data, name=""):
+    """解析 CSV 或 JSONL 订单 (data 为 str / bytes)，返回订单字典列表。"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if name.endswith(".jsonl") or text.lstrip().startswith("{"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    orders = []
+    for i, row in enumerate(rows, start=1):
+        orders.append({
+            "order_id": str(row.get("order_id") or i),
+            "model": str(row["model"]).strip(),
+            "skus": parse_skus(row.get("skus")),
+            "region": str(row["region"]).strip(),
+            "shipping_mode": str(row["shipping_mode"]).strip(),
+            "currency": str(row.get("currency") or "EUR").strip().upper()[:3],
+            "client": str(row.get("client") or "").strip(),
+        })
+    return orders
+
+
+def quote_pdf_bytes(quote, version=None, client=None, store=None, ref=None, logo_path=None):
+    """渲染报价 PDF，返回 (字节, REF)。给出 store 时按 (报价内容, 客户, 价格本版本) 取缓存，
+    REF 由内容哈希得到；有效期内的同一配置直接返回已生成的文件。logo_path 缺省为 quote_pdf.LOGO_PATH。"""
+    # ReportLab 只在真正渲染 PDF 时导入，只做报价计算的调用方 (API、页面) 不必加载
+    from cleanuva.quote_pdf import LOGO_PATH, generate_pdf_quote
+
+    logo_path = logo_path or LOGO_PATH
+    if store is None:
+        ref = ref or datetime.now().strftime('%Y%m%d%H%M')
+        return generate_pdf_quote(**quote, ref=ref, logo_path=logo_path, client=client).getvalue(), ref
+    config = dict(quote, client=client or "")
+    summary = {"Total": quote["total_price"], "Currency": quote["currency_sym"], "Shipping": quote["ship_method"],
+               "Options": len(quote["selected_skus"])}
+    data, key, _ = store.cached(
+        "quote", config, lambda key: generate_pdf_quote(**quote, ref=quote_ref(key), logo_path=logo_path, client=client).getvalue(),
+        version=version, client=client, model=quote["model_name"], summary=summary, max_age_days=QUOTE_VALIDITY_DAYS)
+    return data, quote_ref(key)
+
+
+def _init_worker(price_book, logo_path, history_dir=None):
+    global _worker_book, _worker_store
+    _worker_book = price_book
+    _worker_store = ResultStore(history_dir) if history_dir else None
+    # 预先解析 Logo，本进程后续所有 PDF 共用
+    from cleanuva.quote_pdf import LOGO_PATH, get_logo
+    get_logo(logo_path or LOGO_PATH)
+
+
+def render_order(order, price_book=None, ref_prefix="", logo_path=None, store=None):
+    """渲染单张订单，返回 (文件名, PDF 字节, 错误信息)。"""
+    book = price_book or _worker_book
+    store = store or _worker_store
+    try:
+        quote = book.price_order(order["model"], order["skus"], order["region"], order["shipping_mode"], order["currency"])
+    except (PricingError, KeyError, ValueError) as e:
+        return None, None, f"{order.get('order_id')}: {e}"
+    safe_model = re.sub(r"[^0-9A-Za-z_-]", "_", quote["model_name"])
+    safe_id = re.sub(r"[^0-9A-Za-z_-]", "_", order["order_id"])
+    pdf, _ = quote_pdf_bytes(quote, book.version, order.get("client"), store, f"{ref_prefix}{order['order_id']}", logo_path)
+    return f"Cleanuva_Quote_{safe_model}_{safe_id}.pdf", pdf, None
+
+
+def _render_task(args):
+    order, ref_prefix, logo_path = args
+    return render_order(order, None, ref_prefix, logo_path)
+
+
+def render_batch(orders, price_book, out, workers=None, logo_path=None, history_dir=None):
+    """并行渲染全部订单并流式写入 zip (out 为路径或可写文件对象)，返回 (成功数, 错误列表)。
+
+    history_dir 非空时各进程共用该目录的报价缓存 (命中的订单不再渲染)。
+    """
+    ref_prefix = datetime.now().strftime('%Y%m%d%H%M') + "-"
+    tasks = [(order, ref_prefix, logo_path) for order in orders]
+    errors, done = [], 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if workers and workers > 1 and len(orders) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(price_book, logo_path, history_dir)) as pool:
+                results = pool.map(_render_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+                done, errors = _write_results(zf, results)
+        else:
+            _init_worker(price_book, logo_path, history_dir)
+            done, errors = _write_results(zf, map(_render_task, tasks))
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors) + "\n")
+    return done, errors
+
+
+def _write_results(zf, results):
+    done, errors = 0, []
+    for name, pdf, error in results:
+        if error:
+            errors.append(error)
+            continue
+        zf.writestr(name, pdf)
+        done += 1
+    return done, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Cleanuva PDF quotes in bulk from a CSV/JSONL order file.")
+    parser.add_argument("orders", help="CSV or JSONL order file.")
+    parser.add_argument("-o", "--output", default="quotes.zip", help="Output zip file.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument("--base-dir", default=".", help="Directory containing Cleanuva_Price.xlsx and logo_b.png.")
+    parser.add_argument("--history", default=None, metavar="DIR",
+                        help="Reuse identical quotes from, and record new ones in, this history directory.")
+    args = parser.parse_args(argv)
+
+    from cleanuva.quote_pdf import LOGO_PATH
+
+    t0 = time.perf_counter()
+    with open(args.orders, "rb") as f:
+        orders = read_orders(f.read(), args.orders)
+    done, errors = render_batch(orders, load_price_book(args.base_dir), args.output, args.workers,
+                                os.path.join(args.base_dir, LOGO_PATH), args.history)
+    for error in errors:
+        print(f"ERROR {error}")
+    print(f"{done}/{len(orders)} quotes written to {args.output} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+from cleanuva import cashflow, metrics, soiling as soiling_sim
+from cleanuva.cashflow import NO_PAYBACK
+from cleanuva.fleet import DEFAULT_REDUNDANCY
+
+# Scenarios 表缺少容量系数列时沿用侧边栏默认值 (%)
+DEFAULT_CAPFACTOR = 17
+HOURS_PER_YEAR = 8760
+
+
+def project_economics(plant, manual, freq, capfactor, soiling, elec_price, capex, robot_opex, years=5, gen_gain=None):
+    """收益模型 (Total Benefit = Savings + Extra Revenue)，所有参数均可为数组，逐元素广播计算。
+
+    soiling / capfactor 单位为 %，与 Scenarios 表及侧边栏输入一致。
+    gen_gain 为已算好的年度发电增收 (例如 soiling.simulate 的逐时仿真结果)，缺省时按年度平均公式估算。
+    """
+    plant, manual, freq, capfactor, soiling, elec_price, capex, robot_opex = (
+        np.asarray(v, dtype=float) for v in (plant, manual, freq, capfactor, soiling, elec_price, capex, robot_opex))
+
+    annual_manual_cost = plant * manual * freq
+    annual_manual_saving = annual_manual_cost - robot_opex
+    if gen_gain is None:
+        # 发电增收计算公式：MW * 1000 * 8760h * 容量系数 * 提升率 * 电价
+        annual_gen_gain = plant * 1000 * HOURS_PER_YEAR * (capfactor / 100) * (soiling / 100) * elec_price
+    else:
+        annual_gen_gain = np.asarray(gen_gain, dtype=float)
+    net_benefit = annual_manual_saving + annual_gen_gain
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payback = np.where(net_benefit > 0, capex / net_benefit, NO_PAYBACK)
+        total_benefit = net_benefit * years
+        roi = np.where(capex > 0, total_benefit / capex * 100, 0.0)
+
+    return {
+        "annual_manual_cost": annual_manual_cost,
+        "annual_manual_saving": annual_manual_saving,
+        "annual_gen_gain": annual_gen_gain,
+        "net_benefit": net_benefit,
+        "payback_yrs": payback,
+        "total_benefit": total_benefit,
+        "roi": roi,
+    }
+
+
+def evaluate_scenario(s, fleet_model, devices, fleet_result, soiling=None, window=None, hourly=False,
+                      soiling_days=None, degradation=cashflow.DEFAULT_DEGRADATION, profile=None, max_loss=None,
+                      horizon=None, discount_rate=cashflow.DEFAULT_DISCOUNT_RATE,
+                      opex_escalation=cashflow.DEFAULT_OPEX_ESCALATION, price_escalation=cashflow.DEFAULT_PRICE_ESCALATION):
+    """单个场景 (Scenarios 表一行) + 已测算机队 (fleet_model.evaluate 的结果) 的完整收益测算，与侧边栏经济模型一致。
+
+    soiling / window 缺省取场景值，horizon 缺省取场景 Horizon 列；逐时仿真的 soiling_days / max_loss 缺省取场景
+    SoilingDays / SoilingLoss 列 (没有时分别为 DEFAULT_SOILING_DAYS 与按计划清洗标定)。返回 dict：econ (project_economics 的结果)、
+    soiling_sim (hourly=False 时为 None)、cash_flow (cashflow.analyze 的结果) 及 horizon。
+    """
+    soiling = float(s['Soiling'] if soiling is None else soiling)
+    window = float(s['Window'] if window is None else window)
+    horizon = int(min(max(s.get('Horizon', 5) if horizon is None else horizon, 1), cashflow.MAX_YEARS))
+    capfactor = s.get('CapFactor', DEFAULT_CAPFACTOR)
+    capex, robot_opex = float(fleet_result.total_capex), float(fleet_result.total_opex)
+    sim = None
+    if hourly:
+        # 逐时仿真一年只需几毫秒，随参数直接重算
+        with metrics.span("soiling.simulate"):
+            sim = soiling_sim.simulate(
+                s['Plant'], capfactor, soiling, s['ElecPrice'], s['Freq'],
+                float(soiling_sim.sweep_days(window, s['Plant'], fleet_result.total_cycle_cap)), planned_sweep=window,
+                max_loss=_scenario_value(s, 'SoilingLoss', None) if max_loss is None else max_loss,
+                soiling_days=_scenario_value(s, 'SoilingDays', soiling_sim.DEFAULT_SOILING_DAYS) if soiling_days is None else soiling_days,
+                profile=profile)
+    with metrics.span("roi.project_economics"):
+        econ = project_economics(s['Plant'], s['Manual'], s['Freq'], capfactor, soiling, s['ElecPrice'], capex, robot_opex,
+                                 years=horizon, gen_gain=sim["annual_gain"] if sim else None)
+    # 逐年现金流 (含上涨、衰减与寿命到期更换)：Excel Yearly 表按 单价 / 寿命 折旧摊销，这里按现金口径计更换支出
+    with metrics.span("cashflow.analyze"):
+        cash_flow = cashflow.analyze(cashflow.project_cash_flows(
+            capex, float(econ['annual_manual_cost']), robot_opex, float(econ['annual_gen_gain']), years=horizon,
+            replacement=cashflow.replacement_schedule(fleet_result.capex, fleet_model.lifetime[fleet_model.indices(devices)], horizon),
+            opex_escalation=opex_escalation, price_escalation=price_escalation, degradation=degradation), discount_rate)
+    return {"econ": econ, "soiling_sim": sim, "cash_flow": cash_flow, "horizon": horizon}
+
+
+def _scenario_value(s, name, default):
+    """场景行的可选列：缺列或空值时返回 default。"""
+    value = s.get(name)
+    return default if value is None or pd.isna(value) else float(value)
+
+
+def _scenario_column(df_sce, name, default):
+    if name in df_sce.columns:
+        values = df_sce[name].to_numpy(dtype=float)
+        return values if default is None else np.where(np.isnan(values), float(default), values)
+    return np.full(len(df_sce), np.nan if default is None else float(default))
+
+
+def hourly_gen_gain(df_sce, cycle_cap, soiling_days=soiling_sim.DEFAULT_SOILING_DAYS, profile=None):
+    """Scenarios 表逐行做 8760 h 污损仿真，返回各场景首年发电增收；cycle_cap 为各场景机队的周期产能。
+
+    场景的 SoilingDays / SoilingLoss 列 (可选) 优先，soiling_days 为缺省值；没有 SoilingLoss 时按计划施工窗标定。
+    """
+    plant = df_sce["Plant"].to_numpy(dtype=float)
+    capfactor = _scenario_column(df_sce, "CapFactor", DEFAULT_CAPFACTOR)
+    soiling = df_sce["Soiling"].to_numpy(dtype=float)
+    elec_price = df_sce["ElecPrice"].to_numpy(dtype=float)
+    freq = df_sce["Freq"].to_numpy(dtype=float)
+    window = df_sce["Window"].to_numpy(dtype=float)
+    sweep = np.broadcast_to(soiling_sim.sweep_days(window, plant, cycle_cap), plant.shape)
+    days = _scenario_column(df_sce, "SoilingDays", soiling_days)
+    max_loss = _scenario_column(df_sce, "SoilingLoss", None)
+    profile = profile or soiling_sim.load_profile()
+    return np.array([
+        soiling_sim.simulate(plant[i], capfactor[i], soiling[i], elec_price[i], freq[i], sweep[i], planned_sweep=window[i],
+                             max_loss=None if np.isnan(max_loss[i]) else max_loss[i], soiling_days=days[i],
+                             profile=profile)["annual_gain"]
+        for i in range(len(df_sce))
+    ])
+
+
+def batch_roi(df_sce, fleet_model, devices, unit_prices=None, quantities=None, hourly=False,
+              soiling_days=soiling_sim.DEFAULT_SOILING_DAYS, degradation=cashflow.DEFAULT_DEGRADATION, profile=None,
+              discount_rate=cashflow.DEFAULT_DISCOUNT_RATE, opex_escalation=cashflow.DEFAULT_OPEX_ESCALATION,
+              price_escalation=cashflow.DEFAULT_PRICE_ESCALATION):
+    """对 Scenarios 表全部行一次性测算 ROI，返回每个场景一行的结果表 (参数见 batch_evaluate)。"""
+    return batch_evaluate(df_sce, fleet_model, devices, unit_prices, quantities, hourly, soiling_days, degradation, profile,
+                          discount_rate, opex_escalation, price_escalation)["summary"]
+
+
+def batch_evaluate(df_sce, fleet_model, devices, unit_prices=None, quantities=None, hourly=False,
+                   soiling_days=soiling_sim.DEFAULT_SOILING_DAYS, degradation=cashflow.DEFAULT_DEGRADATION, profile=None,
+                   discount_rate=cashflow.DEFAULT_DISCOUNT_RATE, opex_escalation=cashflow.DEFAULT_OPEX_ESCALATION,
+                   price_escalation=cashflow.DEFAULT_PRICE_ESCALATION):
+    """对 Scenarios 表全部行一次性测算 ROI。
+
+    devices 为机队组合；quantities 为 None 时按各场景的窗口期 / 班次 / 冗余系数取建议台数，
+    否则为 (场景数, 设备数) 或 (设备数,) 的台数数组。hourly=True 时发电增收改用逐时污损仿真。
+    NPV / IRR / 折现回本按各场景的 Horizon 列 (缺省 5 年) 逐年现金流计算，全部场景一次向量化求解。
+    返回 dict：summary (每个场景一行的结果表)、fleet (FleetResult，数组为 场景 × 设备)、
+    cash_flow (cashflow.analyze 的结果，场景 × 年份) 及 horizon。
+    """
+    plant = df_sce["Plant"].to_numpy(dtype=float)
+    window = df_sce["Window"].to_numpy(dtype=float)
+    shifts = df_sce["Shifts"].to_numpy(dtype=float)
+    freq = df_sce["Freq"].to_numpy(dtype=float)
+
+    if quantities is None:
+        redundancy = _scenario_column(df_sce, "Redundancy", DEFAULT_REDUNDANCY)
+        quantities = fleet_model.suggested_units(devices, plant, window, shifts, redundancy)
+    fleet = fleet_model.evaluate(devices, quantities, unit_prices, shifts=shifts, window=window, freq=freq, plant=plant)
+
+    horizon = np.clip(_scenario_column(df_sce, "Horizon", 5), 1, cashflow.MAX_YEARS)
+    econ = project_economics(
+        plant, df_sce["Manual"], freq, _scenario_column(df_sce, "CapFactor", DEFAULT_CAPFACTOR),
+        df_sce["Soiling"], df_sce["ElecPrice"], fleet.total_capex, fleet.total_opex, years=horizon,
+        gen_gain=hourly_gen_gain(df_sce, fleet.total_cycle_cap, soiling_days, profile) if hourly else None,
+    )
+    years = int(horizon.max()) if len(horizon) else 1
+    flows = cashflow.project_cash_flows(
+        fleet.total_capex, econ["annual_manual_cost"], fleet.total_opex, econ["annual_gen_gain"], years=years,
+        replacement=cashflow.replacement_schedule(fleet.capex, fleet_model.lifetime[fleet_model.indices(devices)], years, horizon),
+        opex_escalation=opex_escalation, price_escalation=price_escalation, degradation=degradation, horizon=horizon)
+    cash = cashflow.analyze(flows, discount_rate)
+    units = np.broadcast_to(np.asarray(quantities), (len(df_sce), len(devices)))
+    result = pd.DataFrame({
+        "Client/Project": df_sce["Client/Project"].to_numpy(),
+        "Scenario": df_sce["Scenario"].to_numpy(),
+        "Region": df_sce["Region"].to_numpy(),
+        "Plant (MW)": plant,
+        "Fleet": [" + ".join(f"{int(q)}x {d}" for d, q in zip(devices, row) if q) for row in units],
+        "Total capacity (MW/cycle)": fleet.total_cycle_cap,
+        "Adequacy": np.where(fleet.is_adequate, "Yes", "No"),
+        "CAPEX": fleet.total_capex,
+        "Annual manual cost": econ["annual_manual_cost"],
+        "Annual robot cost": fleet.total_opex,
+        "Annual savings": econ["annual_manual_saving"],
+        "Extra revenue": econ["annual_gen_gain"],
+        "Net benefit": econ["net_benefit"],
+        "Payback (years)": econ["payback_yrs"],
+        "ROI (%)": econ["roi"],
+        "Horizon (years)": horizon.astype(int),
+        "NPV": cash["npv"],
+        "IRR (%)": cash["irr"],
+        "Discounted payback (years)": cash["discounted_payback_yrs"],
+    })
+    return {"summary": result, "fleet": fleet, "cash_flow": cash, "horizon": horizon.astype(int)}
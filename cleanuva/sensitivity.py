@@ -0,0 +1,178 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import cashflow
+from cleanuva.roi import project_economics
+
+# 可做敏感性分析的输入变量 -> 显示名称
+VARIABLES = {
+    "soiling": "Soiling Recovery (%)",
+    "elec_price": "ElecPrice",
+    "capfactor": "CapFactor (%)",
+    "manual": "Manual Cost",
+    "unit_price": "Unit Price (x base)",
+    "freq": "Cleaning Freq",
+}
+# 输出指标 -> 显示名称
+METRICS = {
+    "roi": "ROI (%)",
+    "payback_yrs": "Payback (years)",
+    "net_benefit": "Net Benefit / yr",
+    "savings_multiple": "Savings / CAPEX (Horizon)",
+    "npv": "NPV (Horizon)",
+    "irr": "IRR (%)",
+    "discounted_payback_yrs": "Discounted Payback (years)",
+}
+# 需要逐年现金流的指标 (只在被请求时计算)
+CASHFLOW_METRICS = {"npv", "irr", "discounted_payback_yrs"}
+# 单次向量化计算的最大样本数，控制 Monte Carlo 峰值内存 (逐年现金流每个样本占 years + 1 列)
+CHUNK_SIZE = 1_000_000
+CASHFLOW_CHUNK_SIZE = 200_000
+
+
+def make_case(s, fleet_result, consumable, warranty, soiling, capfactor, years=5, recovery=None, lifetime=None,
+              discount_rate=cashflow.DEFAULT_DISCOUNT_RATE, opex_escalation=cashflow.DEFAULT_OPEX_ESCALATION,
+              price_escalation=cashflow.DEFAULT_PRICE_ESCALATION, degradation=cashflow.DEFAULT_DEGRADATION):
+    """把一个场景 + 当前机队配置压缩成只含标量的测算基准 (可作为缓存 key)。
+
+    机队年度运维对清洗频次是线性的：opex = opex_per_freq × freq + opex_fixed。
+    recovery 为逐时污损仿真得到的实际回收率 (%)；发电增收与污损率成正比，
+    按 recovery / soiling 折算后各变量的扰动与仿真口径一致。缺省为年度平均公式。
+    lifetime 与其后参数用于 NPV / IRR：逐年设备更换支出 (按基准单价) 及折现 / 上涨假设。
+    """
+    q = np.asarray(fleet_result.quantities, dtype=float)
+    replacement = np.zeros(int(years) + 1) if lifetime is None else \
+        cashflow.replacement_schedule(np.asarray(fleet_result.capex, dtype=float), lifetime, int(years))
+    return {
+        "plant": float(s["Plant"]),
+        "manual": float(s["Manual"]),
+        "freq": float(s["Freq"]),
+        "capfactor": float(capfactor),
+        "soiling": float(soiling),
+        "elec_price": float(s["ElecPrice"]),
+        "unit_price": 1.0,
+        "capex": float(fleet_result.total_capex),
+        "opex_per_freq": float((q * consumable).sum()),
+        "opex_fixed": float((q * warranty).sum()),
+        "years": int(years),
+        "gen_factor": 1.0 if recovery is None or not soiling else float(recovery) / float(soiling),
+        "replacement": tuple(float(v) for v in replacement),
+        "discount_rate": float(discount_rate),
+        "opex_escalation": float(opex_escalation),
+        "price_escalation": float(price_escalation),
+        "degradation": float(degradation),
+    }
+
+
+def evaluate(case, outputs=None, **overrides):
+    """在基准上覆盖任意变量 (标量或可广播数组) 后计算指标。
+
+    outputs 为需要的指标名；逐年现金流指标 (NPV / IRR / 折现回本) 只在 outputs 为 None 或包含它们时计算。
+    """
+    v = dict(case, **overrides)
+    freq = np.asarray(v["freq"], dtype=float)
+    capex = case["capex"] * np.asarray(v["unit_price"], dtype=float)
+    robot_opex = case["opex_per_freq"] * freq + case["opex_fixed"]
+    soiling = np.asarray(v["soiling"], dtype=float) * case.get("gen_factor", 1.0)
+    econ = project_economics(v["plant"], v["manual"], freq, v["capfactor"], soiling, v["elec_price"],
+                             capex, robot_opex, years=case["years"])
+    # Sensitivity 表口径：测算年限内累计人工节省 / CAPEX (不含发电增收)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        econ["savings_multiple"] = np.where(capex > 0, econ["annual_manual_saving"] * case["years"] / capex, 0.0)
+    if outputs is None or CASHFLOW_METRICS.intersection(outputs):
+        replacement = np.asarray(v["unit_price"], dtype=float)[..., None] * np.asarray(case.get("replacement", 0.0))
+        flows = cashflow.project_cash_flows(
+            capex, econ["annual_manual_cost"], robot_opex, econ["annual_gen_gain"], years=case["years"],
+            replacement=replacement, opex_escalation=case.get("opex_escalation", cashflow.DEFAULT_OPEX_ESCALATION),
+            price_escalation=case.get("price_escalation", cashflow.DEFAULT_PRICE_ESCALATION),
+            degradation=case.get("degradation", cashflow.DEFAULT_DEGRADATION))
+        rate = case.get("discount_rate", cashflow.DEFAULT_DISCOUNT_RATE)
+        econ["npv"] = cashflow.npv(flows, rate)
+        econ["irr"] = cashflow.irr(flows) * 100
+        econ["discounted_payback_yrs"] = cashflow.payback(flows, rate)
+    return econ
+
+
+def tornado(case, ranges, metric="roi"):
+    """单因素敏感性：每个变量分别取 (低, 高)，其余保持基准；按影响幅度降序。"""
+    names = list(ranges)
+    lows = np.array([ranges[n][0] for n in names], dtype=float)
+    highs = np.array([ranges[n][1] for n in names], dtype=float)
+    base = float(evaluate(case, (metric,))[metric])
+
+    # 2 × 变量数 个情景一次广播计算：第 i 行只有变量 i 偏离基准
+    rows = {}
+    for k, name in enumerate(names):
+        col = np.full(2 * len(names), case[name], dtype=float)
+        col[k], col[len(names) + k] = lows[k], highs[k]
+        rows[name] = col
+    out = evaluate(case, (metric,), **rows)[metric]
+
+    df = pd.DataFrame({
+        "Variable": [VARIABLES.get(n, n) for n in names],
+        "Low": lows,
+        "High": highs,
+        "At Low": out[:len(names)] - base,
+        "At High": out[len(names):] - base,
+    })
+    df["Swing"] = (df["At High"] - df["At Low"]).abs()
+    return df.sort_values("Swing", ascending=False, ignore_index=True), base
+
+
+def grid(case, x_name, x_values, y_name, y_values, metric="roi"):
+    """二维网格扫描 (行: y 变量，列: x 变量)，布局与经济模型 Sensitivity 表一致。"""
+    x = np.asarray(x_values, dtype=float)
+    y = np.asarray(y_values, dtype=float)
+    out = evaluate(case, (metric,), **{x_name: x[None, :], y_name: y[:, None]})[metric]
+    out = np.broadcast_to(out, (len(y), len(x)))
+    return pd.DataFrame(out, index=pd.Index(y, name=VARIABLES.get(y_name, y_name)),
+                        columns=pd.Index(x, name=VARIABLES.get(x_name, x_name)))
+
+
+def sheet_axes(df_sens):
+    """从 Sensitivity 表的 "Freq=4" 列头和 "Manual=1200" 行头解析出网格坐标轴。"""
+    def parse(labels):
+        vals = [re.search(r"=\s*([-\d.]+)", str(v)) for v in labels]
+        return [float(m.group(1)) for m in vals if m]
+    return parse(df_sens.columns[1:]), parse(df_sens.iloc[:, 0])
+
+
+def _sample_chunk(case, dists, n, seed, metric):
+    rng = np.random.default_rng(seed)
+    draws = {name: rng.triangular(low, mode, high, size=n) if high > low else np.full(n, float(mode))
+             for name, (low, mode, high) in dists.items()}
+    return evaluate(case, (metric,), **draws)[metric]
+
+
+def monte_carlo(case, dists, n=1_000_000, metric="roi", seed=0, workers=None):
+    """Monte Carlo：dists 为 {变量: (最小, 最可能, 最大)} 三角分布，返回指标样本数组。
+
+    样本按 CHUNK_SIZE 分块计算；workers > 1 时分块交给进程池并行，
+    每块使用 SeedSequence 派生的独立随机流，结果与 workers 数无关、可复现。
+    """
+    chunk = CASHFLOW_CHUNK_SIZE if metric in CASHFLOW_METRICS else CHUNK_SIZE
+    sizes = [chunk] * (n // chunk) + ([n % chunk] if n % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers and workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes), os.cpu_count() or 1)) as pool:
+            parts = list(pool.map(_sample_chunk, [case] * len(sizes), [dists] * len(sizes), sizes, seeds,
+                                  [metric] * len(sizes)))
+    else:
+        parts = [_sample_chunk(case, dists, size, ss, metric) for size, ss in zip(sizes, seeds)]
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def summarize(samples, bins=40):
+    """样本分位数及直方图 (供图表展示)。无解的样本 (例如不回本时的 IRR) 不计入。"""
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples)]
+    if len(samples) == 0:
+        return {"p5": np.nan, "p50": np.nan, "p95": np.nan, "mean": np.nan}, pd.DataFrame({"Count": []})
+    pct = np.percentile(samples, [5, 50, 95])
+    counts, edges = np.histogram(samples, bins=bins)
+    hist = pd.DataFrame({"Count": counts}, index=pd.Index(np.round((edges[:-1] + edges[1:]) / 2, 2), name="Value"))
+    return {"p5": pct[0], "p50": pct[1], "p95": pct[2], "mean": float(np.mean(samples))}, hist
@@ -0,0 +1,183 @@
+"""Excel 数据库的列式二进制快照 (每列一个 .npy，可直接 memory-map)。
+
+用法 (部署前预先生成快照)：
+    python -m cleanuva.snapshot --base-dir . --snapshot-dir .snapshots
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+
+SNAPSHOT_DIR = ".snapshots"
+_META = "meta.json"
+# 编码格式版本：格式不同的旧快照视为不存在，回退到 Excel 解析并重写
+SNAPSHOT_FORMAT = 2
+# 字典编码中需要带类型标记才能原样还原的标量 (顺序：子类在前)
+_TAGGED = (
+    ("timestamp", pd.Timestamp, pd.Timestamp),
+    ("datetime", datetime.datetime, datetime.datetime.fromisoformat),
+    ("date", datetime.date, datetime.date.fromisoformat),
+    ("time", datetime.time, datetime.time.fromisoformat),
+)
+
+
+def sheet_dir(snapshot_dir, book, sheet):
+    stem = os.path.splitext(os.path.basename(book))[0]
+    return os.path.join(snapshot_dir, re.sub(r"[^0-9A-Za-z_.-]", "_", f"{stem}__{sheet}"))
+
+
+def _json_scalar(v):
+    if isinstance(v, np.generic):
+        v = v.item()
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+    for tag, cls, _ in _TAGGED:
+        if isinstance(v, cls):
+            return {"type": tag, "value": v.isoformat()}
+    # 其它对象按文本保存
+    return str(v)
+
+
+def _from_json(v):
+    if isinstance(v, dict):
+        parse = next(parse for tag, _, parse in _TAGGED if tag == v["type"])
+        return parse(v["value"])
+    return v
+
+
+def _encode_column(series):
+    """返回 (描述信息, 要写入 .npy 的数组)。"""
+    dtype = series.dtype
+    if ptypes.is_bool_dtype(dtype) or (ptypes.is_numeric_dtype(dtype) and isinstance(dtype, np.dtype)):
+        return {"kind": "num", "dtype": str(dtype)}, series.to_numpy()
+    if isinstance(dtype, np.dtype) and ptypes.is_datetime64_dtype(dtype):
+        return {"kind": "datetime", "dtype": str(dtype)}, series.to_numpy().view("i8")
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        # 保留全部类别 (含未出现的) 及其顺序
+        return {
+            "kind": "category",
+            "dtype": str(dtype.categories.dtype),
+            "ordered": bool(dtype.ordered),
+            "categories": [_json_scalar(v) for v in np.asarray(dtype.categories, dtype=object)],
+        }, series.cat.codes.to_numpy().astype(np.int32)
+
+    # 文本 / 混合类型列：字典编码 (int32 codes + 取值表)，按原 dtype 还原；转 category 由 store.compact 负责
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    desc = {
+        "kind": "dict",
+        "dtype": str(dtype),
+        "categories": [_json_scalar(v) for v in np.asarray(uniques, dtype=object)],
+    }
+    return desc, codes.astype(np.int32)
+
+
+def _decode_column(desc, arr):
+    kind = desc["kind"]
+    if kind == "num":
+        return arr
+    if kind == "datetime":
+        return arr.view(desc["dtype"])
+    categories = [_from_json(v) for v in desc["categories"]]
+    if kind == "category":
+        return pd.Categorical.from_codes(arr, dtype=pd.CategoricalDtype(
+            pd.Index(categories, dtype=desc["dtype"]), ordered=desc.get("ordered", False)))
+    # code -1 (缺失值) 取到末尾的 NaN，与 read_excel 的空单元格一致
+    values = np.asarray(categories + [np.nan], dtype=object)[arr]
+    series = pd.Series(values, copy=False)
+    return series if desc["dtype"] == "object" else series.astype(desc["dtype"])
+
+
+def write_snapshot(snapshot_dir, book, sheet, df, source_meta):
+    """写入单个 sheet 的快照。source_meta 至少包含 source_stat / sha1 / version。
+
+    列文件名带版本前缀，meta.json 最后通过 os.replace 原子替换，读取方不会看到半成品。
+    """
+    out = sheet_dir(snapshot_dir, book, sheet)
+    os.makedirs(out, exist_ok=True)
+    token = hashlib.sha1(str(source_meta["version"]).encode()).hexdigest()[:10]
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        desc, arr = _encode_column(df[name])
+        desc["name"] = _json_scalar(name)
+        desc["file"] = f"{token}_{i}.npy"
+        np.save(os.path.join(out, desc["file"]), np.ascontiguousarray(arr), allow_pickle=False)
+        columns.append(desc)
+
+    meta = dict(source_meta, format=SNAPSHOT_FORMAT, book=book, sheet=sheet, rows=len(df), columns=columns)
+    tmp = os.path.join(out, f"{_META}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(out, _META))
+
+    # 清理旧版本遗留的列文件
+    keep = {c["file"] for c in columns} | {_META}
+    for fn in os.listdir(out):
+        if fn.endswith(".npy") and fn not in keep:
+            try:
+                os.remove(os.path.join(out, fn))
+            except OSError:
+                pass
+    return meta
+
+
+def read_meta(snapshot_dir, book, sheet):
+    try:
+        with open(os.path.join(sheet_dir(snapshot_dir, book, sheet), _META), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == SNAPSHOT_FORMAT else None
+
+
+def read_snapshot(snapshot_dir, book, sheet, meta=None, mmap=True):
+    meta = meta or read_meta(snapshot_dir, book, sheet)
+    if meta is None:
+        return None
+    base = sheet_dir(snapshot_dir, book, sheet)
+    data = {}
+    for desc in meta["columns"]:
+        arr = np.load(os.path.join(base, desc["file"]), mmap_mode="r" if mmap else None, allow_pickle=False)
+        data[_from_json(desc["name"])] = _decode_column(desc, arr)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), copy=False)
+
+
+def build_snapshots(base_dir=".", snapshot_dir=SNAPSHOT_DIR, sheets=None):
+    """强制从 Excel 解析所有 sheet 并重写快照，返回每个 sheet 的 (book, sheet, rows, bytes)。"""
+    from cleanuva.loader import AUXILIARY_SHEETS, DATABASE_SHEETS, WorkbookLoader
+
+    loader = WorkbookLoader(sheets or DATABASE_SHEETS + AUXILIARY_SHEETS, base_dir=base_dir)
+    loader.frames()
+    report = []
+    for book, sheet in loader.sheets:
+        loader.save_snapshot(snapshot_dir, book, sheet)
+        base = sheet_dir(snapshot_dir, book, sheet)
+        size = sum(os.path.getsize(os.path.join(base, fn)) for fn in os.listdir(base))
+        report.append((book, sheet, len(loader.frame(book, sheet)), size))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the columnar snapshots of the Cleanuva Excel databases.")
+    parser.add_argument("--base-dir", default=".", help="Directory containing the .xlsx workbooks.")
+    parser.add_argument("--snapshot-dir", default=None, help=f"Output directory (default: <base-dir>/{SNAPSHOT_DIR}).")
+    args = parser.parse_args(argv)
+
+    snapshot_dir = args.snapshot_dir or os.path.join(args.base_dir, SNAPSHOT_DIR)
+    t0 = time.perf_counter()
+    report = build_snapshots(args.base_dir, snapshot_dir)
+    for book, sheet, rows, size in report:
+        print(f"{book:<34} {sheet:<16} {rows:>8} rows {size:>10,} bytes")
+    print(f"{len(report)} snapshots written to {snapshot_dir} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""逐时 (8760 h) 污损与发电仿真，替代 "容量系数 × 污损率" 的年度平均公式。
+
+模型：
+- 面板污损损失随距上次清洗的时间指数累积，上限 max_loss (%) 为长期不清洗时的损失：
+  loss(age) = max_loss × (1 - exp(-age / soiling_days))。
+- 场景的 Soiling (侧边栏 Soiling Recovery) 含义不变，仍是按计划清洗 (Freq 次/年、每轮在施工窗内完成) 带来的效率提升。
+  未给出 max_loss 时按此标定 (calibrated_loss)：计划清洗下的首年增收恰好等于年度公式，
+  机队产能不足、一轮清洗拉长时回收率随之下降。给出 max_loss (现场实测的不清洗损失) 时不做标定。
+- 机器人每 365 / Freq 天开始一轮清洗，一轮在 sweep 天内按区块依次完成 (区块数 CLEANING_BLOCKS)；
+  机队产能不足时 sweep 拉长，超过清洗间隔则连续作业。
+- 逐时发电量 = Plant × 1000 × 容量系数 × 辐照曲线 (均值 1)，电价 = ElecPrice × 电价曲线 (均值 1)。
+- 发电增收 = Σ 发电量 × (max_loss - 当前损失) × 电价，只算首年；逐年的电价上涨与组件衰减由 cashflow 处理。
+
+辐照 / 电价曲线可由本地 CSV 提供 (PROFILE_PATH，8760 行，列 irradiance、price 均可选，只取形状)，
+缺省时辐照使用按季节变化日长的半正弦曲线，电价为常数。
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+HOURS_PER_YEAR = 8760
+PROFILE_PATH = "hourly_profile.csv"
+# 污损累积时间常数 (天)：清洗后约 soiling_days 天达到上限的 63%。30 天是假设值而非实测值，对应干燥、
+# 无降雨冲刷的站点污损在清洗后数周内趋于饱和；有现场数据时在 Scenarios 表加 SoilingDays 列按场景给出，
+# 或在侧边栏修改。标定 max_loss 时它只影响清洗间隔内损失的分布 (产能不足时的回收率)，不改变计划清洗下的增收
+DEFAULT_SOILING_DAYS = 30
+# 一轮清洗中依次清洗的区块数
+CLEANING_BLOCKS = 12
+
+_profile_cache = {}
+_profile_lock = threading.Lock()
+
+
+def _normalize(values, name):
+    values = np.asarray(values, dtype=float)
+    if values.shape != (HOURS_PER_YEAR,):
+        raise ValueError(f"{name} profile must have {HOURS_PER_YEAR} hourly values, got {values.size}")
+    if not np.isfinite(values).all() or (values < 0).any() or values.sum() <= 0:
+        raise ValueError(f"{name} profile must be non-negative and not all zero")
+    return values / values.mean()
+
+
+def default_irradiance():
+    """合成辐照形状 (均值 1)：日出到日落之间为半正弦，日长与峰值随季节变化 (北半球)。"""
+    hours = np.arange(HOURS_PER_YEAR)
+    day, hour = hours // 24, hours % 24 + 0.5
+    season = np.cos(2 * np.pi * (day - 172) / 365)              # 夏至为 1，冬至为 -1
+    day_length = 12 + 4 * season
+    sunrise = 12 - day_length / 2
+    phase = (hour - sunrise) / day_length
+    shape = np.where((phase > 0) & (phase < 1), np.sin(np.pi * np.clip(phase, 0, 1)), 0.0) * (1 + 0.3 * season)
+    return shape / shape.mean()
+
+
+class HourlyProfile:
+    """全年逐时的辐照与电价形状 (均值均为 1)，只读。"""
+
+    def __init__(self, irradiance=None, price=None, source=None):
+        self.irradiance = default_irradiance() if irradiance is None else _normalize(irradiance, "Irradiance")
+        self.price = np.ones(HOURS_PER_YEAR) if price is None else _normalize(price, "Price")
+        # 逐时 辐照 × 电价，发电增收只依赖两者乘积
+        self.value = self.irradiance * self.price
+        self.source = source
+
+    @classmethod
+    def from_csv(cls, path):
+        df = pd.read_csv(path)
+        cols = {c.strip().lower(): c for c in df.columns}
+        if "irradiance" not in cols and "price" not in cols:
+            raise ValueError(f"{path}: expected an 'irradiance' and/or 'price' column")
+        return cls(df[cols["irradiance"]] if "irradiance" in cols else None,
+                   df[cols["price"]] if "price" in cols else None, source=path)
+
+
+def load_profile(path=PROFILE_PATH):
+    """读取本地逐时曲线 (按 (路径, mtime) 缓存)；文件不存在时返回缺省曲线。"""
+    try:
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    except OSError:
+        key = None
+    with _profile_lock:
+        if key not in _profile_cache:
+            _profile_cache.clear()
+            _profile_cache[key] = HourlyProfile() if key is None else HourlyProfile.from_csv(path)
+        return _profile_cache[key]
+
+
+def sweep_days(window, plant, cycle_cap):
+    """完成一轮清洗实际需要的天数：机队周期产能不足时按比例拉长，没有机器人时为无穷大。"""
+    window, plant, cycle_cap = (np.asarray(v, dtype=float) for v in (window, plant, cycle_cap))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stretched = np.where(cycle_cap > 0, window * np.maximum(plant / cycle_cap, 1.0), np.inf)
+    return stretched
+
+
+def soiling_loss(freq, sweep, soiling, soiling_days=DEFAULT_SOILING_DAYS, hours=HOURS_PER_YEAR, blocks=CLEANING_BLOCKS):
+    """逐时平均污损损失 (%，按区块平均)，长度为 hours。soiling_days 必须为正 (否则 ValueError)。"""
+    if not soiling_days > 0:
+        raise ValueError(f"soiling_days must be positive, got {soiling_days!r}")
+    if freq <= 0 or not np.isfinite(sweep):
+        return np.full(hours, float(soiling))
+    interval = max(365.0 / freq, float(sweep))
+    t = np.arange(hours) / 24.0
+    # 区块 b 在每轮开始后 offsets[b] 天被清洗
+    offsets = float(sweep) * (np.arange(blocks) + 0.5) / blocks
+    buildup = np.zeros(hours)
+    for offset in offsets:
+        age = np.mod(t - offset, interval)
+        buildup -= np.expm1(-age / soiling_days)
+    return soiling * buildup / blocks
+
+
+def calibrated_loss(soiling, freq, planned_sweep, soiling_days=DEFAULT_SOILING_DAYS, profile=None, blocks=CLEANING_BLOCKS):
+    """长期不清洗时的损失上限 (%)，使按计划清洗 (Freq 次/年、每轮 planned_sweep 天) 时按发电价值加权的
+    回收率恰好为 soiling (%)。损失与上限成正比，因此一次仿真即可反推。"""
+    profile = profile or load_profile()
+    return _calibrate(soiling, soiling_loss(freq, planned_sweep, 1.0, soiling_days, blocks=blocks), profile)
+
+
+def _calibrate(soiling, unit_loss, profile):
+    # unit_loss 为上限取 1 时的逐时损失；不清洗 (全为 1) 时没有可回收的部分，上限取 soiling 本身
+    kept = float(np.average(1 - unit_loss, weights=profile.value))
+    return float(soiling) / kept if kept > 0 else float(soiling)
+
+
+def simulate(plant, capfactor, soiling, elec_price, freq, sweep, planned_sweep=None, max_loss=None,
+             soiling_days=DEFAULT_SOILING_DAYS, profile=None, blocks=CLEANING_BLOCKS):
+    """单个场景首年的逐时仿真。soiling / capfactor / max_loss 单位为 %，sweep 为机队实际完成一轮清洗的天数，
+    planned_sweep 为计划的施工窗 (缺省同 sweep)；max_loss 缺省时按 calibrated_loss 标定。
+
+    返回 dict：annual_gain、annual_generation、逐时 hourly_loss (%) / hourly_gain、max_loss、
+    按发电价值加权的平均损失 mean_loss (%) 及 recovery (增收折合年度公式中的 Soiling %)。
+    """
+    profile = profile or load_profile()
+    unit = soiling_loss(freq, sweep, 1.0, soiling_days, HOURS_PER_YEAR, blocks)
+    if max_loss is None:
+        # 机队按计划完成 (sweep == planned_sweep) 时直接复用同一条曲线
+        planned = unit if planned_sweep is None or float(planned_sweep) == float(sweep) else \
+            soiling_loss(freq, planned_sweep, 1.0, soiling_days, HOURS_PER_YEAR, blocks)
+        max_loss = _calibrate(soiling, planned, profile)
+    loss = max_loss * unit
+    # 逐时发电量 (kWh) 与逐时增收
+    gen = plant * 1000 * (capfactor / 100) * profile.irradiance
+    gain = (gen * profile.price * elec_price) * ((max_loss - loss) / 100)
+    annual_gain = float(gain.sum())
+    flat_per_pct = plant * 1000 * HOURS_PER_YEAR * (capfactor / 100) * elec_price / 100
+    return {
+        "annual_gain": annual_gain,
+        "annual_generation": float(gen.sum()),
+        "hourly_loss": loss,
+        "hourly_gain": gain,
+        "max_loss": float(max_loss),
+        "mean_loss": float(np.average(loss, weights=profile.value)),
+        "recovery": annual_gain / flat_per_pct if flat_per_pct > 0 else 0.0,
+    }
+
@@ -0,0 +1,147 @@
+"""进程内共享的只读数据仓库。
+
+所有会话引用同一份 DataFrame (不再像 st.cache_data 那样每次重跑都反序列化一份副本)。
+仓库以带版本号的快照对外提供数据：同步 Excel 时构建新快照并整体替换引用 (原子切换)，
+正在运行的会话继续使用手上的旧快照，直到下次重跑。
+
+快照中的 DataFrame 约定只读；pandas 默认的 Copy-on-Write 保证从中派生的切片 / 视图
+被修改时只会复制，不会写回共享数据。
+"""
+import pickle
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleanuva import metrics
+
+# 低基数文本列统一存为 category (快照按原 dtype 还原，无论从快照还是 Excel 加载都在这里压缩)
+CATEGORY_COLUMNS = ("Company", "Model", "Primary Category", "Secondary Parameter", "Region", "Delivery_Method", "Method")
+# 超过该时长未重跑的会话不计入内存报告
+SESSION_TTL = 30 * 60
+
+
+def compact(df):
+    """把 CATEGORY_COLUMNS 中的文本列转为 category，返回新 DataFrame (原对象不变)。"""
+    cols = [c for c in CATEGORY_COLUMNS
+            if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype)
+            and (pd.api.types.is_object_dtype(df[c]) or pd.api.types.is_string_dtype(df[c]))]
+    if not cols:
+        return df
+    return df.astype({c: "category" for c in cols})
+
+
+def approx_bytes(obj):
+    """对象占用内存的估算值：DataFrame / Series 按 deep memory_usage，数组按 nbytes，其余按序列化大小。"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(obj)
+
+
+class StoreSnapshot:
+    """某一时刻全部数据表的只读快照。"""
+
+    def __init__(self, frames, versions, serial):
+        self._frames = frames
+        self._versions = versions
+        self.serial = serial            # 第几次切换 (从 1 开始)
+        self.created = time.time()
+
+    def frame(self, book, sheet):
+        return self._frames[(book, sheet)]
+
+    def frames(self, keys):
+        return tuple(self._frames[key] for key in keys)
+
+    def version(self, book, sheet):
+        return self._versions.get((book, sheet))
+
+    def versions(self, keys):
+        return tuple(self._versions.get(key) for key in keys)
+
+    def memory_report(self):
+        """每张表的行列数与内存占用 (bytes)。"""
+        rows = [{
+            "Workbook": book,
+            "Sheet": sheet,
+            "Rows": len(df),
+            "Columns": df.shape[1],
+            "Categorical": int(sum(isinstance(t, pd.CategoricalDtype) for t in df.dtypes)),
+            "Bytes": approx_bytes(df),
+        } for (book, sheet), df in self._frames.items()]
+        return pd.DataFrame(rows)
+
+
+class DataStore:
+    """共享数据仓库：包装 WorkbookLoader，只在 sheet 版本变化时重建对应表并原子切换快照。
+
+    keys 默认为 loader 的全部 sheet；prepare(key, df) 可对每张表做一次性的整理 (例如设置索引)，结果随快照共享。
+    """
+
+    def __init__(self, loader, keys=None, prepare=None):
+        self._loader = loader
+        self._keys = tuple(keys or loader.sheets)
+        self._prepare = prepare
+        self._lock = threading.Lock()
+        self._current = None
+        self._sessions = {}
+
+    def current(self):
+        """当前快照 (首次调用时加载)。读引用无需加锁：切换是一次赋值。"""
+        snap = self._current
+        if snap is None:
+            self.refresh()
+            snap = self._current
+        return snap
+
+    def refresh(self):
+        """检查工作簿；有 sheet 变化时构建新快照 (未变的表直接沿用)，返回变化的 (book, sheet) 列表。"""
+        with self._lock, metrics.span("load.store_refresh"):
+            changed = self._loader.refresh()
+            old = self._current
+            if old is not None and not changed:
+                return changed
+            frames, versions = {}, {}
+            for key, df in zip(self._keys, self._loader.frames(self._keys)):
+                version = self._loader.version(*key)
+                versions[key] = version
+                if old is not None and old.version(*key) == version:
+                    frames[key] = old.frame(*key)
+                    continue
+                df = compact(df)
+                frames[key] = self._prepare(key, df) if self._prepare else df
+            self._current = StoreSnapshot(frames, versions, (old.serial if old else 0) + 1)
+            return changed
+
+    def touch(self, session_id, state_bytes=0):
+        """记录会话活跃时间及其私有状态大小 (用于内存报告)。"""
+        now = time.time()
+        self._sessions[session_id] = (now, state_bytes)
+        for sid, (seen, _) in list(self._sessions.items()):
+            if now - seen > SESSION_TTL:
+                self._sessions.pop(sid, None)
+
+    def session_report(self):
+        """活跃会话数、共享数据字节数、各会话私有状态字节数。
+
+        共享表只有一份，按会话平摊；st.cache_data 方案下每个会话每次重跑都要拿到一份完整副本。
+        """
+        shared = int(self.current().memory_report()["Bytes"].sum())
+        sessions = dict(self._sessions)
+        n = max(len(sessions), 1)
+        return {
+            "sessions": len(sessions),
+            "shared_bytes": shared,
+            "shared_bytes_per_session": shared // n,
+            "session_state_bytes": {sid: b for sid, (_, b) in sessions.items()},
+            "copy_bytes_per_session": shared,
+        }